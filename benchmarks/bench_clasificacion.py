@@ -0,0 +1,64 @@
+"""Benchmark de la clasificación aproximada (rapidito.clasificacion) con razones sociales realistas.
+
+Uso: python benchmarks/bench_clasificacion.py [--n 100000] [--consultas 2000] [--verificar 200]
+
+Mide la construcción del índice (y lo que cuesta enviarlo a un proceso: pickle de ida y
+vuelta) y la latencia por búsqueda por trigramas, sin memorizar, para nombres de la tabla
+con una errata y para nombres que no están. Con --verificar compara ese número de búsquedas
+con el mejor Dice calculado por fuerza bruta sobre toda la tabla.
+"""
+import argparse
+import os
+import pickle
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rapidito.clasificacion import IndiceEmpresas, normalizar, trigramas
+from generador import razones_sociales, con_errores
+
+
+def fuerza_bruta(ind, conjuntos, norm):
+    q = trigramas(norm); mejor, mejor_p = None, 0.0
+    for nombre, c in zip(ind.nombres, conjuntos):
+        p = 2 * len(q & c) / (len(q) + len(c))
+        if p > mejor_p: mejor, mejor_p = nombre, p
+    return (mejor, mejor_p) if mejor_p >= ind.umbral else (None, 0.0)
+
+
+def latencias(ind, consultas):
+    out = []
+    for q in consultas:
+        t = time.perf_counter(); ind._buscar_trigramas(q); out.append(time.perf_counter() - t)
+    return np.array(out) * 1000
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=100000)
+    ap.add_argument("--consultas", type=int, default=2000)
+    ap.add_argument("--verificar", type=int, default=200, help="búsquedas a comparar con la fuerza bruta (0 = no comparar)")
+    a = ap.parse_args()
+
+    rnd = random.Random(1)
+    nombres = razones_sociales(a.n + a.consultas, semilla=7)
+    tabla = {nm: {"DETALLE": "ALIMENTACION", "MEMO": "PERSONAL"} for nm in nombres[:a.n]}
+    t = time.perf_counter(); ind = IndiceEmpresas(tabla); construir = time.perf_counter() - t
+    t = time.perf_counter(); pickle.loads(pickle.dumps(ind, protocol=pickle.HIGHEST_PROTOCOL)); envio = time.perf_counter() - t
+    print(f"índice de {a.n} nombres: {construir:.2f} s al construir, {envio:.2f} s pickle de ida y vuelta")
+
+    casi = [normalizar(con_errores(rnd.choice(nombres[:a.n]), rnd)) for _ in range(a.consultas)]
+    ausentes = [normalizar(nm) for nm in nombres[a.n:]]
+    for etiqueta, consultas in (("con errata", casi), ("ausentes", ausentes)):
+        ms = latencias(ind, consultas)
+        aciertos = sum(ind._buscar_trigramas(q)[0] is not None for q in consultas)
+        print(f"{etiqueta:<11} mediana {np.median(ms):.3f} ms  p95 {np.percentile(ms, 95):.3f} ms  máx {ms.max():.2f} ms  con coincidencia {aciertos}/{len(consultas)}")
+    if a.verificar:
+        conjuntos = [trigramas(normalizar(nm)) for nm in ind.nombres]
+        muestra = casi[:a.verificar // 2] + ausentes[:a.verificar // 2]
+        distintos = [q for q in muestra if abs(ind._buscar_trigramas(q)[1] - fuerza_bruta(ind, conjuntos, q)[1]) > 1e-9]
+        print(f"fuerza bruta: {len(muestra) - len(distintos)}/{len(muestra)} búsquedas con el mismo mejor Dice")
+        if distintos: sys.exit(1)
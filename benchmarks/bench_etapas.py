@@ -0,0 +1,114 @@
+"""Benchmark de extremo a extremo por etapa, con documentos sintéticos (benchmarks/generador.py).
+
+Uso: python benchmarks/bench_etapas.py [--tamanos 1000,10000,100000] [--descargas 2000] [--latencia 0.02]
+                                       [--json resultados.json] [--comparar base.json --tolerancia 0.2]
+
+Para cada tamaño mide el rendimiento (documentos, filas o claves por segundo) y el pico de
+memoria (tracemalloc, en una segunda pasada para no falsear el tiempo) de:
+  entrada     procesar_archivos_entrada sobre un ZIP con ZIP anidados
+  extraccion  extraer_datos_robusto documento a documento
+  lote        extraer_lote (varios procesos)
+  ventas      procesar_ventas_con_retenciones sobre facturas y sus retenciones
+  excel       generar_excel_multiexcel con compras y ventas (informe integral)
+  descarga    DescargadorSRI contra el SRI simulado (rapidito.mock_sri), sin caché
+Con --comparar termina con código 1 si alguna etapa es más lenta que la base en más de
+la tolerancia, para usarlo como control de regresiones.
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rapidito.entrada import procesar_archivos_entrada
+from rapidito.excel import generar_excel_multiexcel
+from rapidito.extraccion import extraer_datos_robusto
+from rapidito.mock_sri import ServidorSRISimulado
+from rapidito.paralelo import extraer_lote
+from rapidito.sri import DescargadorSRI
+from rapidito.ventas import procesar_ventas_con_retenciones
+from generador import documentos, comprobantes_por_clave, ventas_con_retenciones, zip_anidado
+
+EMPRESAS = {"SUPERMAXI S.A.": {"DETALLE": "ALIMENTACION", "MEMO": "PERSONAL"}, "FARMACIA CRUZ AZUL": {"DETALLE": "SALUD", "MEMO": "PERSONAL"}}
+
+
+def medir(fn, memoria=True):
+    """(segundos, pico de memoria en bytes o None, resultado)."""
+    gc.collect(); t = time.perf_counter(); res = fn(); dt = time.perf_counter() - t
+    pico = None
+    if memoria:
+        del res; gc.collect()
+        tracemalloc.start(); res = fn(); pico = tracemalloc.get_traced_memory()[1]; tracemalloc.stop()
+    return dt, pico, res
+
+
+def etapas(n, a):
+    """Genera los datos de un tamaño y devuelve [(etapa, unidades, segundos, pico)]."""
+    docs = documentos(n, semilla=n)
+    zip_docs = zip_anidado(docs, por_zip=a.por_zip, niveles=2)
+    ventas_docs = ventas_con_retenciones(n, semilla=n)
+    out = []
+
+    def registrar(nombre, unidades, fn, memoria=not a.sin_memoria):
+        dt, pico, res = medir(fn, memoria)
+        out.append((nombre, unidades, dt, pico)); return res
+
+    registrar("entrada", n, lambda: sum(1 for _ in procesar_archivos_entrada([zip_docs])))
+    compras = registrar("extraccion", n, lambda: [extraer_datos_robusto(io.BytesIO(d), EMPRESAS) for d in docs])
+    registrar("lote", n, lambda: extraer_lote(docs, EMPRESAS, **({"procesos": a.procesos} if a.procesos else {})), memoria=False)
+    filas_ventas = [extraer_datos_robusto(io.BytesIO(d), EMPRESAS) for d in ventas_docs]
+    ventas = registrar("ventas", n, lambda: procesar_ventas_con_retenciones([f for f in filas_ventas if f]))
+    compras = [d for d in compras if d and d["TIPO"] in ("FC", "NC")]
+    registrar("excel", len(compras) + len(ventas), lambda: len(generar_excel_multiexcel(compras, ventas)))
+
+    m = min(n, a.descargas)
+    if m:
+        srv = ServidorSRISimulado(comprobantes_por_clave(m, semilla=n), latencia=a.latencia).iniciar()
+        try:
+            claves = list(srv.comprobantes)
+            def descargar():
+                with DescargadorSRI(url=srv.url, concurrencia=a.concurrencia, por_segundo=a.por_segundo, timeout=30) as dsc:
+                    return dsc.descargar(claves)
+            res = registrar("descarga", m, descargar, memoria=False)
+            assert all(r["estado"] == "AUTORIZADO" for r in res)
+        finally: srv.detener()
+    return out
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tamanos", default="1000,10000,100000")
+    ap.add_argument("--por-zip", type=int, default=500, help="documentos por ZIP interno")
+    ap.add_argument("--procesos", type=int, default=None, help="procesos de extraer_lote (por defecto, todos los núcleos)")
+    ap.add_argument("--descargas", type=int, default=2000, help="claves a descargar del SRI simulado por tamaño (0 = no medir)")
+    ap.add_argument("--latencia", type=float, default=0.02, help="latencia simulada del SRI por petición (s)")
+    ap.add_argument("--concurrencia", type=int, default=8)
+    ap.add_argument("--por-segundo", type=float, default=1000.0, help="límite de peticiones por segundo del descargador")
+    ap.add_argument("--sin-memoria", action="store_true", help="no medir el pico de memoria (la pasada con tracemalloc duplica el tiempo)")
+    ap.add_argument("--json", help="guarda los resultados en este archivo")
+    ap.add_argument("--comparar", help="resultados JSON de referencia")
+    ap.add_argument("--tolerancia", type=float, default=0.2, help="caída de rendimiento admitida frente a la referencia")
+    a = ap.parse_args()
+
+    resultados = []
+    print(f"{'etapa':<11} {'tamaño':>7} {'unidades':>9} {'seg':>8} {'por seg':>10} {'pico MB':>9}")
+    for n in [int(x) for x in a.tamanos.split(",")]:
+        for nombre, unidades, dt, pico in etapas(n, a):
+            resultados.append({"etapa": nombre, "n": n, "unidades": unidades, "segundos": dt, "por_segundo": unidades / dt, "pico_bytes": pico})
+            print(f"{nombre:<11} {n:>7} {unidades:>9} {dt:>8.2f} {unidades / dt:>10.0f} {'-' if pico is None else f'{pico / 1048576:.1f}':>9}")
+    if a.json:
+        with open(a.json, "w", encoding="utf-8") as f: json.dump(resultados, f, indent=1)
+    if a.comparar:
+        with open(a.comparar, encoding="utf-8") as f: base = {(r["etapa"], r["n"]): r for r in json.load(f)}
+        peores = []
+        for r in resultados:
+            b = base.get((r["etapa"], r["n"]))
+            if b and r["por_segundo"] < b["por_segundo"] * (1 - a.tolerancia):
+                peores.append(f"{r['etapa']} ({r['n']}): {r['por_segundo']:.0f}/s frente a {b['por_segundo']:.0f}/s")
+        if peores:
+            print("\nRegresiones:\n  " + "\n  ".join(peores)); sys.exit(1)
+        print("\nSin regresiones frente a", a.comparar)
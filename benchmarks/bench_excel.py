@@ -0,0 +1,302 @@
+"""Benchmark del generador Excel: escritor con formatos fijos y filas (rapidito.excel) frente al anterior.
+
+Uso: python benchmarks/bench_excel.py [--filas 10000,100000] [--sin-legado]
+
+Mide tiempo y pico de memoria (tracemalloc) por hoja: FACTURAS, COMPRAS, VENTAS y
+RETENCIONES. Antes comprueba con openpyxl que ambos generadores escriben las mismas celdas
+de datos, y que los totales de REPORTE ANUAL y PROYECCION (valores y fórmulas acotadas)
+coinciden con lo que dan las fórmulas SUMIFS de columna completa del generador anterior.
+"""
+import argparse
+import gc
+import io
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+import xlsxwriter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rapidito.excel import generar_excel_multiexcel, MESES, CATEGORIAS
+
+
+# Generador anterior (un add_format por celda de texto, escritura celda a celda), solo como referencia
+def generar_legado(data_compras=None, data_ventas_ret=None, data_sri_lista=None, sri_mode=None):
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
+        wb = writer.book
+        f_azul = wb.add_format({'bold':True,'align':'center','border':1,'bg_color':'#002060','font_color':'white'})
+        f_amar = wb.add_format({'bold':True,'align':'center','border':1,'bg_color':'#FFD966'})
+        f_verd = wb.add_format({'bold':True,'align':'center','border':1,'bg_color':'#92D050'})
+        f_gris = wb.add_format({'bold':True,'align':'center','border':1,'bg_color':'#F2F2F2'})
+        f_num = wb.add_format({'num_format':'_-$ * #,##0.00_-','border':1})
+        f_tot = wb.add_format({'bold':True,'num_format':'_-$ * #,##0.00_-','border':1,'bg_color':'#EFEFEF'})
+        
+        texto_pie = "&LGenerado por RAPIDITO AI&Rrapidito.ec"
+        meses = ["ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO", "JULIO", "AGOSTO", "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"]
+
+        # === MODO SRI ===
+        if sri_mode:
+            df = pd.DataFrame(data_sri_lista)
+            if sri_mode == "NC":
+                cols = ["NOMBRE","RUC","N AUTORIZACION","FECHA","TIPO DE DOCUMENTO","N. FACTURA","MES","RUC CLIENTE","CLIENTE","PROPINAS","BASE. 0","NO OBJ IVA","BASE. 12 / 15","IVA.","TOTAL"]
+                fmt_h = f_amar; sh_nm = "NOTAS DE CREDITO"
+            elif sri_mode == "RET":
+                cols = ["RUC CLIENTE", "CLIENTE", "fechaemi", "NOMBRE", "RUC", "numfact", "numreten", "baserenta", "rt_renta", "baseiva", "rt_iva", "N AUTORIZACION"]
+                fmt_h = f_verd; sh_nm = "RETENCIONES"
+            else:
+                cols = ["MES","FECHA","N. FACTURA","TIPO DE DOCUMENTO","RUC","CONTRIBUYENTE","NOMBRE","DETALLE","MEMO","OTRA BASE IVA","OTRO IVA","MONTO ICE","PROPINAS","EXENTO DE IVA","NO OBJ IVA","BASE. 0","BASE. 12 / 15","IVA.","TOTAL","SUBDETALLE"]
+                fmt_h = f_azul; sh_nm = "FACTURAS"
+            
+            for c in cols: 
+                if c not in df.columns: df[c] = ""
+            ws = wb.add_worksheet(sh_nm)
+            ws.set_footer(texto_pie)
+            for i, c in enumerate(cols): ws.write(0, i, c, fmt_h)
+            for r, row in enumerate(df[cols].values, 1):
+                for c, v in enumerate(row): ws.write(r, c, v, f_num if isinstance(v, (float,int)) else wb.add_format({'border':1}))
+            ws.set_column(0, len(cols)-1, 15)
+
+        # === MODO MANUAL (CON CÁLCULOS) ===
+        else:
+            if data_compras:
+                df_c = pd.DataFrame(data_compras)
+                orden_c = ["MES","FECHA","N. FACTURA","TIPO DE DOCUMENTO","RUC","CONTRIBUYENTE","NOMBRE","DETALLE","MEMO","OTRA BASE IVA","OTRO IVA","MONTO ICE","PROPINAS","EXENTO DE IVA","NO OBJ IVA","BASE. 0","BASE. 12 / 15","IVA.","TOTAL","SUBDETALLE"]
+                for c in orden_c: 
+                    if c not in df_c.columns: df_c[c] = ""
+                ws_c = wb.add_worksheet('COMPRAS')
+                ws_c.set_footer(texto_pie)
+                for i, c in enumerate(orden_c): ws_c.write(0, i, c, f_amar if i in range(9, 15) else f_azul)
+                for r, row in enumerate(df_c[orden_c].values, 1):
+                    for c, v in enumerate(row): ws_c.write(r, c, v, f_num if isinstance(v, (float,int)) else wb.add_format({'border':1}))
+                
+                # TOTALES COMPRAS
+                ft = len(df_c) + 1; ws_c.write(ft, 0, "TOTAL", f_tot)
+                for ci in range(9, 19):
+                    l = xlsxwriter.utility.xl_col_to_name(ci)
+                    ws_c.write_formula(ft, ci, f"=SUM({l}2:{l}{ft})", f_tot)
+
+                # REPORTE ANUAL
+                ws_ra = wb.add_worksheet('REPORTE ANUAL')
+                ws_ra.set_footer(texto_pie)
+                ws_ra.set_column('A:K', 14)
+                ws_ra.merge_range('B1:B2', "Negocios y\nServicios", f_azul)
+                cats=["VIVIENDA","SALUD","EDUCACION","ALIMENTACION","VESTIMENTA","TURISMO","NO DEDUCIBLE","SERVICIOS BASICOS"]
+                icos=["🏠","❤️","🎓","🛒","🧢","✈️","🚫","💡"]
+                for i,(ct,ic) in enumerate(zip(cats,icos)):
+                    ws_ra.write(0,i+2,ic,f_azul); ws_ra.write(1,i+2,ct.title(),f_azul)
+                ws_ra.merge_range('K1:K2',"Total Mes",f_azul); ws_ra.write('B3',"PROFESIONALES",f_gris); ws_ra.merge_range('C3:J3',"GASTOS PERSONALES",f_gris)
+                
+                # Columnas de sumatoria: P(BASE 0), Q(BASE 12), O(NO OBJ), N(EXENTO), J(OTRA BASE), M(PROPINA)
+                cl_sum = ["P","Q","O","N","J","M"]
+                for r, mes in enumerate(meses):
+                    f_idx = r+4
+                    ws_ra.write(r+3, 0, mes.title(), f_num)
+                    # Suma Profesionales
+                    f_pr = "+".join([f"SUMIFS('COMPRAS'!${l}:${l},'COMPRAS'!$A:$A,\"{mes}\",'COMPRAS'!$I:$I,\"PROFESIONAL\")" for l in cl_sum])
+                    ws_ra.write_formula(r+3, 1, "="+f_pr, f_num)
+                    # Suma por categorías
+                    for cidx, ct in enumerate(cats):
+                        f_ct = "+".join([f"SUMIFS('COMPRAS'!${l}:${l},'COMPRAS'!$A:$A,\"{mes}\",'COMPRAS'!$H:$H,\"{ct}\")" for l in cl_sum])
+                        ws_ra.write_formula(r+3, cidx+2, "="+f_ct, f_num)
+                    ws_ra.write_formula(r+3, 10, f"=SUM(B{f_idx}:J{f_idx})", f_num)
+                ws_ra.write(15, 0, "TOTAL", f_tot)
+                for c in range(1,11):
+                    l = xlsxwriter.utility.xl_col_to_name(c)
+                    ws_ra.write_formula(15, c, f"=SUM({l}4:{l}15)", f_tot)
+
+            if data_ventas_ret:
+                df_v = pd.DataFrame(data_ventas_ret)
+                ord_v = ["MES","FECHA","N. FACTURA","RUC","CLIENTE","DETALLE","MEMO","MONTO REEMBOLS","BASE. 0","BASE. 12 / 15","IVA","TOTAL","FECHA RET","N° RET","N° AUTORIZACIÓN","RET RENTA","RET IVA","ISD","TOTAL RET"]
+                for c in ord_v: 
+                    if c not in df_v.columns: df_v[c] = ""
+                ws_v = wb.add_worksheet('VENTAS')
+                for i, c in enumerate(ord_v): ws_v.write(0, i, c, f_verd if i >= 12 else f_azul)
+                for r, row in enumerate(df_v[ord_v].values, 1):
+                    for c, v in enumerate(row): ws_v.write(r, c, v, f_num if isinstance(v, (float,int)) else wb.add_format({'border':1}))
+                
+                # PROYECCION
+                ws_p = wb.add_worksheet('PROYECCION')
+                ws_p.set_column('A:M', 15)
+                for i, h in enumerate(["VENTAS", "COMPRAS", "TOTAL"]): ws_p.write(i+2, 0, h, f_azul)
+                for c, mes in enumerate(meses):
+                    col = c + 1; l = xlsxwriter.utility.xl_col_to_name(col)
+                    ws_p.write(1, col, mes, f_azul)
+                    ws_p.write_formula(2, col, f"=SUMIFS(VENTAS!$I:$I,VENTAS!$A:$A,\"{mes}\") + SUMIFS(VENTAS!$J:$J,VENTAS!$A:$A,\"{mes}\")", f_num)
+                    if data_compras:
+                        f_cp = "+".join([f"SUMIFS('COMPRAS'!${x}:${x},'COMPRAS'!$A:$A,{l}$2,'COMPRAS'!$I:$I,\"PROFESIONAL\")" for x in cl_sum])
+                        ws_p.write_formula(3, col, "="+f_cp, f_num)
+                    ws_p.write_formula(4, col, f"={l}3-{l}4", f_tot)
+
+    return output.getvalue()
+
+
+def filas_compras(n, rnd):
+    out = []
+    for i in range(n):
+        mes = rnd.randint(1, 12); b0, b12 = round(rnd.uniform(0, 300), 2), round(rnd.uniform(0, 900), 2)
+        out.append({"TIPO": "FC", "TIPO DE DOCUMENTO": "FC", "FECHA": f"15/{mes:02d}/2024", "N. FACTURA": f"001-001-{i:09d}",
+                    "RUC": f"17{i:011d}", "CONTRIBUYENTE": "1712345678", "NOMBRE": f"PROVEEDOR {i % 500}", "RUC CLIENTE": "1712345678",
+                    "CLIENTE": "CONTRIBUYENTE DEMO", "DETALLE": rnd.choice(CATEGORIAS + ["OTROS"]), "MEMO": rnd.choice(["PERSONAL", "PROFESIONAL"]),
+                    "N AUTORIZACION": f"{i:049d}", "MES": MESES[mes - 1], "OTRA BASE IVA": 0.0, "OTRO IVA": 0.0, "MONTO ICE": 0.0,
+                    "PROPINAS": 0.0, "EXENTO DE IVA": 0.0, "NO OBJ IVA": 0.0, "BASE. 0": b0, "BASE. 12 / 15": b12, "IVA.": round(b12 * 0.15, 2),
+                    "TOTAL": round(b0 + b12 * 1.15, 2), "SUBDETALLE": "ITEM A | ITEM B"})
+    return out
+
+def filas_ventas(n, rnd):
+    out = []
+    for i in range(n):
+        b12 = round(rnd.uniform(10, 900), 2)
+        out.append({"MES": rnd.choice(MESES), "FECHA": "10/03/2024", "N. FACTURA": f"001-001-{i:09d}", "RUC": f"17{i:011d}",
+                    "CLIENTE": f"CLIENTE {i % 700}", "DETALLE": "SERVICIOS", "MEMO": "PROFESIONAL", "MONTO REEMBOLS": 0.0, "BASE. 0": 0.0,
+                    "BASE. 12 / 15": b12, "IVA": round(b12 * 0.15, 2), "TOTAL": round(b12 * 1.15, 2), "FECHA RET": "12/03/2024",
+                    "N° RET": f"001-002-{i:09d}", "N° AUTORIZACIÓN": f"{i:049d}", "RET RENTA": round(b12 * 0.02, 2),
+                    "RET IVA": round(b12 * 0.15 * 0.3, 2), "ISD": 0.0, "TOTAL RET": round(b12 * 0.065, 2)})
+    return out
+
+def filas_retenciones(n, rnd):
+    return [{"TIPO": "RET", "RUC CLIENTE": "1790012345001", "CLIENTE": "CLIENTE DEMO", "fechaemi": "12/03/2024", "NOMBRE": f"AGENTE {i % 300}",
+             "RUC": f"17{i:011d}", "numfact": f"001-001-{i:09d}", "numreten": f"001-002-{i:09d}", "baserenta": 100.0, "rt_renta": 2.0,
+             "baseiva": 15.0, "rt_iva": 4.5, "N AUTORIZACION": f"{i:049d}"} for i in range(n)]
+
+
+HOJAS = {
+    "FACTURAS": lambda d: dict(data_sri_lista=d["compras"], sri_mode="FC"),
+    "COMPRAS": lambda d: dict(data_compras=d["compras"]),
+    "VENTAS": lambda d: dict(data_ventas_ret=d["ventas"]),
+    "RETENCIONES": lambda d: dict(data_sri_lista=d["ret"], sri_mode="RET"),
+}
+
+def datos(n):
+    rnd = random.Random(7)
+    return {"compras": filas_compras(n, rnd), "ventas": filas_ventas(n, rnd), "ret": filas_retenciones(n, rnd)}
+
+
+def celdas(contenido, data_only=False):
+    import openpyxl
+    wb = openpyxl.load_workbook(io.BytesIO(contenido), data_only=data_only)
+    return {ws.title: [[c.value for c in fila] for fila in ws.iter_rows()] for ws in wb.worksheets}
+
+
+# --- Evaluador mínimo de las fórmulas del reporte (SUMIFS, SUM, referencias y +/-) ---
+_RE_REF = re.compile(r"^(?:'?([^'!]+)'?!)?\$?([A-Z]+)\$?(\d*)(?::\$?([A-Z]+)\$?(\d*))?$")
+
+def _col(letras):
+    n = 0
+    for ch in letras: n = n * 26 + ord(ch) - 64
+    return n - 1
+
+def _partir(texto, seps):
+    partes, nivel, comillas, actual, ops = [], 0, False, "", ["+"]
+    for ch in texto:
+        if ch == '"': comillas = not comillas
+        elif not comillas and ch == "(": nivel += 1
+        elif not comillas and ch == ")": nivel -= 1
+        if not comillas and nivel == 0 and ch in seps:
+            partes.append(actual.strip()); ops.append(ch); actual = ""
+        else: actual += ch
+    partes.append(actual.strip())
+    return partes, ops[:len(partes)]
+
+class Evaluador:
+    def __init__(self, libro): self.libro = libro
+
+    def celda(self, hoja, f, c):
+        filas = self.libro[hoja]
+        v = filas[f][c] if f < len(filas) and c < len(filas[f]) else None
+        if isinstance(v, str) and v.startswith("="): return self.formula(hoja, v[1:])
+        return v
+
+    def rango(self, hoja, ref):
+        m = _RE_REF.match(ref.strip()); h = m.group(1) or hoja
+        c1, c2 = _col(m.group(2)), _col(m.group(4) or m.group(2))
+        f1 = int(m.group(3)) - 1 if m.group(3) else 0
+        f2 = int(m.group(5) or m.group(3)) - 1 if (m.group(5) or m.group(3)) else len(self.libro[h]) - 1
+        return h, [(f, c) for f in range(f1, f2 + 1) for c in range(c1, c2 + 1)]
+
+    def valor(self, hoja, ref):
+        h, (fc,) = self.rango(hoja, ref)
+        return self.celda(h, *fc)
+
+    def formula(self, hoja, texto):
+        partes, ops = _partir(texto, "+-")
+        total = 0.0
+        for op, t in zip(ops, partes):
+            v = self.termino(hoja, t)
+            total = total + v if op == "+" else total - v
+        return total
+
+    def termino(self, hoja, t):
+        num = lambda v: float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else 0.0
+        if t.startswith("SUMIFS("):
+            args, _ = _partir(t[7:-1], ",")
+            hs, suma = self.rango(hoja, args[0]); total = 0.0
+            criterios = []
+            for rg, crit in zip(args[1::2], args[2::2]):
+                crit = crit[1:-1] if crit.startswith('"') else self.valor(hoja, crit)
+                criterios.append((self.rango(hoja, rg)[1], str(crit).upper()))
+            for i, (f, c) in enumerate(suma):
+                if all(isinstance(self.celda(hs, *rg[i]), str) and self.celda(hs, *rg[i]).upper() == crit for rg, crit in criterios):
+                    total += num(self.celda(hs, f, c))
+            return total
+        if t.startswith("SUM("):
+            h, celdas_ = self.rango(hoja, t[4:-1])
+            return sum(num(self.celda(h, f, c)) for f, c in celdas_)
+        return num(self.valor(hoja, t))
+
+
+def comprobar_resumenes(muestra):
+    """REPORTE ANUAL y PROYECCION: valores nuevos == fórmulas SUMIFS de columna completa del
+    generador anterior, y lo mismo para las fórmulas acotadas (y su valor en caché) con formulas=True."""
+    kw = dict(data_compras=muestra["compras"], data_ventas_ret=muestra["ventas"])
+    viejo = celdas(generar_legado(**kw)); ev_viejo = Evaluador(viejo)
+    nuevo_v = celdas(generar_excel_multiexcel(**kw))
+    con_f = generar_excel_multiexcel(**kw, formulas=True)
+    nuevo_f, cache_f = celdas(con_f), celdas(con_f, data_only=True); ev_nuevo = Evaluador(nuevo_f)
+    for hoja in ("REPORTE ANUAL", "PROYECCION"):
+        for f, fila in enumerate(viejo[hoja]):
+            for c, v in enumerate(fila):
+                if not (isinstance(v, str) and v.startswith("=")): continue
+                esperado = ev_viejo.celda(hoja, f, c)
+                for obtenido in (nuevo_v[hoja][f][c], ev_nuevo.celda(hoja, f, c), cache_f[hoja][f][c]):
+                    assert abs(esperado - obtenido) < 1e-6, (hoja, f, c, esperado, obtenido)
+
+
+def medir(fn, kwargs):
+    gc.collect(); t = time.perf_counter(); contenido = fn(**kwargs); dt = time.perf_counter() - t
+    gc.collect(); tracemalloc.start(); fn(**kwargs); pico = tracemalloc.get_traced_memory()[1]; tracemalloc.stop()
+    return dt, pico, len(contenido)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--filas", default="10000,100000")
+    ap.add_argument("--sin-legado", action="store_true", help="no medir el generador anterior (lento con 100k filas)")
+    a = ap.parse_args()
+
+    muestra = datos(300)
+    # Casos que las fórmulas tratan de forma particular: criterios en minúsculas, texto en una
+    # columna sumada (SUMIFS lo ignora) y filas sin mes
+    muestra["compras"][0]["MEMO"] = "profesional"; muestra["compras"][1]["DETALLE"] = "Salud"
+    muestra["compras"][2]["BASE. 0"] = "12.50"; muestra["compras"][3]["MES"] = ""; muestra["ventas"][0]["MES"] = "marzo"
+    for hoja, kw in HOJAS.items():
+        for cm in (False, True):
+            assert celdas(generar_legado(**kw(muestra)))[hoja] == celdas(generar_excel_multiexcel(**kw(muestra), memoria_constante=cm))[hoja], hoja
+    print("Celdas de datos idénticas en ambos generadores (normal y constant_memory)")
+    comprobar_resumenes(muestra)
+    print("REPORTE ANUAL y PROYECCION coinciden con las fórmulas SUMIFS anteriores\n")
+
+    print(f"{'hoja':<12} {'filas':>7} {'motor':<16} {'seg':>8} {'pico MB':>9} {'xlsx MB':>8}")
+    for n in [int(x) for x in a.filas.split(",")]:
+        d = datos(n)
+        for hoja, kw in HOJAS.items():
+            motores = [("nuevo", lambda **k: generar_excel_multiexcel(**k, memoria_constante=False)),
+                       ("nuevo+constante", lambda **k: generar_excel_multiexcel(**k, memoria_constante=True))]
+            if not a.sin_legado: motores.insert(0, ("anterior", generar_legado))
+            for nombre, fn in motores:
+                dt, pico, tam = medir(fn, kw(d))
+                print(f"{hoja:<12} {n:>7} {nombre:<16} {dt:>8.2f} {pico/1048576:>9.1f} {tam/1048576:>8.2f}")
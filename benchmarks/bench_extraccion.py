@@ -0,0 +1,152 @@
+"""Benchmark de extracción: recorrido único (rapidito.extraccion) frente al motor anterior.
+
+Uso: python benchmarks/bench_extraccion.py [--n 5000] [--repeticiones 7] [--lineas 1 8]
+
+Antes de medir comprueba que ambos motores producen exactamente las mismas filas
+para facturas, notas de crédito, retenciones (v1 y v2) y liquidaciones, envueltas
+en la respuesta SOAP del SRI y sueltas.
+"""
+import argparse
+import io
+import os
+import random
+import re
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rapidito.extraccion import extraer_datos_robusto
+from generador import documento
+
+
+# Motor anterior (una búsqueda .// por campo), conservado solo como referencia
+def extraer_legado(xml_file, empresas):
+    try:
+        xml_file.seek(0); tree = ET.parse(xml_file); root = tree.getroot(); xml_data = None
+        for elem in root.iter():
+            if 'comprobante' in elem.tag.lower() and elem.text and "<" in elem.text:
+                xml_data = ET.fromstring(re.sub(r'<\?xml.*?\?>', '', elem.text).strip()); break
+        if xml_data is None: xml_data = root
+
+        def buscar(tags):
+            for t in tags:
+                f = xml_data.find(f".//{t}")
+                if f is not None and f.text: return f.text.strip()
+            return ""
+
+        tipo = "NC" if "notacredito" in xml_data.tag.lower() else "RET" if "retencion" in xml_data.tag.lower() else "LC" if "liquidacion" in xml_data.tag.lower() else "FC"
+        razon_social = buscar(["razonSocial"]).upper()
+        ruc_emisor = buscar(["ruc"])
+        num_fact = f"{buscar(['estab']) or '000'}-{buscar(['ptoEmi']) or '000'}-{buscar(['secuencial']) or '000'}"
+        fecha = buscar(["fechaEmision"])
+        ruc_cli = buscar(["identificacionComprador", "identificacionSujetoRetenido"])
+        nom_cli = buscar(["razonSocialComprador", "razonSocialSujetoRetenido"]).upper()
+
+        len_id = len(ruc_cli)
+        info_json = empresas.get(razon_social)
+        
+        # Lógica de clasificación solicitada
+        if len_id == 10:
+            memo_final = "PERSONAL"
+            detalle_final = info_json["DETALLE"] if info_json else "NO DEDUCIBLE"
+        else:
+            detalle_final = info_json["DETALLE"] if info_json else "OTROS"
+            memo_final = info_json["MEMO"] if info_json else "PROFESIONAL"
+
+        # 1. Calculamos la autorización ANTES de definir el diccionario
+        aut_ws = root.findtext(".//numeroAutorizacion")
+        aut_cdata = buscar(["claveAcceso"])
+        autorizacion_final = aut_ws if aut_ws else aut_cdata
+
+        # 2. Definimos el diccionario de forma limpia
+        data = {
+            "TIPO": tipo, 
+            "TIPO DE DOCUMENTO": tipo, 
+            "FECHA": fecha, 
+            "N. FACTURA": num_fact,
+            "RUC": ruc_emisor, 
+            "CONTRIBUYENTE": ruc_cli, 
+            "NOMBRE": razon_social,
+            "RUC CLIENTE": ruc_cli, 
+            "CLIENTE": nom_cli, 
+            "DETALLE": detalle_final, 
+            "MEMO": memo_final,
+            "N AUTORIZACION": autorizacion_final
+        }
+        
+        if "/" in fecha:
+            ms = {"01":"ENERO","02":"FEBRERO","03":"MARZO","04":"ABRIL","05":"MAYO","06":"JUNIO","07":"JULIO","08":"AGOSTO","09":"SEPTIEMBRE","10":"OCTUBRE","11":"NOVIEMBRE","12":"DICIEMBRE"}
+            data["MES"] = ms.get(fecha.split('/')[1], "DESCONOCIDO")
+
+        if tipo == "RET":
+            r_renta, r_iva, b_renta, b_iva = 0.0, 0.0, 0.0, 0.0
+            node = xml_data.find(".//numDocSustento")
+            sus = node.text.replace('-','') if (node is not None and node.text) else ""
+            if len(sus) >= 15: sus = f"{sus[0:3]}-{sus[3:6]}-{sus[6:]}"
+            for item in (xml_data.findall(".//impuesto") + xml_data.findall(".//retencion")):
+                try:
+                    c, v, b = item.find("codigo").text, float(item.find("valorRetenido").text or 0), float(item.find("baseImponible").text or 0)
+                    if c == "1": r_renta += v; b_renta += b
+                    elif c == "2": r_iva += v; b_iva += b
+                except: continue
+            data.update({"numfact": sus, "numreten": num_fact, "baserenta": b_renta, "rt_renta": r_renta, "baseiva": b_iva, "rt_iva": r_iva, "TOTAL RET": r_renta+r_iva, "SUSTENTO": sus, "fechaemi": fecha})
+        else:
+            m = -1 if tipo == "NC" else 1
+            b0, b12, i12, ice, prop, no_obj, exento, otra_b, otro_i = 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0
+            for imp in xml_data.findall(".//totalImpuesto"):
+                try:
+                    c, cp = imp.find("codigo").text, imp.find("codigoPorcentaje").text
+                    b, v = float(imp.find("baseImponible").text or 0)*m, float(imp.find("valor").text or 0)*m
+                    if c == "2":
+                        if cp == "0": b0 += b
+                        elif cp in ["2","3","4","8","10"]: b12 += b; i12 += v
+                        elif cp == "6": no_obj += b
+                        elif cp == "7": exento += b
+                        else: otra_b += b; otro_i += v
+                    elif c == "3": ice += v
+                except: continue
+            
+            total_val = 0.0
+            for t_tag in ["importeTotal", "total", "valorModificado"]:
+                f = xml_data.find(f".//{t_tag}")
+                if f is not None: total_val = float(f.text) * m; break
+            
+            p_node = xml_data.find(".//propina")
+            prop = float(p_node.text or 0) * m if p_node is not None else 0.0
+
+            items = [d.find("descripcion").text for d in xml_data.findall(".//detalle") if d.find("descripcion") is not None]
+            data.update({"OTRA BASE IVA": otra_b, "OTRO IVA": otro_i, "MONTO ICE": ice, "PROPINAS": prop, "EXENTO DE IVA": exento, "NO OBJ IVA": no_obj, "BASE. 0": b0, "BASE. 12 / 15": b12, "IVA.": i12, "TOTAL": total_val, "SUBDETALLE": " | ".join(items[:5])})
+        return data
+    except: return None
+
+
+def medir(motores, docs, empresas, repeticiones):
+    """Archivos/s de cada motor (mejor de `repeticiones`), alternándolos para que el ruido de
+    la máquina afecte a todos por igual."""
+    mejor = [float("inf")] * len(motores)
+    for _ in range(repeticiones):
+        for k, fn in enumerate(motores):
+            t = time.perf_counter()
+            for d in docs: fn(io.BytesIO(d), empresas)
+            mejor[k] = min(mejor[k], time.perf_counter() - t)
+    return [len(docs) / dt for dt in mejor]
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=5000)
+    ap.add_argument("--repeticiones", type=int, default=7)
+    ap.add_argument("--lineas", type=int, nargs=2, default=(1, 8), metavar=("MIN", "MAX"), help="líneas de detalle por comprobante")
+    a = ap.parse_args()
+    rnd = random.Random(1234)
+    docs = [documento(i, rnd, lineas=tuple(a.lineas)) for i in range(a.n)]
+    empresas = {"SUPERMAXI S.A.": {"DETALLE": "ALIMENTACION", "MEMO": "PERSONAL"}}
+    for d in docs:
+        viejo, nuevo = extraer_legado(io.BytesIO(d), empresas), extraer_datos_robusto(io.BytesIO(d), empresas)
+        del nuevo["CLASIFICACION"], nuevo["SIMILITUD"]  # columnas nuevas, sin equivalente en el motor anterior
+        assert viejo == nuevo and list(viejo) == list(nuevo), (viejo, nuevo)
+    print(f"{a.n} documentos, filas idénticas en ambos motores")
+    antes, despues = medir([extraer_legado, extraer_datos_robusto], docs, empresas, a.repeticiones)
+    print(f"antes:   {antes:10.0f} archivos/s")
+    print(f"después: {despues:10.0f} archivos/s  (x{despues/antes:.2f})")
@@ -0,0 +1,205 @@
+"""Comprobantes sintéticos del SRI para benchmarks y pruebas sin datos reales.
+
+Genera facturas, liquidaciones de compra, notas de crédito y retenciones (v1 y v2) con
+claveAcceso válida (dígito verificador módulo 11), sueltas o envueltas en la respuesta SOAP
+de autorización con el comprobante en CDATA, con número de líneas de detalle y mezcla de
+tarifas de IVA configurables. También arma ventas con sus retenciones (para el cruce), el
+TXT de claves del portal del SRI y ZIP anidados. Todo es determinista para una semilla.
+
+    from generador import documento, documentos, zip_anidado
+    docs = documentos(1000, semilla=1)
+"""
+import io
+import os
+import random
+import sys
+import zipfile
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from rapidito.mock_sri import respuesta_autorizacion
+from rapidito.sri import digito_verificador
+
+PROVEEDORES = ["SUPERMAXI S.A.", "FARMACIA CRUZ AZUL", "CONSULTORES CIA LTDA"]
+# TIPO -> (etiqueta raíz, codDoc)
+TIPOS = {"FC": ("factura", "01"), "LC": ("liquidacionCompra", "03"), "NC": ("notaCredito", "04"), "RET": ("comprobanteRetencion", "07")}
+# Reparto por defecto cuando no se indica el tipo (i % 5): FC, NC, RET v1, RET v2, LC
+_CICLO = [("FC", None), ("NC", None), ("RET", "1.0.0"), ("RET", "2.0.0"), ("LC", None)]
+# codigoPorcentaje de IVA -> peso: 0%, 12%, 15%, no objeto, exento y 5% (un 10% de las líneas salen como ICE, código 3)
+MEZCLA_IVA = {"0": 1, "2": 1, "4": 1, "6": 1, "7": 1, "5": 1}
+TARIFA = {"0": 0.0, "2": 0.12, "3": 0.14, "4": 0.15, "5": 0.05, "6": 0.0, "7": 0.0, "8": 0.08, "10": 0.13}
+
+
+def clave_acceso(fecha, cod_doc, ruc, estab="001", pto_emi="002", secuencial=1, ambiente="2", codigo="12345678", emision="1"):
+    """claveAcceso de 49 dígitos con su dígito verificador."""
+    base = f"{fecha:%d%m%Y}{cod_doc}{ruc}{ambiente}{estab}{pto_emi}{int(secuencial):09d}{codigo}{emision}"
+    return base + str(digito_verificador(base))
+
+
+def _ruc(rnd):
+    return f"17{rnd.randint(10**7, 10**8 - 1)}001"
+
+def _trib(rs, ruc, cod, clave, secuencial, estab="001", pto="002"):
+    return (f"<infoTributaria><ambiente>2</ambiente><razonSocial>{rs}</razonSocial><ruc>{ruc}</ruc>"
+            f"<claveAcceso>{clave}</claveAcceso><codDoc>{cod}</codDoc><estab>{estab}</estab><ptoEmi>{pto}</ptoEmi>"
+            f"<secuencial>{int(secuencial):09d}</secuencial></infoTributaria>")
+
+def _impuestos(rnd, mezcla, cantidad=(1, 3)):
+    cps, pesos = list(mezcla), list(mezcla.values())
+    out = ""
+    for _ in range(rnd.randint(*cantidad)):
+        cp = rnd.choices(cps, pesos)[0]; base = round(rnd.uniform(1, 500), 2)
+        cod = "3" if rnd.random() < 0.1 else "2"
+        out += (f"<totalImpuesto><codigo>{cod}</codigo><codigoPorcentaje>{cp}</codigoPorcentaje><baseImponible>{base}</baseImponible>"
+                f"<valor>{round(base * TARIFA.get(cp, 0.15), 2)}</valor></totalImpuesto>")
+    return out
+
+def _detalles(rnd, lineas):
+    return "<detalles>" + "".join(f"<detalle><codigoPrincipal>P{k}</codigoPrincipal><descripcion>ITEM {k}</descripcion><cantidad>1</cantidad>"
+                                  f"<precioUnitario>{rnd.uniform(1, 90):.2f}</precioUnitario></detalle>" for k in range(rnd.randint(*lineas))) + "</detalles>"
+
+
+def comprobante(i, rnd, tipo=None, version=None, lineas=(1, 8), impuestos=(1, 3), mezcla=MEZCLA_IVA,
+                emisor=None, receptor=None, sustento=None, fecha=None):
+    """(claveAcceso, XML del comprobante). `tipo` es FC, LC, NC o RET (por defecto rota con i);
+    `emisor`/`receptor` son (razón social, RUC o cédula); `sustento` es el número de la factura
+    que sustenta una retención; `version` 1.0.0 o 2.0.0 para retenciones."""
+    if tipo is None: tipo, version = _CICLO[i % 5]
+    raiz, cod = TIPOS[tipo]
+    rs, ruc = emisor or (rnd.choice(PROVEEDORES), _ruc(rnd))
+    nom_cli, cli = receptor or (f"CLIENTE {i}", rnd.choice(["1712345678", "1790012345001"]))
+    fecha = fecha or date(2024, rnd.randint(1, 12), rnd.randint(1, 28))
+    clave = clave_acceso(fecha, cod, ruc, secuencial=i)
+    trib, f = _trib(rs, ruc, cod, clave, i), f"{fecha:%d/%m/%Y}"
+    if tipo in ("FC", "LC"):
+        info = "infoFactura" if tipo == "FC" else "infoLiquidacionCompra"
+        comp = (f'<{raiz} id="comprobante" version="1.1.0">{trib}<{info}><fechaEmision>{f}</fechaEmision>'
+                f"<razonSocialComprador>{nom_cli}</razonSocialComprador><identificacionComprador>{cli}</identificacionComprador>"
+                f"<totalConImpuestos>{_impuestos(rnd, mezcla, impuestos)}</totalConImpuestos><propina>0.00</propina>"
+                f"<importeTotal>{rnd.uniform(1, 900):.2f}</importeTotal></{info}>{_detalles(rnd, lineas)}</{raiz}>")
+    elif tipo == "NC":
+        comp = (f'<{raiz} id="comprobante" version="1.1.0">{trib}<infoNotaCredito><fechaEmision>{f}</fechaEmision>'
+                f"<razonSocialComprador>{nom_cli}</razonSocialComprador><identificacionComprador>{cli}</identificacionComprador>"
+                f"<valorModificado>{rnd.uniform(1, 90):.2f}</valorModificado><totalConImpuestos>{_impuestos(rnd, mezcla, impuestos)}</totalConImpuestos>"
+                f"</infoNotaCredito>{_detalles(rnd, lineas)}</{raiz}>")
+    else:
+        v1 = (version or "2.0.0") == "1.0.0"; tag = "impuesto" if v1 else "retencion"
+        lineas_ret = "".join(f"<{tag}><codigo>{c}</codigo><codigoRetencion>3{c}2</codigoRetencion><baseImponible>{rnd.uniform(10, 900):.2f}</baseImponible>"
+                             f"<porcentajeRetener>2</porcentajeRetener><valorRetenido>{rnd.uniform(1, 50):.2f}</valorRetenido></{tag}>" for c in ("1", "2", "1"))
+        sus = f"<numDocSustento>{sustento or f'001-001-{rnd.randint(1, 999999):09d}'}</numDocSustento>"
+        cuerpo = f"<impuestos>{lineas_ret}</impuestos>" if v1 else f"<docsSustento><docSustento>{sus}<retenciones>{lineas_ret}</retenciones></docSustento></docsSustento>"
+        comp = (f'<{raiz} id="comprobante" version="{"1.0.0" if v1 else "2.0.0"}">{trib}<infoCompRetencion>'
+                f"<fechaEmision>{f}</fechaEmision><razonSocialSujetoRetenido>{nom_cli}</razonSocialSujetoRetenido>"
+                f"<identificacionSujetoRetenido>{cli}</identificacionSujetoRetenido></infoCompRetencion>{sus if v1 else ''}{cuerpo}</{raiz}>")
+    return clave, '<?xml version="1.0" encoding="UTF-8"?>' + comp
+
+
+def documento(i, rnd, envuelto=None, **opciones):
+    """Bytes del comprobante i; `envuelto` (por defecto, los impares) lo devuelve dentro de la
+    respuesta SOAP de autorización. `opciones` van a comprobante()."""
+    clave, comp = comprobante(i, rnd, **opciones)
+    if envuelto is None: envuelto = i % 2 == 1
+    return (respuesta_autorizacion(clave, comp) if envuelto else comp).encode("utf-8")
+
+
+def documentos(n, semilla=1234, **opciones):
+    """Lista de n documentos (mezcla de tipos, mitad envueltos en SOAP)."""
+    rnd = random.Random(semilla)
+    return [documento(i, rnd, **opciones) for i in range(n)]
+
+
+def comprobantes_por_clave(n, semilla=1234, **opciones):
+    """{claveAcceso: XML} para servir desde rapidito.mock_sri.ServidorSRISimulado."""
+    rnd = random.Random(semilla)
+    return dict(comprobante(i, rnd, **opciones) for i in range(n))
+
+
+def ventas_con_retenciones(n, semilla=1234, con_retencion=0.7, dos_retenciones=0.05, huerfanas=0.02, envuelto=False):
+    """n documentos de un mismo contribuyente: facturas emitidas a clientes con RUC y las
+    retenciones que esos clientes le hicieron (con el número de la factura como sustento).
+    Una fracción de facturas queda sin retención, otra tiene dos y hay retenciones sin factura."""
+    rnd = random.Random(semilla)
+    propio = ("CONTRIBUYENTE DEMO", "1712345678001")
+    clientes = [(f"CLIENTE {k} S.A.", f"179{k:07d}001") for k in range(max(1, n // 50))]
+    out, i = [], 0
+    while len(out) < n:
+        cli = rnd.choice(clientes)
+        out.append(comprobante(i, rnd, "FC", emisor=propio, receptor=cli)); numero = f"001-002-{i:09d}"; i += 1
+        for _ in range((rnd.random() < con_retencion) + (rnd.random() < dos_retenciones)):
+            out.append(comprobante(i, rnd, "RET", rnd.choice(["1.0.0", "2.0.0"]), emisor=cli, receptor=propio, sustento=numero)); i += 1
+        if rnd.random() < huerfanas:
+            out.append(comprobante(i, rnd, "RET", emisor=cli, receptor=propio, sustento=f"001-002-{10**8 + i:09d}")); i += 1
+    return [(respuesta_autorizacion(clave, d) if envuelto else d).encode("utf-8") for clave, d in out[:n]]
+
+
+_APELLIDOS = ("GARCIA RODRIGUEZ LOPEZ MARTINEZ GONZALEZ PEREZ SANCHEZ RAMIREZ TORRES FLORES RIVERA GOMEZ DIAZ REYES MORALES "
+              "CRUZ ORTIZ GUTIERREZ CHAVEZ RAMOS VERA MENDOZA CASTILLO JIMENEZ MORENO ROMERO HERRERA MEDINA AGUILAR VARGAS "
+              "ZAMBRANO ANDRADE CEDENO VELEZ MOREIRA PAREDES SALAZAR ESPINOZA CEVALLOS MACIAS BRAVO VILLACIS PAZMINO ALVARADO "
+              "TAPIA SUAREZ LEON CARRERA NARANJO GUERRERO MOLINA BENITEZ CALDERON AYALA PALACIOS SALTOS QUISHPE CHICAIZA "
+              "GUAMAN TOAPANTA CAIZA YUMBO LOOR MERA ARIAS ACOSTA NAVARRETE ORDONEZ").split()
+_NOMBRES = ("JUAN MARIA JOSE LUIS CARLOS ANA JORGE ROSA PEDRO DIANA MIGUEL PAOLA DAVID ANDREA FERNANDO GABRIELA DIEGO "
+            "VERONICA PATRICIO CARMEN EDISON MONICA FRANKLIN SILVIA MARCO LORENA WILSON JESSICA HECTOR KARINA").split()
+_RUBROS = ("COMERCIAL DISTRIBUIDORA FARMACIA FERRETERIA SUPERMERCADO CONSTRUCTORA IMPORTADORA INDUSTRIA PANADERIA "
+           "LIBRERIA PAPELERIA RESTAURANTE HOTEL CLINICA LABORATORIO TRANSPORTES INVERSIONES SERVICIOS CONSULTORES "
+           "AGRICOLA AVICOLA TEXTIL MUEBLERIA AUTOMOTRIZ LUBRICADORA TECNOLOGIA SISTEMAS SOLUCIONES GRUPO CORPORACION").split()
+_PALABRAS = ("DEL PACIFICO ANDINA ECUADOR QUITO GUAYAQUIL CUENCA SIERRA COSTA ORIENTE NORTE SUR CENTRO NACIONAL "
+             "INTERNACIONAL LA ECONOMIA EL AHORRO SAN JOSE SANTA ROSA LOS ANDES DON BOSCO NUEVA ERA INTEGRAL "
+             "GLOBAL EXPRESS PLUS MEGA MAXI").split()
+_SOCIEDADES = ["S.A.", "CIA. LTDA.", "CIA LTDA", "S.A.S.", "C.A.", "", "", ""]
+
+
+def razones_sociales(n, semilla=1234):
+    """n razones sociales distintas con la forma de las del SRI: personas naturales (dos
+    apellidos y dos nombres) y sociedades (rubro, palabras comunes y forma societaria), con
+    los trigramas muy repetidos que eso implica."""
+    rnd, out, vistos = random.Random(semilla), [], set()
+    while len(out) < n:
+        if rnd.random() < 0.4: nombre = " ".join(rnd.sample(_APELLIDOS, 2) + rnd.sample(_NOMBRES, 2))
+        else:
+            partes = [rnd.choice(_RUBROS)] + rnd.sample(_PALABRAS + _APELLIDOS, rnd.randint(1, 3))
+            nombre = " ".join(partes + [rnd.choice(_SOCIEDADES)]).strip()
+        if nombre not in vistos: vistos.add(nombre); out.append(nombre)
+    return out
+
+
+def con_errores(nombre, rnd):
+    """El nombre como suele llegar en otro comprobante: una letra cambiada, quitada o repetida."""
+    i = rnd.randrange(len(nombre)); op = rnd.random()
+    if op < 0.4: return nombre[:i] + rnd.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") + nombre[i + 1:]
+    if op < 0.7: return nombre[:i] + nombre[i + 1:]
+    return nombre[:i] + nombre[i] + nombre[i:]
+
+
+def txt_claves(claves, semilla=1234):
+    """TXT como el que descarga el portal del SRI (columnas separadas por tabulador)."""
+    rnd = random.Random(semilla)
+    lineas = ["COMPROBANTE\tSERIE_COMPROBANTE\tRUC_EMISOR\tRAZON_SOCIAL_EMISOR\tFECHA_EMISION\tFECHA_AUTORIZACION\tTIPO_EMISION\t"
+              "IDENTIFICACION_RECEPTOR\tCLAVE_ACCESO\tNUMERO_AUTORIZACION\tIMPORTE_TOTAL"]
+    nombres = {"01": "Factura", "03": "Liquidación de compra", "04": "Notas de Crédito", "07": "Comprobante de Retención"}
+    for c in claves:
+        f = f"{c[0:2]}/{c[2:4]}/{c[4:8]}"
+        lineas.append(f"{nombres.get(c[8:10], 'Otro')}\t{c[24:27]}-{c[27:30]}-{c[30:39]}\t{c[10:23]}\t{rnd.choice(PROVEEDORES)}\t{f}\t{f} 10:00:00\t"
+                      f"NORMAL\t1712345678\t{c}\t{c}\t{rnd.uniform(1, 900):.2f}")
+    return "\r\n".join(lineas) + "\r\n"
+
+
+class _ArchivoSubido(io.BytesIO):
+    """Imita el UploadedFile de Streamlit (bytes con .name y .getvalue())."""
+    def __init__(self, contenido, name):
+        super().__init__(contenido); self.name = name
+
+
+def zip_anidado(docs, por_zip=1000, niveles=2, nombre="comprobantes.zip"):
+    """ZIP (como archivo subido) con los documentos repartidos en ZIP internos de `por_zip`
+    documentos, hasta `niveles` de profundidad."""
+    def armar(grupo, nivel):
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED, compresslevel=1) as z:
+            if nivel >= niveles:
+                for k, d in grupo: z.writestr(f"{k:07d}.xml", d)
+            else:
+                # cada ZIP del último nivel lleva `por_zip` documentos
+                paso = por_zip ** (niveles - nivel)
+                for j in range(0, len(grupo), paso): z.writestr(f"lote_{j // paso:04d}.zip", armar(grupo[j:j + paso], nivel + 1))
+        return buf.getvalue()
+    return _ArchivoSubido(armar(list(enumerate(docs)), 1), nombre)
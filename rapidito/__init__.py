@@ -0,0 +1,48 @@
+"""Motor contable de RAPIDITO AI (sin interfaz Streamlit).
+
+Los nombres públicos se importan al primer uso, así `python -m rapidito` y los procesos
+de trabajo no pagan pandas, xlsxwriter ni requests si no los necesitan.
+
+    from rapidito import extraer_datos_robusto, procesar_ventas_con_retenciones, generar_excel_multiexcel
+"""
+import importlib
+
+_EXPORTS = {
+    "extraer_datos_robusto": "rapidito.extraccion",
+    "extraer_fila": "rapidito.extraccion",
+    "clasificar": "rapidito.clasificacion",
+    "IndiceEmpresas": "rapidito.clasificacion",
+    "extraer_lote": "rapidito.paralelo",
+    "procesar_archivos_entrada": "rapidito.entrada",
+    "LimiteEntradaExcedido": "rapidito.entrada",
+    "procesar_ventas_con_retenciones": "rapidito.ventas",
+    "cruzar_ventas_retenciones": "rapidito.ventas",
+    "generar_excel_multiexcel": "rapidito.excel",
+    "particionar": "rapidito.multicliente",
+    "generar_zip_clientes": "rapidito.multicliente",
+    "DescargadorSRI": "rapidito.sri",
+    "extraer_claves": "rapidito.sri",
+    "decodificar_clave": "rapidito.sri",
+    "filtrar_claves": "rapidito.sri",
+    "obtener_cache": "rapidito.cache",
+    "obtener_memoria": "rapidito.memoria",
+    "obtener_gestor": "rapidito.trabajos",
+    "obtener_artefactos": "rapidito.artefactos",
+    "obtener_metricas": "rapidito.metricas",
+    "obtener_telemetria": "rapidito.telemetria",
+    "registrar_actividad": "rapidito.telemetria",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(nombre):
+    modulo = _EXPORTS.get(nombre)
+    if modulo is None: raise AttributeError(f"module 'rapidito' has no attribute {nombre!r}")
+    valor = getattr(importlib.import_module(modulo), nombre)
+    globals()[nombre] = valor
+    return valor
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,5 @@
+import sys
+
+from rapidito.cli import main
+
+sys.exit(main())
@@ -0,0 +1,58 @@
+"""Totales de REPORTE ANUAL y PROYECCION calculados en Python (groupby de pandas).
+
+Reproducen lo que calculaban las fórmulas SUMIFS sobre columnas completas de COMPRAS y
+VENTAS: el criterio de texto no distingue mayúsculas, y en el rango sumado solo cuentan las
+celdas numéricas (el texto y los vacíos valen 0).
+"""
+import pandas as pd
+
+MESES = ["ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO", "JULIO", "AGOSTO", "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"]
+CATEGORIAS = ["VIVIENDA","SALUD","EDUCACION","ALIMENTACION","VESTIMENTA","TURISMO","NO DEDUCIBLE","SERVICIOS BASICOS"]
+# Columnas de COMPRAS que suma el reporte: BASE 0, BASE 12, NO OBJ, EXENTO, OTRA BASE, PROPINA
+COLS_SUMA_COMPRAS = ["BASE. 0", "BASE. 12 / 15", "NO OBJ IVA", "EXENTO DE IVA", "OTRA BASE IVA", "PROPINAS"]
+COLS_SUMA_VENTAS = ["BASE. 0", "BASE. 12 / 15"]
+
+
+def _numero(serie):
+    """Como SUMIFS: los números cuentan y todo lo demás (texto, vacíos, NaN) vale 0."""
+    if pd.api.types.is_numeric_dtype(serie) and not pd.api.types.is_bool_dtype(serie): return serie.fillna(0.0).astype(float)
+    return serie.map(lambda v: float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) and v == v else 0.0)
+
+
+def _criterio(serie):
+    return serie.map(lambda v: v.upper() if isinstance(v, str) else None)
+
+
+def _marco(filas, cols_texto, cols_suma):
+    df = pd.DataFrame(filas)
+    for c in cols_texto + cols_suma:
+        if c not in df.columns: df[c] = ""
+    monto = sum((_numero(df[c]) for c in cols_suma), pd.Series(0.0, index=df.index))
+    return pd.DataFrame({**{c: _criterio(df[c]) for c in cols_texto}, "MONTO": monto})
+
+
+def totales_compras(data_compras):
+    """DataFrame MESES x ["PROFESIONAL"] + CATEGORIAS con la suma de las bases de compras."""
+    columnas = ["PROFESIONAL"] + CATEGORIAS
+    if not data_compras: return pd.DataFrame(0.0, index=MESES, columns=columnas)
+    df = _marco(data_compras, ["MES", "DETALLE", "MEMO"], COLS_SUMA_COMPRAS)
+    df = df[df["MES"].isin(MESES)]
+    prof = df[df["MEMO"] == "PROFESIONAL"].groupby("MES")["MONTO"].sum()
+    cats = df[df["DETALLE"].isin(CATEGORIAS)].groupby(["MES", "DETALLE"])["MONTO"].sum().unstack()
+    out = cats.reindex(index=MESES, columns=CATEGORIAS).fillna(0.0)
+    out.insert(0, "PROFESIONAL", prof.reindex(MESES).fillna(0.0))
+    return out
+
+
+def totales_ventas(data_ventas_ret):
+    """Serie por mes con BASE. 0 + BASE. 12 / 15 de las ventas."""
+    if not data_ventas_ret: return pd.Series(0.0, index=MESES)
+    df = _marco(data_ventas_ret, ["MES"], COLS_SUMA_VENTAS)
+    return df[df["MES"].isin(MESES)].groupby("MES")["MONTO"].sum().reindex(MESES).fillna(0.0)
+
+
+def totales_columnas(filas, cols):
+    """Suma de cada columna de `cols` con la misma regla (solo celdas numéricas)."""
+    if not filas: return {c: 0.0 for c in cols}
+    df = pd.DataFrame(filas)
+    return {c: float(_numero(df[c]).sum()) if c in df.columns else 0.0 for c in cols}
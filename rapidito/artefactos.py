@@ -0,0 +1,111 @@
+"""Archivos generados (Excel y ZIP) guardados en disco en vez de en la memoria de cada sesión.
+
+Cada artefacto se identifica por una clave (trabajo + huella de los datos de entrada), se
+genera una sola vez escribiendo directamente al archivo y se entrega como ruta para que
+el botón de descarga lo lea del disco. Los archivos que no se usan en `ttl` segundos o que
+exceden la cuota total (los menos usados primero) se borran, salvo los que alguna sesión
+está generando o leyendo en ese momento.
+"""
+import contextlib
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+RUTA_ARTEFACTOS = os.environ.get("RAPIDITO_ARTEFACTOS", os.path.join(tempfile.gettempdir(), "rapidito_artefactos"))
+TTL = float(os.environ.get("RAPIDITO_ARTEFACTOS_TTL_HORAS", 6)) * 3600
+MAX_BYTES = int(float(os.environ.get("RAPIDITO_ARTEFACTOS_MAX_MB", 1024)) * 1024 * 1024)
+
+
+def huella(*partes):
+    """Hash estable de datos de entrada (filas, bytes de archivos, opciones)."""
+    h = hashlib.blake2b(digest_size=16)
+    for p in partes:
+        h.update(p if isinstance(p, (bytes, bytearray, memoryview)) else pickle.dumps(p, protocol=4))
+    return h.hexdigest()
+
+
+class Artefactos:
+    def __init__(self, ruta=RUTA_ARTEFACTOS, ttl=TTL, max_bytes=MAX_BYTES):
+        self.ruta, self.ttl, self.max_bytes = ruta, ttl, max_bytes
+        os.makedirs(ruta, exist_ok=True)
+        self.lock = threading.Lock()
+        self._usos = {}  # ruta -> [lock de generación, sesiones que la generan o la leen]
+        self.generados = self.reutilizados = 0
+
+    def _ruta(self, clave, extension):
+        return os.path.join(self.ruta, f"{clave}.{extension}")
+
+    @contextlib.contextmanager
+    def _usando(self, ruta):
+        """Marca la ruta como en uso (limpiar() no la borra) y entrega su lock de generación."""
+        with self.lock:
+            uso = self._usos.setdefault(ruta, [threading.Lock(), 0]); uso[1] += 1
+        try: yield uso[0]
+        finally:
+            with self.lock:
+                uso[1] -= 1
+                if not uso[1]: del self._usos[ruta]
+
+    def obtener(self, clave, extension, generar):
+        """Ruta del artefacto; si no existe se crea con `generar(archivo)`, que escribe en el
+        archivo binario abierto que recibe. Dos sesiones pidiendo lo mismo lo generan una vez."""
+        ruta = self._ruta(clave, extension)
+        with self._usando(ruta) as lock, lock:
+            if os.path.exists(ruta):
+                os.utime(ruta); self.reutilizados += 1
+                return ruta
+            fd, tmp = tempfile.mkstemp(dir=self.ruta, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f: generar(f)
+                os.replace(tmp, ruta)
+            except BaseException:
+                if os.path.exists(tmp): os.remove(tmp)
+                raise
+            self.generados += 1
+        self.limpiar(conservar=ruta)
+        return ruta
+
+    @contextlib.contextmanager
+    def abrir(self, clave, extension, generar):
+        """Como obtener(), pero entrega el archivo abierto para leer; mientras está abierto
+        limpiar() no lo borra aunque otra sesión necesite espacio."""
+        ruta = self._ruta(clave, extension)
+        with self._usando(ruta), open(self.obtener(clave, extension, generar), "rb") as f: yield f
+
+    def limpiar(self, conservar=None):
+        """Borra lo vencido por TTL y, si se excede la cuota, lo menos usado; devuelve cuántos borró.
+        Corre con el lock tomado: nadie puede empezar a usar un archivo mientras se decide borrarlo."""
+        with self.lock:
+            ahora, archivos, fijo = time.time(), [], 0
+            for e in os.scandir(self.ruta):
+                if not e.is_file(): continue
+                st = e.stat()
+                if e.path == conservar or e.path in self._usos: fijo += st.st_size; continue
+                # Temporales de una generación interrumpida: se dan por perdidos después de una hora
+                if e.name.endswith(".tmp") and ahora - st.st_mtime < 3600: continue
+                archivos.append((st.st_mtime, st.st_size, e.path))
+            archivos.sort()
+            total, borrados = fijo + sum(a[1] for a in archivos), 0
+            for mtime, tam, ruta in archivos:
+                if ahora - mtime <= self.ttl and total <= self.max_bytes: break
+                try: os.remove(ruta)
+                except OSError: continue
+                total -= tam; borrados += 1
+            return borrados
+
+    def estadisticas(self):
+        archivos = [e.stat().st_size for e in os.scandir(self.ruta) if e.is_file()]
+        return {"archivos": len(archivos), "bytes": sum(archivos), "generados": self.generados, "reutilizados": self.reutilizados}
+
+
+_ARTEFACTOS, _LOCK_ARTEFACTOS = None, threading.Lock()
+
+def obtener_artefactos():
+    """Carpeta de artefactos del proceso (RAPIDITO_ARTEFACTOS): un Excel que generó una sesión le sirve a otra."""
+    global _ARTEFACTOS
+    with _LOCK_ARTEFACTOS:
+        if _ARTEFACTOS is None: _ARTEFACTOS = Artefactos()
+        return _ARTEFACTOS
@@ -0,0 +1,97 @@
+"""Almacén local de comprobantes autorizados, indexado por claveAcceso.
+
+Un comprobante autorizado no cambia nunca, así que cada clave se descarga una sola vez:
+se guarda el XML de la autorización (comprimido) y la fila ya extraída por
+`extraer_datos_robusto`. Cuando el archivo supera `max_bytes` se desalojan las
+entradas usadas hace más tiempo.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+RUTA_CACHE = os.environ.get("RAPIDITO_CACHE", "cache_sri.sqlite3")
+MAX_BYTES = int(float(os.environ.get("RAPIDITO_CACHE_MAX_MB", 500)) * 1024 * 1024)
+
+
+class CacheComprobantes:
+    def __init__(self, ruta=RUTA_CACHE, max_bytes=MAX_BYTES):
+        self.ruta, self.max_bytes = ruta, max_bytes
+        self.lock = threading.Lock()
+        self.con = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.execute("""CREATE TABLE IF NOT EXISTS comprobantes (
+            clave TEXT PRIMARY KEY, xml BLOB NOT NULL, fila TEXT, bytes INTEGER NOT NULL,
+            creado REAL NOT NULL, usado REAL NOT NULL)""")
+        self.con.execute("CREATE INDEX IF NOT EXISTS ix_usado ON comprobantes(usado)")
+        self.aciertos = self.fallos = 0
+        self.total = self.con.execute("SELECT COALESCE(SUM(bytes),0) FROM comprobantes").fetchone()[0]
+
+    def _bytes(self, clave):
+        r = self.con.execute("SELECT bytes FROM comprobantes WHERE clave=?", (clave,)).fetchone()
+        return r[0] if r else 0
+
+    def obtener(self, clave):
+        """Devuelve {"xml": bytes, "fila": dict|None} o None si la clave no está."""
+        with self.lock:
+            r = self.con.execute("SELECT xml, fila FROM comprobantes WHERE clave=?", (clave,)).fetchone()
+            if r is None: self.fallos += 1; return None
+            self.aciertos += 1
+            self.con.execute("UPDATE comprobantes SET usado=? WHERE clave=?", (time.time(), clave))
+        return {"xml": zlib.decompress(r[0]), "fila": json.loads(r[1]) if r[1] else None}
+
+    def guardar(self, clave, xml, fila=None):
+        if isinstance(xml, str): xml = xml.encode("utf-8")
+        comp = zlib.compress(xml, 6); txt = json.dumps(fila, ensure_ascii=False) if fila else None
+        ahora = time.time()
+        with self.lock:
+            self.total -= self._bytes(clave); self.total += len(comp) + len(txt or "")
+            self.con.execute("INSERT OR REPLACE INTO comprobantes VALUES (?,?,?,?,?,?)",
+                             (clave, comp, txt, len(comp) + len(txt or ""), ahora, ahora))
+        if self.max_bytes and self.total > self.max_bytes: self.desalojar()
+
+    def guardar_fila(self, clave, fila):
+        txt = json.dumps(fila, ensure_ascii=False)
+        with self.lock:
+            self.total -= self._bytes(clave)
+            self.con.execute("UPDATE comprobantes SET fila=?, bytes=length(xml)+? WHERE clave=?", (txt, len(txt), clave))
+            self.total += self._bytes(clave)
+
+    def invalidar(self, claves=None):
+        """Elimina las claves indicadas, o todo el almacén si `claves` es None."""
+        with self.lock:
+            if claves is None: self.con.execute("DELETE FROM comprobantes"); self.con.execute("VACUUM")
+            else: self.con.executemany("DELETE FROM comprobantes WHERE clave=?", [(c,) for c in claves])
+            self.total = self.con.execute("SELECT COALESCE(SUM(bytes),0) FROM comprobantes").fetchone()[0]
+
+    def desalojar(self):
+        if not self.max_bytes: return
+        with self.lock:
+            if self.total <= self.max_bytes: return
+            # Se libera hasta el 90% del máximo para no desalojar en cada inserción
+            sobra = self.total - int(self.max_bytes * 0.9); borrar = []
+            for clave, b in self.con.execute("SELECT clave, bytes FROM comprobantes ORDER BY usado"):
+                borrar.append((clave,)); sobra -= b; self.total -= b
+                if sobra <= 0: break
+            self.con.executemany("DELETE FROM comprobantes WHERE clave=?", borrar)
+
+    def estadisticas(self):
+        with self.lock:
+            n = self.con.execute("SELECT COUNT(*) FROM comprobantes").fetchone()[0]
+        return {"entradas": n, "bytes": self.total, "max_bytes": self.max_bytes, "aciertos": self.aciertos, "fallos": self.fallos}
+
+    def cerrar(self):
+        with self.lock: self.con.close()
+
+
+_CACHE, _LOCK_CACHE = None, threading.Lock()
+
+def obtener_cache():
+    """Caché del proceso (RAPIDITO_CACHE): lo que descarga una sesión ya no va a la red en las demás."""
+    global _CACHE
+    with _LOCK_CACHE:
+        if _CACHE is None: _CACHE = CacheComprobantes()
+        return _CACHE
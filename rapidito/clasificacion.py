@@ -0,0 +1,176 @@
+"""Clasificación de proveedores contra la tabla `empresas` de la memoria contable.
+
+El orden de búsqueda es: RUC del emisor, nombre exacto, nombre normalizado (sin tildes,
+puntuación ni forma societaria: "S.A.", "SA", "CIA. LTDA."...) y, si nada de eso coincide,
+el nombre más parecido por trigramas siempre que supere el umbral (coeficiente de Dice).
+El índice de trigramas se construye una vez por tabla (y se puede enviar ya construido a
+otros procesos con pickle). La búsqueda aproximada cuenta con numpy (bincount) solo las listas
+de los trigramas más raros del nombre; las entradas que ahí no llegan al mínimo de
+coincidencias que exige el umbral se descartan sin puntuar y las pocas que quedan se
+puntúan con sus propios trigramas (filtro de prefijo, exacto). Los resultados se memorizan porque un mismo proveedor se repite en miles de filas.
+"""
+import os
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+
+from rapidito.metricas import obtener_metricas
+
+UMBRAL = float(os.environ.get("RAPIDITO_UMBRAL_SIMILITUD", 0.8))
+# Fuente de la clasificación que queda en cada fila (columna CLASIFICACION)
+POR_RUC, POR_NOMBRE, POR_NORMALIZADO, APROXIMADO, SIN_COINCIDENCIA = "RUC", "NOMBRE", "NORMALIZADO", "APROXIMADO", "SIN COINCIDENCIA"
+
+_SUFIJOS = {"SA", "CA", "SAS", "CIA", "LTDA", "CL", "EP", "BIC", "SCC", "CEM"}
+_RE_NO_ALFANUM = re.compile(r"[^A-Z0-9]+")
+_RE_RUC = re.compile(r"\d{13}")
+
+
+def normalizar(nombre):
+    """Nombre comparable: mayúsculas sin tildes ni puntuación y sin la forma societaria final."""
+    s = unicodedata.normalize("NFKD", str(nombre).upper()).encode("ascii", "ignore").decode()
+    palabras = _RE_NO_ALFANUM.sub(" ", s.replace(".", "").replace("&", " Y ")).split()
+    while len(palabras) > 1 and palabras[-1] in _SUFIJOS: palabras.pop()
+    return " ".join(palabras)
+
+
+def trigramas(normalizado):
+    s = f"  {normalizado} "
+    return frozenset(s[i:i+3] for i in range(len(s) - 2))
+
+
+class IndiceEmpresas:
+    """Índice de solo lectura sobre `empresas` (NOMBRE -> {"DETALLE", "MEMO"[, "RUC"]}).
+    Las entradas cuya clave es un RUC de 13 dígitos también se indexan por RUC."""
+
+    def __init__(self, empresas, umbral=UMBRAL):
+        self.empresas, self.umbral, self.tam = empresas, umbral, len(empresas)
+        self.por_ruc, self.por_normalizado = {}, {}
+        self.nombres, conjuntos = [], []
+        for nombre, info in empresas.items():
+            ruc = str(info.get("RUC") or "").strip() if isinstance(info, dict) else ""
+            if not ruc and _RE_RUC.fullmatch(nombre): ruc = nombre
+            if ruc: self.por_ruc.setdefault(ruc, nombre)
+            norm = normalizar(nombre)
+            if not norm or norm in self.por_normalizado: continue
+            self.por_normalizado[norm] = nombre
+            self.nombres.append(nombre); conjuntos.append(trigramas(norm))
+        # Entradas ordenadas por número de trigramas, para que las de tamaño compatible con
+        # el umbral sean un tramo contiguo; índice invertido trigrama -> posiciones (crecientes)
+        # en un solo array: las de i = self.ids[t] son entradas[inicios[i]:inicios[i + 1]], y
+        # al revés, los trigramas de la entrada j son tri_entrada[ini_entrada[j]:ini_entrada[j + 1]].
+        orden = sorted(range(len(conjuntos)), key=lambda j: len(conjuntos[j]))
+        self.nombres = [self.nombres[j] for j in orden]; conjuntos = [conjuntos[j] for j in orden]
+        self.ids, tri, ent = {}, [], []
+        for j, c in enumerate(conjuntos):
+            tri.extend([self.ids.setdefault(t, len(self.ids)) for t in c]); ent.extend([j] * len(c))
+        tri, ent = np.array(tri, dtype=np.int32), np.array(ent, dtype=np.int32)
+        self.entradas = ent[np.argsort(tri, kind="stable")].astype(np.intp)
+        self.largos = np.bincount(tri, minlength=len(self.ids)).tolist()
+        self.inicios = np.concatenate(([0], np.cumsum(self.largos))).tolist()
+        self.tri_entrada = tri
+        self.tamanos = np.array([len(c) for c in conjuntos], dtype=np.float64)
+        self.ini_entrada = np.concatenate(([0], np.cumsum(self.tamanos, dtype=np.intp)))
+        self._aproximado = lru_cache(maxsize=8192)(self._aproximado_sin_cache)
+
+    def __len__(self): return len(self.empresas)
+
+    def __getstate__(self):
+        estado = self.__dict__.copy(); del estado["_aproximado"]
+        return estado
+
+    def __setstate__(self, estado):
+        self.__dict__.update(estado)
+        self._aproximado = lru_cache(maxsize=8192)(self._aproximado_sin_cache)
+
+    def buscar(self, razon_social, ruc_emisor=""):
+        """(info | None, fuente, puntaje) para un proveedor."""
+        empresas = self.empresas
+        nombre = self.por_ruc.get(ruc_emisor) if ruc_emisor else None
+        if nombre is not None and nombre in empresas: return empresas[nombre], POR_RUC, 1.0
+        info = empresas.get(razon_social)
+        if info is not None: return info, POR_NOMBRE, 1.0
+        norm = normalizar(razon_social)
+        nombre = self.por_normalizado.get(norm)
+        if nombre is not None and nombre in empresas: return empresas[nombre], POR_NORMALIZADO, 1.0
+        nombre, puntaje = self._aproximado(norm)
+        if nombre is not None and nombre in empresas: return empresas[nombre], APROXIMADO, puntaje
+        return None, SIN_COINCIDENCIA, 0.0
+
+    def _aproximado_sin_cache(self, norm):
+        """Mejor (nombre, Dice) con Dice >= umbral, o (None, 0.0)."""
+        with obtener_metricas().cronometro("clasificacion_aproximada_segundos"): return self._buscar_trigramas(norm)
+
+    def _buscar_trigramas(self, norm):
+        q = trigramas(norm) if norm else frozenset()
+        a, t = len(q), self.umbral
+        if not a: return None, 0.0
+        # Dice >= t solo es posible si el tamaño b cumple a*t/(2-t) <= b <= a*(2-t)/t
+        lo = int(np.searchsorted(self.tamanos, a * t / (2 - t) - 1e-9, "left"))
+        hi = int(np.searchsorted(self.tamanos, a * (2 - t) / t + 1e-9, "right"))
+        if lo >= hi: return None, 0.0
+        qids = sorted((i for i in map(self.ids.get, q) if i is not None), key=self.largos.__getitem__)
+        # Con b >= tamanos[lo], Dice >= t exige m = ceil(t*(a+b)/2) trigramas comunes, así que una
+        # entrada que llegue tiene al menos m - (n - s) en las s listas más cortas de las n del nombre.
+        # Se cuentan solo esas (las de los trigramas frecuentes son las largas) y el resto se
+        # comprueba para las entradas que alcanzan ese mínimo.
+        m = int(np.ceil(t * (a + self.tamanos[lo]) / 2 - 1e-9))
+        n = len(qids)
+        if n < m: return None, 0.0
+        s = min(n - m + 1 + m // 2, n)
+        ini, ent = self.inicios, self.entradas
+        comun = np.bincount(np.concatenate([ent[ini[i]:ini[i + 1]] for i in qids[:s]]), minlength=hi)[lo:hi]
+        cand = np.flatnonzero(comun >= m - (n - s)) + lo
+        if not len(cand): return None, 0.0
+        inicio = self.ini_entrada[cand]; largo = self.ini_entrada[cand + 1] - inicio
+        fin = np.cumsum(largo); base = fin - largo
+        en_nombre = np.zeros(len(self.ids), dtype=bool); en_nombre[qids] = True
+        comun = np.add.reduceat(en_nombre[self.tri_entrada[np.arange(fin[-1]) + np.repeat(inicio - base, largo)]], base)
+        dice = comun / (a + self.tamanos[cand])
+        k = int(dice.argmax()); mejor, mejor_p = int(cand[k]), 2 * float(dice[k])
+        if mejor_p < t: return None, 0.0
+        return self.nombres[mejor], mejor_p
+
+
+# Índices ya construidos, por tabla. Se reconstruyen si la tabla cambia de tamaño o si se
+# llama a invalidar_indice (p. ej. tras actualizar la memoria desde un Excel).
+_INDICES = {}
+_MAX_INDICES = 8
+
+
+def indice_empresas(empresas):
+    if isinstance(empresas, IndiceEmpresas): return empresas
+    guardado = _INDICES.get(id(empresas))
+    if guardado is not None and guardado.empresas is empresas and guardado.tam == len(empresas): return guardado
+    ind = IndiceEmpresas(empresas)
+    if len(_INDICES) >= _MAX_INDICES: _INDICES.pop(next(iter(_INDICES)))
+    _INDICES[id(empresas)] = ind
+    return ind
+
+
+def invalidar_indice(empresas=None):
+    if empresas is None: _INDICES.clear()
+    else: _INDICES.pop(id(empresas), None)
+
+
+def clasificar_detalle(razon_social, ruc_cli, empresas, ruc_emisor=""):
+    """(DETALLE, MEMO, fuente, puntaje) según la tabla de empresas y el tipo de identificación del comprador."""
+    info_json, fuente, puntaje = indice_empresas(empresas).buscar(razon_social, ruc_emisor)
+    obtener_metricas().contar("clasificacion_total", fuente=fuente)
+    # Lógica de clasificación solicitada
+    if len(ruc_cli) == 10:
+        return (info_json["DETALLE"] if info_json else "NO DEDUCIBLE"), "PERSONAL", fuente, puntaje
+    return (info_json["DETALLE"] if info_json else "OTROS"), (info_json["MEMO"] if info_json else "PROFESIONAL"), fuente, puntaje
+
+
+def clasificar(razon_social, ruc_cli, empresas, ruc_emisor=""):
+    """(DETALLE, MEMO) según la tabla de empresas conocidas y el tipo de identificación del comprador."""
+    return clasificar_detalle(razon_social, ruc_cli, empresas, ruc_emisor)[:2]
+
+
+def reclasificar(fila, empresas):
+    """Vuelve a clasificar una fila ya extraída (p. ej. la guardada en la caché del SRI)."""
+    fila["DETALLE"], fila["MEMO"], fila["CLASIFICACION"], s = clasificar_detalle(fila["NOMBRE"], fila["RUC CLIENTE"], empresas, fila.get("RUC", ""))
+    fila["SIMILITUD"] = round(s, 3)
+    return fila
@@ -0,0 +1,156 @@
+"""Procesamiento por lotes sin navegador.
+
+    python -m rapidito --compras carpeta_o_zip_o_txt --ventas ventas.zip -o salida/
+    python -m rapidito --clientes carga_mezclada.zip [--contribuyente RUC ...] -o salida/
+
+Cada origen puede ser una carpeta (se recorren sus .xml y .zip), archivos .xml/.zip sueltos
+o el TXT de claves del portal del SRI (se descargan con la caché local). Escribe
+Compras.xlsx, Ventas.xlsx y, si hay ambos, Integral.xlsx. Con --clientes los comprobantes
+de varios contribuyentes se reparten por RUC y se escribe Clientes.zip, con un libro por
+contribuyente y un INDICE.xlsx (ver rapidito.multicliente). Los módulos pesados se importan
+solo cuando hacen falta.
+"""
+import argparse
+import io
+import json
+import os
+import sys
+from contextlib import nullcontext
+
+
+def cargar_empresas(ruta):
+    """Tabla de empresas desde la memoria SQLite (migrando el JSON la primera vez) o desde un .json suelto."""
+    if ruta and ruta.lower().endswith(".json"):
+        if not os.path.exists(ruta): return {}
+        with open(ruta, "r", encoding="utf-8") as f: return json.load(f).get("empresas", {})
+    from rapidito.memoria import MemoriaContable, RUTA_MEMORIA
+    return MemoriaContable(ruta or RUTA_MEMORIA).empresas()
+
+
+def _expandir(rutas):
+    archivos, txts = [], []
+    for r in rutas:
+        if os.path.isdir(r):
+            for base, _, nombres in sorted(os.walk(r)):
+                for n in sorted(nombres):
+                    if n.lower().endswith(('.xml', '.zip')): archivos.append(os.path.join(base, n))
+                    elif n.lower().endswith('.txt'): txts.append(os.path.join(base, n))
+        elif r.lower().endswith('.txt'): txts.append(r)
+        else: archivos.append(r)
+    return archivos, txts
+
+
+def _log(msg): print(msg, file=sys.stderr, flush=True)
+
+
+def leer_origen(rutas, empresas, procesos=None, usar_cache=True, filtros=None, opciones_sri=None):
+    """Filas (sin los None) de todas las rutas indicadas. `filtros` (desde, hasta, emisores,
+    tipos; ver rapidito.sri.filtrar_claves) recorta las claves de los TXT antes de descargar y
+    `opciones_sri` (concurrencia, por_segundo...) van a rapidito.sri.DescargadorSRI."""
+    from rapidito.entrada import procesar_archivos_entrada
+    from rapidito.paralelo import extraer_lote, PROCESOS
+    archivos, txts = _expandir(rutas)
+    filas = []
+    if archivos:
+        resumen = {}
+        lote, fallos = extraer_lote(procesar_archivos_entrada(archivos, resumen), empresas, procesos or PROCESOS)
+        filas += [d for d in lote if d]; fallos = resumen["omitidos"] + fallos
+        _log(f"  {resumen['xml']} XML leídos, {resumen['duplicados']} repetidos, {len(fallos)} con error")
+        for f in fallos: _log(f"    ✗ {f['ARCHIVO']}: {f['ERROR']}")
+    for txt in txts: filas += _descargar_txt(txt, empresas, usar_cache, filtros or {}, opciones_sri or {})
+    return filas
+
+
+def _descargar_txt(ruta, empresas, usar_cache, filtros, opciones_sri):
+    from rapidito.sri import DescargadorSRI, extraer_claves, filtrar_claves, AUTORIZADO
+    from rapidito.extraccion import extraer_datos_robusto, reclasificar
+    from rapidito.cache import obtener_cache
+    with open(ruta, "rb") as f: todas = extraer_claves(f.read().decode("latin-1"))
+    claves = [d["clave"] for d in filtrar_claves(todas, **filtros)]
+    if len(claves) < len(todas): _log(f"  {os.path.basename(ruta)}: {len(todas) - len(claves)} de {len(todas)} claves descartadas por tipo, fecha o emisor")
+    cache = obtener_cache() if usar_cache else None
+    encontrados, conteo = [], {}
+    with DescargadorSRI(cache=cache, **opciones_sri) as dsc:
+        for i, res in enumerate(dsc.iterar(claves), 1):
+            conteo[res["estado"]] = conteo.get(res["estado"], 0) + 1
+            if res["estado"] != AUTORIZADO: continue
+            d = res["fila"]
+            if d: reclasificar(d, empresas)
+            else:
+                d = extraer_datos_robusto(io.BytesIO(res["contenido"]), empresas)
+                if d and cache is not None: cache.guardar_fila(res["clave"], d)
+            if d: encontrados.append((res["indice"], d))
+            if i % 100 == 0 or i == len(claves): _log(f"  {os.path.basename(ruta)}: {i}/{len(claves)}")
+    _log(f"  {os.path.basename(ruta)}: " + ", ".join(f"{v} {k.lower()}" for k, v in conteo.items()))
+    return [d for _, d in sorted(encontrados, key=lambda x: x[0])]
+
+
+def _fecha(texto):
+    from datetime import date
+    try: return date.fromisoformat(texto)
+    except ValueError: raise argparse.ArgumentTypeError(f"fecha inválida: {texto!r} (usa AAAA-MM-DD)")
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="python -m rapidito", description="Genera los Excel de compras, ventas e integral sin abrir el navegador.")
+    ap.add_argument("--compras", nargs="+", default=[], metavar="RUTA", help="carpetas, .xml, .zip o TXT del SRI con las compras")
+    ap.add_argument("--ventas", nargs="+", default=[], metavar="RUTA", help="carpetas, .xml, .zip o TXT del SRI con ventas y retenciones")
+    ap.add_argument("--clientes", nargs="+", default=[], metavar="RUTA", help="carga mezclada de varios contribuyentes: un libro por contribuyente en Clientes.zip")
+    ap.add_argument("--contribuyente", action="append", metavar="RUC", help="con --clientes, contribuyentes del lote (se puede repetir; por defecto, los sujetos retenidos de la carga)")
+    ap.add_argument("-o", "--salida", default=".", help="carpeta donde se escriben los .xlsx")
+    ap.add_argument("--memoria", default=None, help="memoria contable (.sqlite3, o un .json antiguo); por defecto la de la aplicación")
+    ap.add_argument("--procesos", type=int, default=None, help="procesos para extraer y, con --clientes, generar los libros (por defecto, todos los núcleos)")
+    ap.add_argument("--formulas", action="store_true", help="deja también las fórmulas SUMIFS en REPORTE ANUAL y PROYECCION")
+    ap.add_argument("--sin-cache", action="store_true", help="no usa la caché local de comprobantes del SRI")
+    ap.add_argument("--desde", type=_fecha, help="solo claves de los TXT emitidas desde esta fecha (AAAA-MM-DD)")
+    ap.add_argument("--hasta", type=_fecha, help="solo claves de los TXT emitidas hasta esta fecha (AAAA-MM-DD)")
+    ap.add_argument("--emisor", action="append", metavar="RUC", help="solo claves de los TXT de este RUC emisor (se puede repetir)")
+    ap.add_argument("--sri-concurrencia", type=int, metavar="N", help="consultas al SRI en vuelo (por defecto RAPIDITO_SRI_CONCURRENCIA u 8)")
+    ap.add_argument("--sri-por-segundo", type=float, metavar="N", help="tope de consultas al SRI por segundo (por defecto RAPIDITO_SRI_POR_SEGUNDO o 10)")
+    ap.add_argument("--metricas", metavar="ARCHIVO", help="escribe los tiempos por etapa al terminar (.json, o texto de Prometheus con cualquier otra extensión)")
+    ap.add_argument("--perfil", metavar="ARCHIVO", help="perfila la ejecución con cProfile y guarda el .prof (solo el proceso principal)")
+    a = ap.parse_args(argv)
+    if not a.compras and not a.ventas and not a.clientes: ap.error("indica al menos --compras, --ventas o --clientes")
+
+    from rapidito.metricas import obtener_metricas, perfilar
+    with perfilar("cli", destino=a.perfil) if a.perfil else nullcontext(): _generar(a)
+    if a.perfil: _log(f"  → perfil en {a.perfil}")
+    if a.metricas:
+        m = obtener_metricas()
+        with open(a.metricas, "w", encoding="utf-8") as f: f.write(m.json() if a.metricas.lower().endswith(".json") else m.prometheus())
+        _log(f"  → métricas en {a.metricas}")
+    return 0
+
+
+def _generar(a):
+    from rapidito.excel import generar_excel_multiexcel
+    from rapidito.ventas import cruzar_ventas_retenciones
+    empresas = cargar_empresas(a.memoria)
+    filtros = {"desde": a.desde, "hasta": a.hasta, "emisores": a.emisor}
+    sri = {k: v for k, v in (("concurrencia", a.sri_concurrencia), ("por_segundo", a.sri_por_segundo)) if v is not None}
+    os.makedirs(a.salida, exist_ok=True)
+    compras = ventas = None
+    if a.compras:
+        _log("Compras:")
+        compras = [d for d in leer_origen(a.compras, empresas, a.procesos, not a.sin_cache, dict(filtros, tipos={"FC", "NC"}), sri) if d["TIPO"] in ["FC","NC"]]
+        generar_excel_multiexcel(data_compras=compras, formulas=a.formulas, destino=os.path.join(a.salida, "Compras.xlsx"))
+        _log(f"  → Compras.xlsx ({len(compras)} filas)")
+    if a.ventas:
+        _log("Ventas:")
+        ventas, ret_sin_fc, fc_sin_ret = cruzar_ventas_retenciones(leer_origen(a.ventas, empresas, a.procesos, not a.sin_cache, dict(filtros, tipos={"FC", "RET"}), sri))
+        _log(f"  {len(fc_sin_ret)} factura(s) sin retención, {len(ret_sin_fc)} retención(es) sin factura")
+        for r in ret_sin_fc[:20]: _log(f"    ? retención {r.get('numreten')} de {r.get('RUC')} (sustento {r.get('SUSTENTO') or '-'})")
+        generar_excel_multiexcel(data_ventas_ret=ventas, formulas=a.formulas, destino=os.path.join(a.salida, "Ventas.xlsx"))
+        _log(f"  → Ventas.xlsx ({len(ventas)} filas)")
+    if compras and ventas:
+        generar_excel_multiexcel(compras, ventas, formulas=a.formulas, destino=os.path.join(a.salida, "Integral.xlsx"))
+        _log("  → Integral.xlsx")
+    if a.clientes:
+        from rapidito.multicliente import generar_zip_clientes
+        from rapidito.paralelo import PROCESOS
+        _log("Clientes:")
+        filas, indice, sin_asignar = leer_origen(a.clientes, empresas, a.procesos, not a.sin_cache, filtros, sri), [], []
+        generar_zip_clientes(filas, os.path.join(a.salida, "Clientes.zip"), a.contribuyente, a.procesos or PROCESOS, a.formulas, indice, sin_asignar)
+        for f in indice: _log(f"    {f['RUC']} {f['CONTRIBUYENTE']}: {f['N° COMPRAS']} compras, {f['N° VENTAS']} ventas")
+        if sin_asignar: _log(f"  {len(sin_asignar)} comprobante(s) sin contribuyente (hoja SIN ASIGNAR del índice); indícalos con --contribuyente")
+        _log(f"  → Clientes.zip ({len(indice)} contribuyentes)")
@@ -0,0 +1,87 @@
+"""Lectura perezosa de los XML subidos (sueltos o en ZIP, incluso ZIP dentro de ZIP).
+
+Los miembros se descomprimen de uno en uno y pasan directo al extractor, así la memoria
+no crece con el tamaño del archivo. Los comprobantes repetidos (misma claveAcceso o número
+de autorización) se descartan antes de extraerlos, y hay topes de tamaño descomprimido y de
+número de miembros para que un ZIP enorme o malicioso no tumbe el servidor: un XML que pasa
+el tope por archivo se salta y se informa, y pasar el de la carga completa la detiene.
+"""
+import os
+import re
+import zipfile
+
+MAX_BYTES_TOTAL = int(float(os.environ.get("RAPIDITO_MAX_MB", 4096)) * 1024 * 1024)
+MAX_BYTES_MIEMBRO = int(float(os.environ.get("RAPIDITO_MAX_MB_XML", 50)) * 1024 * 1024)
+MAX_MIEMBROS = int(os.environ.get("RAPIDITO_MAX_MIEMBROS", 250000))
+MAX_PROFUNDIDAD = 3
+
+_RE_CLAVE = re.compile(rb'<claveAcceso>\s*(\d{49})\s*</claveAcceso>')
+_RE_AUTORIZACION = re.compile(rb'<numeroAutorizacion>\s*(\d+)\s*</numeroAutorizacion>')
+
+
+class LimiteEntradaExcedido(ValueError):
+    pass
+
+
+def identificador(contenido):
+    """claveAcceso (o número de autorización) del comprobante, o None si no se encuentra."""
+    m = _RE_CLAVE.search(contenido) or _RE_AUTORIZACION.search(contenido)
+    return m.group(1) if m else None
+
+
+def procesar_archivos_entrada(lista, resumen=None, max_bytes_total=MAX_BYTES_TOTAL,
+                              max_bytes_miembro=MAX_BYTES_MIEMBRO, max_miembros=MAX_MIEMBROS):
+    """Genera (nombre, contenido) por cada XML único de `lista` (archivos con .name, como los
+    UploadedFile de Streamlit, o rutas). `resumen` (dict) recibe los contadores
+    "xml", "duplicados", "miembros" y "bytes", y en "omitidos" los XML saltados por superar
+    `max_bytes_miembro` ({"ARCHIVO", "ERROR"}, como los fallos de extraer_lote). Lanza
+    LimiteEntradaExcedido si se pasa el tope de la carga o el de número de archivos."""
+    r = resumen if resumen is not None else {}
+    r.update(xml=0, duplicados=0, miembros=0, bytes=0, omitidos=[])
+    vistos = set()
+
+    def contar(tam):
+        r["miembros"] += 1; r["bytes"] += tam
+        if r["miembros"] > max_miembros: raise LimiteEntradaExcedido(f"Más de {max_miembros} archivos en la carga")
+        if r["bytes"] > max_bytes_total: raise LimiteEntradaExcedido(f"La carga supera {max_bytes_total // 1048576} MB descomprimidos")
+
+    def omitir(nombre):
+        r["omitidos"].append({"ARCHIVO": nombre, "ERROR": f"Supera {max_bytes_miembro // 1048576} MB; se omitió"})
+
+    def emitir(nombre, contenido):
+        if len(contenido) > max_bytes_miembro: omitir(nombre); return None
+        ident = identificador(contenido)
+        if ident is not None:
+            if ident in vistos: r["duplicados"] += 1; return None
+            vistos.add(ident)
+        r["xml"] += 1
+        return nombre, contenido
+
+    def desde_zip(origen, prefijo, nivel):
+        with zipfile.ZipFile(origen) as z:
+            for info in z.infolist():
+                n = info.filename; nl = n.lower()
+                if info.is_dir() or n.startswith('__MACOSX'): continue
+                if nl.endswith('.xml'):
+                    # file_size lo declara el propio ZIP: si ya pasa el tope se omite sin leerlo; si miente,
+                    # se lee como mucho un byte de más y emitir lo omite igual. Se cuenta lo realmente leído.
+                    if info.file_size > max_bytes_miembro: contar(0); omitir(prefijo + n); continue
+                    with z.open(info) as m: contenido = m.read(max_bytes_miembro + 1)
+                    contar(len(contenido))
+                    doc = emitir(prefijo + n, contenido)
+                    if doc: yield doc
+                elif nl.endswith('.zip') and nivel < MAX_PROFUNDIDAD:
+                    with z.open(info) as anidado: yield from desde_zip(anidado, f"{prefijo}{n}/", nivel + 1)
+
+    for f in lista:
+        nombre = f if isinstance(f, str) else f.name
+        nl = nombre.lower()
+        if nl.endswith('.xml'):
+            if isinstance(f, str):
+                with open(f, "rb") as fh: contenido = fh.read(max_bytes_miembro + 1)
+            else: contenido = f.getvalue()
+            contar(len(contenido))
+            doc = emitir(nombre, contenido)
+            if doc: yield doc
+        elif nl.endswith('.zip'):
+            yield from desde_zip(f, f"{os.path.basename(nombre)}/", 1)
@@ -0,0 +1,180 @@
+"""Generador del Excel integral (COMPRAS, REPORTE ANUAL, VENTAS, PROYECCION y hojas del SRI).
+
+Los formatos se crean una sola vez por libro y las celdas se escriben fila por fila con
+write_number/write_string. Para reportes grandes se activa el modo `constant_memory` de
+xlsxwriter: cada fila se vuelca a disco al pasar a la siguiente, por eso todas las hojas
+se escriben estrictamente en orden de filas.
+
+REPORTE ANUAL y PROYECCION llevan valores ya calculados (rapidito.agregados). Con
+`formulas=True` se escriben además fórmulas SUMIFS limitadas a las filas con datos, con el
+valor calculado como resultado en caché, para poder auditarlas en Excel.
+"""
+import io
+import os
+import time
+
+import xlsxwriter
+from xlsxwriter.utility import xl_col_to_name
+
+from rapidito.agregados import MESES, CATEGORIAS, totales_compras, totales_ventas, totales_columnas
+from rapidito.metricas import obtener_metricas, CUBETAS_BYTES
+
+# A partir de cuántas filas de datos se usa constant_memory si no se indica otra cosa
+UMBRAL_MEMORIA_CONSTANTE = 20000
+
+TEXTO_PIE = "&LGenerado por RAPIDITO AI&Rrapidito.ec"
+
+COLS_COMPRAS = ["MES","FECHA","N. FACTURA","TIPO DE DOCUMENTO","RUC","CONTRIBUYENTE","NOMBRE","DETALLE","MEMO","OTRA BASE IVA","OTRO IVA","MONTO ICE","PROPINAS","EXENTO DE IVA","NO OBJ IVA","BASE. 0","BASE. 12 / 15","IVA.","TOTAL","SUBDETALLE"]
+COLS_VENTAS = ["MES","FECHA","N. FACTURA","RUC","CLIENTE","DETALLE","MEMO","MONTO REEMBOLS","BASE. 0","BASE. 12 / 15","IVA","TOTAL","FECHA RET","N° RET","N° AUTORIZACIÓN","RET RENTA","RET IVA","ISD","TOTAL RET"]
+COLS_NC = ["NOMBRE","RUC","N AUTORIZACION","FECHA","TIPO DE DOCUMENTO","N. FACTURA","MES","RUC CLIENTE","CLIENTE","PROPINAS","BASE. 0","NO OBJ IVA","BASE. 12 / 15","IVA.","TOTAL"]
+COLS_RET = ["RUC CLIENTE", "CLIENTE", "fechaemi", "NOMBRE", "RUC", "numfact", "numreten", "baserenta", "rt_renta", "baseiva", "rt_iva", "N AUTORIZACION"]
+ICONOS = ["🏠","❤️","🎓","🛒","🧢","✈️","🚫","💡"]
+# Columnas de sumatoria: P(BASE 0), Q(BASE 12), O(NO OBJ), N(EXENTO), J(OTRA BASE), M(PROPINA)
+CL_SUM = ["P","Q","O","N","J","M"]
+
+
+def _formatos(wb):
+    f = lambda **k: wb.add_format(k)
+    return {
+        "azul": f(bold=True, align='center', border=1, bg_color='#002060', font_color='white'),
+        "amar": f(bold=True, align='center', border=1, bg_color='#FFD966'),
+        "verd": f(bold=True, align='center', border=1, bg_color='#92D050'),
+        "gris": f(bold=True, align='center', border=1, bg_color='#F2F2F2'),
+        "num": f(num_format='_-$ * #,##0.00_-', border=1),
+        "tot": f(bold=True, num_format='_-$ * #,##0.00_-', border=1, bg_color='#EFEFEF'),
+        "txt": f(border=1),
+    }
+
+
+def escribir_filas(ws, filas, cols, f_num, f_txt, inicio=1):
+    """Escribe `filas` (dicts) desde la fila `inicio`: números con f_num y el resto como texto
+    con f_txt. Las columnas que falten en una fila quedan en blanco."""
+    num, txt, blanco = ws.write_number, ws.write_string, ws.write_blank
+    for r, d in enumerate(filas, inicio):
+        for c, k in enumerate(cols):
+            v = d.get(k, "")
+            if isinstance(v, (float, int)):
+                if v == v: num(r, c, v, f_num)
+                else: blanco(r, c, None, f_txt)
+            elif v is None or v == "": blanco(r, c, None, f_txt)
+            else: txt(r, c, v if isinstance(v, str) else str(v), f_txt)
+
+
+def _hoja_sri(wb, fm, filas, sri_mode):
+    if sri_mode == "NC": cols, fmt_h, sh_nm = COLS_NC, fm["amar"], "NOTAS DE CREDITO"
+    elif sri_mode == "RET": cols, fmt_h, sh_nm = COLS_RET, fm["verd"], "RETENCIONES"
+    else: cols, fmt_h, sh_nm = COLS_COMPRAS, fm["azul"], "FACTURAS"
+    ws = wb.add_worksheet(sh_nm)
+    ws.set_footer(TEXTO_PIE)
+    ws.write_row(0, 0, cols, fmt_h)
+    escribir_filas(ws, filas, cols, fm["num"], fm["txt"])
+    ws.set_column(0, len(cols)-1, 15)
+
+
+def _celda(ws, r, c, valor, formula, fmt):
+    if formula: ws.write_formula(r, c, formula, fmt, valor)
+    else: ws.write_number(r, c, valor, fmt)
+
+
+def _hoja_compras(wb, fm, filas):
+    ws = wb.add_worksheet('COMPRAS')
+    ws.set_footer(TEXTO_PIE)
+    for i, c in enumerate(COLS_COMPRAS): ws.write(0, i, c, fm["amar"] if i in range(9, 15) else fm["azul"])
+    escribir_filas(ws, filas, COLS_COMPRAS, fm["num"], fm["txt"])
+    # TOTALES COMPRAS (con el resultado en caché para visores que no recalculan)
+    tot = totales_columnas(filas, COLS_COMPRAS[9:19])
+    ft = len(filas) + 1; ws.write(ft, 0, "TOTAL", fm["tot"])
+    for ci in range(9, 19):
+        l = xl_col_to_name(ci)
+        ws.write_formula(ft, ci, f"=SUM({l}2:{l}{ft})", fm["tot"], tot[COLS_COMPRAS[ci]])
+
+
+def _hoja_reporte_anual(wb, fm, data_compras, memoria_constante=False, formulas=False):
+    tot = totales_compras(data_compras)
+    fin = len(data_compras) + 1
+    rango = lambda l: f"'COMPRAS'!${l}$2:${l}${fin}"
+    ws = wb.add_worksheet('REPORTE ANUAL')
+    ws.set_footer(TEXTO_PIE)
+    ws.set_column('A:K', 14)
+    # Fila 1 completa antes del merge vertical: en constant_memory no se puede volver a una fila
+    # ya escrita, así que ahí solo se combina B1:B2 y K1/K2 quedan como dos celdas con el mismo formato
+    for i, ic in enumerate(ICONOS): ws.write(0, i+2, ic, fm["azul"])
+    ws.write('K1', "Total Mes", fm["azul"])
+    ws.merge_range('B1:B2', "Negocios y\nServicios", fm["azul"])
+    if memoria_constante: ws.write_blank('K2', None, fm["azul"])
+    else: ws.merge_range('K1:K2', "Total Mes", fm["azul"])
+    for i, ct in enumerate(CATEGORIAS): ws.write(1, i+2, ct.title(), fm["azul"])
+    ws.write('B3', "PROFESIONALES", fm["gris"]); ws.merge_range('C3:J3', "GASTOS PERSONALES", fm["gris"])
+    for r, mes in enumerate(MESES):
+        f_idx = r+4; fila = [float(v) for v in tot.loc[mes]]
+        ws.write(r+3, 0, mes.title(), fm["num"])
+        # Profesionales y luego una columna por categoría
+        for c, (crit_col, crit) in enumerate([("I", "PROFESIONAL")] + [("H", ct) for ct in CATEGORIAS]):
+            f = "="+"+".join([f"SUMIFS({rango(l)},{rango('A')},\"{mes}\",{rango(crit_col)},\"{crit}\")" for l in CL_SUM]) if formulas else None
+            _celda(ws, r+3, c+1, fila[c], f, fm["num"])
+        _celda(ws, r+3, 10, sum(fila), f"=SUM(B{f_idx}:J{f_idx})" if formulas else None, fm["num"])
+    ws.write(15, 0, "TOTAL", fm["tot"])
+    totales = [float(v) for v in tot.sum()]
+    for c in range(1,11):
+        l = xl_col_to_name(c)
+        _celda(ws, 15, c, totales[c-1] if c < 10 else sum(totales), f"=SUM({l}4:{l}15)" if formulas else None, fm["tot"])
+
+
+def _hoja_ventas(wb, fm, filas):
+    ws = wb.add_worksheet('VENTAS')
+    for i, c in enumerate(COLS_VENTAS): ws.write(0, i, c, fm["verd"] if i >= 12 else fm["azul"])
+    escribir_filas(ws, filas, COLS_VENTAS, fm["num"], fm["txt"])
+
+
+def _hoja_proyeccion(wb, fm, data_ventas_ret, data_compras, formulas=False):
+    ventas = totales_ventas(data_ventas_ret)
+    compras = totales_compras(data_compras)["PROFESIONAL"] if data_compras else None
+    fin_v, fin_c = len(data_ventas_ret) + 1, len(data_compras or []) + 1
+    ws = wb.add_worksheet('PROYECCION')
+    ws.set_column('A:M', 15)
+    letras = [xl_col_to_name(c + 1) for c in range(len(MESES))]
+    for c, mes in enumerate(MESES): ws.write(1, c + 1, mes, fm["azul"])
+    ws.write(2, 0, "VENTAS", fm["azul"])
+    for c, mes in enumerate(MESES):
+        f = f"=SUMIFS(VENTAS!$I$2:$I${fin_v},VENTAS!$A$2:$A${fin_v},\"{mes}\") + SUMIFS(VENTAS!$J$2:$J${fin_v},VENTAS!$A$2:$A${fin_v},\"{mes}\")"
+        _celda(ws, 2, c + 1, float(ventas[mes]), f if formulas else None, fm["num"])
+    ws.write(3, 0, "COMPRAS", fm["azul"])
+    if compras is not None:
+        for c, l in enumerate(letras):
+            f = "="+"+".join([f"SUMIFS('COMPRAS'!${x}$2:${x}${fin_c},'COMPRAS'!$A$2:$A${fin_c},{l}$2,'COMPRAS'!$I$2:$I${fin_c},\"PROFESIONAL\")" for x in CL_SUM])
+            _celda(ws, 3, c + 1, float(compras[MESES[c]]), f if formulas else None, fm["num"])
+    ws.write(4, 0, "TOTAL", fm["azul"])
+    for c, l in enumerate(letras):
+        _celda(ws, 4, c + 1, float(ventas[MESES[c]]) - (float(compras[MESES[c]]) if compras is not None else 0.0), f"={l}3-{l}4" if formulas else None, fm["tot"])
+
+
+def generar_excel_multiexcel(data_compras=None, data_ventas_ret=None, data_sri_lista=None, sri_mode=None, memoria_constante=None, destino=None, formulas=False):
+    """Bytes del libro, o escribe en `destino` (ruta o archivo) y lo devuelve si se indica.
+    `memoria_constante=None` activa constant_memory a partir de UMBRAL_MEMORIA_CONSTANTE filas.
+    `formulas=True` deja también las fórmulas SUMIFS (acotadas) en REPORTE ANUAL y PROYECCION."""
+    t = time.perf_counter()
+    if memoria_constante is None:
+        n = len(data_sri_lista or []) if sri_mode else len(data_compras or []) + len(data_ventas_ret or [])
+        memoria_constante = n >= UMBRAL_MEMORIA_CONSTANTE
+    output = destino if destino is not None else io.BytesIO()
+    wb = xlsxwriter.Workbook(output, {"constant_memory": bool(memoria_constante)})
+    fm = _formatos(wb)
+    # === MODO SRI ===
+    if sri_mode: _hoja_sri(wb, fm, data_sri_lista or [], sri_mode)
+    # === MODO MANUAL (CON CÁLCULOS) ===
+    else:
+        if data_compras:
+            _hoja_compras(wb, fm, data_compras)
+            _hoja_reporte_anual(wb, fm, data_compras, memoria_constante, formulas)
+        if data_ventas_ret:
+            _hoja_ventas(wb, fm, data_ventas_ret)
+            _hoja_proyeccion(wb, fm, data_ventas_ret, data_compras, formulas)
+    wb.close()
+    m, modo = obtener_metricas(), sri_mode or "manual"
+    m.observar("excel_segundos", time.perf_counter() - t, modo=modo)
+    if isinstance(output, str): tam = os.path.getsize(output)
+    else:
+        try: tam = output.tell()
+        except (AttributeError, OSError): tam = None
+    if tam: m.observar("excel_bytes", tam, cubetas=CUBETAS_BYTES, modo=modo)
+    return output if destino is not None else output.getvalue()
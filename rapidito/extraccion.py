@@ -0,0 +1,153 @@
+"""Extracción de filas a partir de XML de comprobantes del SRI (FC, NC, RET, LC).
+
+El documento se recorre una sola vez: una tabla de etiquetas indica qué nodos interesan
+(el primero de cada campo de cabecera y todos los de impuestos, retenciones y detalle)
+y los cálculos se hacen después sobre esos nodos, sin volver a escanear el árbol.
+
+No hay que esperar de esto mucha más velocidad que la del motor anterior: más de la mitad
+del tiempo es el análisis del XML (expat), que no cambia, y con comprobantes de cientos de
+líneas la diferencia se pierde en el ruido de la medición. benchmarks/bench_extraccion.py
+compara ambos motores en la máquina donde se corra (--lineas fija el tamaño del detalle).
+"""
+import re
+import time
+import xml.etree.ElementTree as ET
+
+from rapidito.clasificacion import clasificar, clasificar_detalle, reclasificar  # noqa: F401 (reexportadas)
+from rapidito.metricas import obtener_metricas
+
+MESES = {"01":"ENERO","02":"FEBRERO","03":"MARZO","04":"ABRIL","05":"MAYO","06":"JUNIO","07":"JULIO","08":"AGOSTO","09":"SEPTIEMBRE","10":"OCTUBRE","11":"NOVIEMBRE","12":"DICIEMBRE"}
+
+# Tabla de despacho etiqueta -> destino. Campos de cabecera: cuenta el primer nodo con esa
+# etiqueta. Nodos repetidos (impuestos, retenciones, detalle): se guardan todos en orden.
+_PRIMERO, _LISTA, _AUTORIZACION = 0, 1, 2
+_LISTAS = ("impuesto", "retencion", "totalImpuesto", "detalle")
+_DESPACHO = dict.fromkeys(["razonSocial", "ruc", "estab", "ptoEmi", "secuencial", "fechaEmision",
+                           "identificacionComprador", "identificacionSujetoRetenido", "razonSocialComprador",
+                           "razonSocialSujetoRetenido", "claveAcceso", "numDocSustento", "importeTotal", "total",
+                           "valorModificado", "propina"], _PRIMERO)
+_DESPACHO.update(dict.fromkeys(_LISTAS, _LISTA), numeroAutorizacion=_AUTORIZACION)
+_RE_DECLARACION = re.compile(r'<\?xml.*?\?>')
+
+
+def _indexar(raiz, envoltura=False):
+    """Un solo recorrido de `raiz` (sin contar la raíz, como find(".//tag")). Con `envoltura`
+    también localiza el comprobante embebido (CDATA de la respuesta SOAP) y el primer
+    numeroAutorizacion."""
+    primeros, listas = {}, {t: [] for t in _LISTAS}
+    embebido = autorizacion = None
+    if envoltura and raiz.text and "<" in raiz.text and 'comprobante' in raiz.tag.lower(): embebido = raiz
+    despacho = _DESPACHO
+    it = raiz.iter(); next(it)
+    for el in it:
+        t = el.tag; k = despacho.get(t)
+        if k is _PRIMERO:
+            if t not in primeros: primeros[t] = el
+        elif k is _LISTA: listas[t].append(el)
+        elif envoltura:
+            if k is _AUTORIZACION:
+                if autorizacion is None: autorizacion = el
+            elif embebido is None:
+                txt = el.text
+                if txt and "<" in txt and 'comprobante' in t.lower(): embebido = el
+    return primeros, listas, embebido, autorizacion
+
+
+def extraer_datos_robusto(xml_file, empresas):
+    """Fila del comprobante o None si el XML no se puede interpretar.
+    `empresas` es la tabla NOMBRE -> {"DETALLE", "MEMO"} (o su IndiceEmpresas) usada para clasificar."""
+    m, t = obtener_metricas(), time.perf_counter()
+    try: return extraer_fila(xml_file, empresas)
+    except Exception as e:
+        m.contar("extraccion_fallos_total", motivo=type(e).__name__); return None
+    finally: m.observar("extraccion_segundos", time.perf_counter() - t)
+
+
+def extraer_fila(xml_file, empresas):
+    """Como extraer_datos_robusto, pero deja pasar la excepción para poder informar el motivo."""
+    xml_file.seek(0); root = ET.parse(xml_file).getroot()
+    primeros, listas, embebido, nodo_aut = _indexar(root, envoltura=True)
+    if embebido is not None:
+        xml_data = ET.fromstring(_RE_DECLARACION.sub('', embebido.text).strip())
+        primeros, listas, _, _ = _indexar(xml_data)
+    else: xml_data = root
+
+    def buscar(tags):
+        for t in tags:
+            f = primeros.get(t)
+            if f is not None and f.text: return f.text.strip()
+        return ""
+
+    tag = xml_data.tag.lower()
+    tipo = "NC" if "notacredito" in tag else "RET" if "retencion" in tag else "LC" if "liquidacion" in tag else "FC"
+    razon_social = buscar(["razonSocial"]).upper()
+    ruc_emisor = buscar(["ruc"])
+    num_fact = f"{buscar(['estab']) or '000'}-{buscar(['ptoEmi']) or '000'}-{buscar(['secuencial']) or '000'}"
+    fecha = buscar(["fechaEmision"])
+    ruc_cli = buscar(["identificacionComprador", "identificacionSujetoRetenido"])
+    nom_cli = buscar(["razonSocialComprador", "razonSocialSujetoRetenido"]).upper()
+    detalle_final, memo_final, fuente, puntaje = clasificar_detalle(razon_social, ruc_cli, empresas, ruc_emisor)
+
+    aut_ws = (nodo_aut.text or "") if nodo_aut is not None else None
+    autorizacion_final = aut_ws if aut_ws else buscar(["claveAcceso"])
+
+    data = {
+        "TIPO": tipo,
+        "TIPO DE DOCUMENTO": tipo,
+        "FECHA": fecha,
+        "N. FACTURA": num_fact,
+        "RUC": ruc_emisor,
+        "CONTRIBUYENTE": ruc_cli,
+        "NOMBRE": razon_social,
+        "RUC CLIENTE": ruc_cli,
+        "CLIENTE": nom_cli,
+        "DETALLE": detalle_final,
+        "MEMO": memo_final,
+        "CLASIFICACION": fuente,
+        "SIMILITUD": round(puntaje, 3),
+        "N AUTORIZACION": autorizacion_final
+    }
+    if "/" in fecha: data["MES"] = MESES.get(fecha.split('/')[1], "DESCONOCIDO")
+
+    if tipo == "RET":
+        r_renta, r_iva, b_renta, b_iva = 0.0, 0.0, 0.0, 0.0
+        node = primeros.get("numDocSustento")
+        sus = node.text.replace('-','') if (node is not None and node.text) else ""
+        if len(sus) >= 15: sus = f"{sus[0:3]}-{sus[3:6]}-{sus[6:]}"
+        for item in listas["impuesto"] + listas["retencion"]:
+            try:
+                c, v, b = item.find("codigo").text, float(item.find("valorRetenido").text or 0), float(item.find("baseImponible").text or 0)
+                if c == "1": r_renta += v; b_renta += b
+                elif c == "2": r_iva += v; b_iva += b
+            except Exception: continue
+        data.update({"numfact": sus, "numreten": num_fact, "baserenta": b_renta, "rt_renta": r_renta, "baseiva": b_iva, "rt_iva": r_iva, "TOTAL RET": r_renta+r_iva, "SUSTENTO": sus, "fechaemi": fecha})
+    else:
+        m = -1 if tipo == "NC" else 1
+        b0, b12, i12, ice, no_obj, exento, otra_b, otro_i = 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0
+        for imp in listas["totalImpuesto"]:
+            try:
+                c, cp = imp.find("codigo").text, imp.find("codigoPorcentaje").text
+                b, v = float(imp.find("baseImponible").text or 0)*m, float(imp.find("valor").text or 0)*m
+                if c == "2":
+                    if cp == "0": b0 += b
+                    elif cp in ["2","3","4","8","10"]: b12 += b; i12 += v
+                    elif cp == "6": no_obj += b
+                    elif cp == "7": exento += b
+                    else: otra_b += b; otro_i += v
+                elif c == "3": ice += v
+            except Exception: continue
+
+        total_val = 0.0
+        for t_tag in ["importeTotal", "total", "valorModificado"]:
+            f = primeros.get(t_tag)
+            if f is not None: total_val = float(f.text) * m; break
+
+        p_node = primeros.get("propina")
+        prop = float(p_node.text or 0) * m if p_node is not None else 0.0
+
+        items = []
+        for d in listas["detalle"]:
+            desc = d.find("descripcion")
+            if desc is not None: items.append(desc.text)
+        data.update({"OTRA BASE IVA": otra_b, "OTRO IVA": otro_i, "MONTO ICE": ice, "PROPINAS": prop, "EXENTO DE IVA": exento, "NO OBJ IVA": no_obj, "BASE. 0": b0, "BASE. 12 / 15": b12, "IVA.": i12, "TOTAL": total_val, "SUBDETALLE": " | ".join(items[:5])})
+    return data
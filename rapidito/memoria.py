@@ -0,0 +1,124 @@
+"""Memoria contable (tabla de empresas para clasificar) guardada en SQLite.
+
+Sustituye a reescribir `conocimiento_contable.json` entero en cada carga: las
+actualizaciones son upserts por lotes dentro de una transacción (WAL, así los lectores
+nunca ven un estado a medias) y todas las sesiones del proceso comparten un único dict
+de lectura, que se vuelve a leer solo cuando cambia la versión de la tabla. La primera
+vez se importa el JSON existente.
+"""
+import json
+import os
+import sqlite3
+import threading
+
+from rapidito.clasificacion import invalidar_indice
+
+RUTA_MEMORIA = os.environ.get("RAPIDITO_MEMORIA", "memoria_contable.sqlite3")
+RUTA_JSON = "conocimiento_contable.json"
+
+
+def _ruc(valor):
+    """RUC leído del Excel o None. Si llega como número pierde el 0 inicial (provincias 01-09):
+    solo a los de 12 dígitos se les devuelve; los demás quedan como vienen."""
+    if valor is None or valor != valor: return None
+    r = str(valor).split(".")[0].strip()
+    if not r.isdigit(): return None
+    return "0" + r if len(r) == 12 else r
+
+
+class MemoriaContable:
+    def __init__(self, ruta=RUTA_MEMORIA, ruta_json=RUTA_JSON):
+        self.ruta = ruta
+        self.lock = threading.Lock()
+        self.con = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.execute("PRAGMA busy_timeout=10000")
+        self.con.execute("""CREATE TABLE IF NOT EXISTS empresas (
+            nombre TEXT PRIMARY KEY, detalle TEXT NOT NULL, memo TEXT NOT NULL, ruc TEXT)""")
+        self.con.execute("CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT)")
+        self._empresas, self._version = None, None
+        if ruta_json and os.path.exists(ruta_json): self.migrar_json(ruta_json)
+
+    def _leer_version(self):
+        r = self.con.execute("SELECT valor FROM meta WHERE clave='version'").fetchone()
+        return r[0] if r else "0"
+
+    def migrar_json(self, ruta_json):
+        """Importa el JSON antiguo una sola vez (queda anotado en la tabla meta)."""
+        with self.lock:
+            if self.con.execute("SELECT 1 FROM meta WHERE clave='json_migrado'").fetchone(): return 0
+            with open(ruta_json, "r", encoding="utf-8") as f: empresas = json.load(f).get("empresas", {})
+            filas = [(nm, str(i.get("DETALLE", "OTROS")), str(i.get("MEMO", "PROFESIONAL")), i.get("RUC") or None) for nm, i in empresas.items()]
+            self._escribir(filas, migracion=ruta_json)
+        return len(filas)
+
+    def _escribir(self, filas, migracion=None):
+        """Upsert de (nombre, detalle, memo, ruc) en una sola transacción. Llamar con el lock tomado.
+        Las filas que no cambian nada no se reescriben y, si ninguna cambió, la versión se queda
+        igual (volver a subir el mismo Excel no obliga a releer la tabla ni a rehacer el índice)."""
+        con = self.con
+        con.execute("BEGIN IMMEDIATE")
+        try:
+            antes = con.total_changes
+            con.executemany("""INSERT INTO empresas VALUES (?,?,?,?) ON CONFLICT(nombre) DO UPDATE SET
+                detalle=excluded.detalle, memo=excluded.memo, ruc=COALESCE(excluded.ruc, empresas.ruc)
+                WHERE detalle IS NOT excluded.detalle OR memo IS NOT excluded.memo
+                   OR (excluded.ruc IS NOT NULL AND ruc IS NOT excluded.ruc)""", filas)
+            cambios = con.total_changes - antes
+            if cambios:
+                con.execute("""INSERT INTO meta VALUES ('version', '1') ON CONFLICT(clave) DO UPDATE SET
+                    valor=CAST(valor AS INTEGER) + 1""")
+            if migracion: con.execute("INSERT OR REPLACE INTO meta VALUES ('json_migrado', ?)", (migracion,))
+            con.execute("COMMIT")
+        except BaseException:
+            con.execute("ROLLBACK"); raise
+        if cambios: self._soltar()
+        return cambios
+
+    def _soltar(self):
+        if self._empresas is not None: invalidar_indice(self._empresas)
+        self._empresas, self._version = None, None
+
+    def empresas(self):
+        """Dict NOMBRE -> {"DETALLE", "MEMO"[, "RUC"]} compartido por todo el proceso. Es de
+        solo lectura: los cambios se hacen con actualizar() o cargar_excel()."""
+        with self.lock:
+            version = self._leer_version()
+            if self._empresas is None or version != self._version:
+                self._soltar()
+                self._empresas = {nm: ({"DETALLE": d, "MEMO": m, "RUC": r} if r else {"DETALLE": d, "MEMO": m})
+                                  for nm, d, m, r in self.con.execute("SELECT nombre, detalle, memo, ruc FROM empresas")}
+                self._version = version
+            return self._empresas
+
+    def actualizar(self, filas):
+        """Upsert de filas (nombre, detalle, memo, ruc|None); devuelve cuántas se escribieron."""
+        filas = list(filas)
+        with self.lock: self._escribir(filas)
+        return len(filas)
+
+    def cargar_excel(self, df):
+        """Upsert desde el Excel de Master Config (columnas NOMBRE, DETALLE, MEMO y, opcional, RUC)."""
+        import pandas as pd
+        df = df.rename(columns=lambda c: str(c).upper().strip())
+        vacio = pd.Series(None, index=df.index, dtype=object)
+        nombre = df.get("NOMBRE", vacio).fillna("").astype(str).str.upper().str.strip()
+        detalle = df.get("DETALLE", vacio).fillna("OTROS").astype(str).str.upper()
+        memo = df.get("MEMO", vacio).fillna("PROFESIONAL").astype(str).str.upper()
+        ruc = df.get("RUC", vacio).map(_ruc)
+        ok = nombre != ""
+        return self.actualizar(zip(nombre[ok], detalle[ok], memo[ok], ruc[ok]))
+
+    def cerrar(self):
+        with self.lock: self.con.close()
+
+
+_MEMORIA, _LOCK_MEMORIA = None, threading.Lock()
+
+def obtener_memoria():
+    """Memoria contable del proceso (RAPIDITO_MEMORIA); al abrirla por primera vez migra el JSON antiguo."""
+    global _MEMORIA
+    with _LOCK_MEMORIA:
+        if _MEMORIA is None: _MEMORIA = MemoriaContable()
+        return _MEMORIA
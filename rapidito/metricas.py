@@ -0,0 +1,231 @@
+"""Métricas de rendimiento por etapa: descarga del SRI, extracción, clasificación y Excel.
+
+Contadores, valores actuales e histogramas en memoria del proceso, con etiquetas. Se leen
+como dict (JSON), en formato de texto de Prometheus o, con RAPIDITO_METRICAS_PUERTO, por
+HTTP en /metrics y /metrics.json. perfilar() envuelve una ejecución con cProfile cuando se
+activa (una sola vez con activar_perfil(), o siempre con RAPIDITO_PERFIL=1).
+
+Los procesos de extracción tienen su propio registro: cada bloque devuelve lo medido con
+vaciar() y el proceso principal lo suma con fusionar().
+"""
+import bisect
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIJO = "rapidito_"
+# Límites superiores de los histogramas: segundos y bytes
+CUBETAS_SEGUNDOS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+CUBETAS_BYTES = (1e4, 1e5, 1e6, 5e6, 1e7, 5e7, 1e8, 5e8)
+
+# Descripción de cada métrica (para el panel y el HELP de Prometheus)
+AYUDA = {
+    "sri_latencia_segundos": "Duración de cada petición HTTP al web service del SRI",
+    "sri_respuestas_total": "Claves consultadas al SRI por estado final",
+    "sri_reintentos_total": "Peticiones repetidas por timeout, error de conexión o 5xx",
+    "sri_errores_total": "Intentos fallidos contra el SRI por motivo",
+    "sri_cache_total": "Claves servidas desde la caché local (acierto) o pedidas a la red (fallo)",
+    "extraccion_segundos": "Tiempo de extracción por documento (incluye clasificación)",
+    "extraccion_fallos_total": "Documentos que no se pudieron leer, por motivo",
+    "extraccion_lote_segundos": "Duración de cada lote de extracción",
+    "extraccion_lote_documentos_total": "Documentos procesados en lotes",
+    "extraccion_docs_por_segundo": "Documentos por segundo del último lote",
+    "clasificacion_total": "Proveedores clasificados por fuente (RUC, NOMBRE, APROXIMADO...)",
+    "clasificacion_aproximada_segundos": "Tiempo de la búsqueda por trigramas (sin memorizar)",
+    "excel_segundos": "Tiempo de generación de cada libro",
+    "excel_bytes": "Tamaño de cada libro generado",
+    "clientes_lote_segundos": "Duración de cada ZIP de informes por contribuyente",
+    "clientes_libros_total": "Libros de contribuyentes generados en lotes",
+}
+
+
+def _clave(nombre, etiquetas):
+    return nombre, tuple(sorted(etiquetas.items()))
+
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(et):
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in et) + "}" if et else ""
+
+
+class Metricas:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reiniciar()
+
+    def reiniciar(self):
+        with self.lock:
+            self.contadores, self.valores, self.histogramas = {}, {}, {}
+            self.desde = time.time()
+
+    def contar(self, nombre, n=1, **etiquetas):
+        k = _clave(nombre, etiquetas)
+        with self.lock: self.contadores[k] = self.contadores.get(k, 0) + n
+
+    def fijar(self, nombre, valor, **etiquetas):
+        with self.lock: self.valores[_clave(nombre, etiquetas)] = valor
+
+    def observar(self, nombre, valor, cubetas=CUBETAS_SEGUNDOS, **etiquetas):
+        k = _clave(nombre, etiquetas)
+        with self.lock:
+            h = self.histogramas.get(k)
+            if h is None: h = self.histogramas[k] = {"cubetas": tuple(cubetas), "conteos": [0] * (len(cubetas) + 1), "suma": 0.0, "n": 0, "max": 0.0}
+            h["conteos"][bisect.bisect_left(h["cubetas"], valor)] += 1
+            h["suma"] += valor; h["n"] += 1
+            if valor > h["max"]: h["max"] = valor
+
+    @contextmanager
+    def cronometro(self, nombre, **etiquetas):
+        t = time.perf_counter()
+        try: yield
+        finally: self.observar(nombre, time.perf_counter() - t, **etiquetas)
+
+    def vaciar(self):
+        """Lo medido hasta ahora (para enviarlo a otro proceso) y vuelve a cero."""
+        with self.lock:
+            datos = (self.contadores, self.valores, self.histogramas)
+            self.contadores, self.valores, self.histogramas = {}, {}, {}
+        return datos
+
+    def fusionar(self, datos):
+        contadores, valores, histogramas = datos
+        with self.lock:
+            for k, n in contadores.items(): self.contadores[k] = self.contadores.get(k, 0) + n
+            self.valores.update(valores)
+            for k, h in histogramas.items():
+                mio = self.histogramas.get(k)
+                if mio is None or mio["cubetas"] != h["cubetas"]: self.histogramas[k] = h; continue
+                mio["conteos"] = [a + b for a, b in zip(mio["conteos"], h["conteos"])]
+                mio["suma"] += h["suma"]; mio["n"] += h["n"]; mio["max"] = max(mio["max"], h["max"])
+
+    @staticmethod
+    def _percentil(h, q):
+        """Estimación por cubetas (el límite superior de la cubeta donde cae el percentil)."""
+        if not h["n"]: return 0.0
+        objetivo, acumulado = q * h["n"], 0
+        for limite, c in zip(h["cubetas"] + (h["max"],), h["conteos"]):
+            acumulado += c
+            if acumulado >= objetivo: return min(limite, h["max"])
+        return h["max"]
+
+    def instantanea(self):
+        """Dict apto para JSON con todas las métricas."""
+        with self.lock:
+            contadores, valores = dict(self.contadores), dict(self.valores)
+            histogramas = {k: dict(h, conteos=list(h["conteos"])) for k, h in self.histogramas.items()}
+        fila = lambda k: {"nombre": k[0], "etiquetas": dict(k[1])}
+        return {
+            "desde": self.desde, "ahora": time.time(),
+            "contadores": [dict(fila(k), valor=v) for k, v in sorted(contadores.items())],
+            "valores": [dict(fila(k), valor=v) for k, v in sorted(valores.items())],
+            "histogramas": [dict(fila(k), n=h["n"], suma=h["suma"], media=h["suma"] / h["n"] if h["n"] else 0.0, max=h["max"],
+                                 p50=self._percentil(h, 0.5), p95=self._percentil(h, 0.95), p99=self._percentil(h, 0.99),
+                                 cubetas=list(h["cubetas"]), conteos=h["conteos"]) for k, h in sorted(histogramas.items())],
+        }
+
+    def json(self):
+        return json.dumps(self.instantanea(), ensure_ascii=False, indent=1)
+
+    def prometheus(self):
+        """Formato de exposición de texto de Prometheus (0.0.4)."""
+        with self.lock:
+            contadores, valores = sorted(self.contadores.items()), sorted(self.valores.items())
+            histogramas = sorted((k, dict(h, conteos=list(h["conteos"]))) for k, h in self.histogramas.items())
+        out, vistos = [], set()
+        def cabecera(nombre, tipo):
+            if nombre in vistos: return
+            vistos.add(nombre)
+            if nombre in AYUDA: out.append(f"# HELP {PREFIJO}{nombre} {AYUDA[nombre]}")
+            out.append(f"# TYPE {PREFIJO}{nombre} {tipo}")
+        for (nombre, et), v in contadores:
+            cabecera(nombre, "counter"); out.append(f"{PREFIJO}{nombre}{_etiquetas(et)} {v}")
+        for (nombre, et), v in valores:
+            cabecera(nombre, "gauge"); out.append(f"{PREFIJO}{nombre}{_etiquetas(et)} {v}")
+        for (nombre, et), h in histogramas:
+            cabecera(nombre, "histogram"); acumulado = 0
+            for limite, c in zip(h["cubetas"] + ("+Inf",), h["conteos"]):
+                acumulado += c
+                out.append(f"{PREFIJO}{nombre}_bucket{_etiquetas(et + (('le', limite),))} {acumulado}")
+            out.append(f"{PREFIJO}{nombre}_sum{_etiquetas(et)} {h['suma']}")
+            out.append(f"{PREFIJO}{nombre}_count{_etiquetas(et)} {h['n']}")
+        return "\n".join(out) + "\n"
+
+
+_METRICAS = Metricas()
+
+def obtener_metricas():
+    """Registro único del proceso (cada proceso de extracción tiene el suyo)."""
+    return _METRICAS
+
+
+# --- Perfil con cProfile, bajo demanda ---
+_PERFIL = {"pendiente": os.environ.get("RAPIDITO_PERFIL", "") not in ("", "0"), "siempre": os.environ.get("RAPIDITO_PERFIL", "") not in ("", "0"), "ultimo": None}
+_LOCK_PERFIL = threading.Lock()
+
+
+def activar_perfil():
+    """La próxima ejecución envuelta en perfilar() se perfila."""
+    _PERFIL["pendiente"] = True
+
+
+def ultimo_perfil():
+    """(nombre, texto con las 30 funciones de más tiempo acumulado, pstats.Stats) o None."""
+    return _PERFIL["ultimo"]
+
+
+@contextmanager
+def perfilar(nombre, destino=None):
+    """Perfila el bloque si se pidió (activar_perfil, RAPIDITO_PERFIL=1 o `destino`), solo en el
+    hilo actual: los procesos de extracción no aparecen. `destino` guarda el .prof para snakeviz/pstats."""
+    with _LOCK_PERFIL:
+        activo = destino is not None or _PERFIL["pendiente"]
+        if activo and not _PERFIL["siempre"]: _PERFIL["pendiente"] = False
+    if not activo:
+        yield; return
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try: yield
+    finally:
+        perfil.disable()
+        texto = io.StringIO()
+        stats = pstats.Stats(perfil, stream=texto).sort_stats("cumulative")
+        stats.print_stats(30)
+        if destino: stats.dump_stats(destino)
+        _PERFIL["ultimo"] = (nombre, texto.getvalue(), stats)
+
+
+# --- Exportación por HTTP ---
+_SERVIDOR = None
+
+
+def servir(puerto, host="127.0.0.1"):
+    """Sirve /metrics (Prometheus) y /metrics.json en un hilo; una sola vez por proceso."""
+    global _SERVIDOR
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    with _LOCK_PERFIL:
+        if _SERVIDOR is not None: return _SERVIDOR
+
+        class Manejador(BaseHTTPRequestHandler):
+            def log_message(self, *a): pass
+            def do_GET(self):
+                if self.path.split("?")[0] == "/metrics.json": datos, tipo = obtener_metricas().json(), "application/json"
+                elif self.path.split("?")[0] == "/metrics": datos, tipo = obtener_metricas().prometheus(), "text/plain; version=0.0.4"
+                else: self.send_error(404); return
+                datos = datos.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", f"{tipo}; charset=utf-8" if "charset" not in tipo else tipo)
+                self.send_header("Content-Length", str(len(datos)))
+                self.end_headers(); self.wfile.write(datos)
+
+        _SERVIDOR = ThreadingHTTPServer((host, int(puerto)), Manejador)
+        _SERVIDOR.daemon_threads = True
+        threading.Thread(target=_SERVIDOR.serve_forever, name="metricas", daemon=True).start()
+        return _SERVIDOR
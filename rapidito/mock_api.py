@@ -0,0 +1,48 @@
+"""Servidor HTTP local que imita el backend de usuarios y el registro de actividad (Apps Script).
+
+Uso: python -m rapidito.mock_api --puerto 8090
+y luego RAPIDITO_URL_API / RAPIDITO_URL_ACTIVIDAD = http://127.0.0.1:8090/
+"""
+import argparse
+import json
+import threading
+import time
+
+from rapidito.mock_http import ServidorSimulado
+
+
+class ServidorAPISimulado(ServidorSimulado):
+    """Guarda en `recibidos` cada JSON que llega. `latencia` (s) simula un endpoint lento y
+    `caido=True` responde 503 a todo. LOGIN acepta cualquier usuario con la clave `clave`."""
+    tipo_contenido = "application/json"
+
+    def __init__(self, latencia=0.0, clave="Rapidito2026", host="127.0.0.1", puerto=0):
+        super().__init__(host, puerto)
+        self.latencia, self.clave, self.caido = latencia, clave, False
+        self.recibidos = []; self.lock = threading.Lock()
+        self.url = f"http://{host}:{self.puerto}/"
+
+    def atender(self, cuerpo):
+        codigo, respuesta = self.responder(cuerpo)
+        return codigo, json.dumps(respuesta).encode("utf-8")
+
+    def responder(self, cuerpo):
+        if self.latencia: time.sleep(self.latencia)
+        if self.caido: return 503, {"exito": False}
+        try: payload = json.loads(cuerpo)
+        except ValueError: return 400, {"exito": False, "mensaje": "JSON inválido"}
+        with self.lock: self.recibidos.append(payload)
+        if payload.get("accion") == "LOGIN":
+            ok = payload.get("clave") == self.clave
+            return 200, {"exito": ok, "invitaciones": 3, "premium": False} if ok else {"exito": False}
+        return 200, {"exito": True}
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Backend de usuarios simulado para pruebas locales")
+    ap.add_argument("--puerto", type=int, default=8090)
+    ap.add_argument("--latencia", type=float, default=0.0)
+    a = ap.parse_args()
+    srv = ServidorAPISimulado(a.latencia, puerto=a.puerto)
+    print(f"API simulada en {srv.url}")
+    srv.servir()
@@ -0,0 +1,50 @@
+"""Base de los servidores HTTP locales de prueba (rapidito.mock_sri y rapidito.mock_api).
+
+La subclase implementa `atender(cuerpo)`, que recibe los bytes de cada POST y devuelve
+(código, bytes de la respuesta); la base corre el servidor en un hilo daemon entre
+iniciar() y detener() (o dentro de un `with`), o en el hilo actual con servir().
+"""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ServidorSimulado:
+    tipo_contenido = "application/octet-stream"
+
+    def __init__(self, host="127.0.0.1", puerto=0):
+        simulado = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True  # cabeceras y cuerpo van en escrituras separadas
+            def log_message(self, *a): pass
+            def do_POST(self):
+                codigo, datos = simulado.atender(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                self.send_response(codigo)
+                self.send_header("Content-Type", simulado.tipo_contenido)
+                self.send_header("Content-Length", str(len(datos)))
+                self.end_headers(); self.wfile.write(datos)
+
+        self.httpd = ThreadingHTTPServer((host, puerto), Manejador)
+        self.httpd.daemon_threads = True
+        self.host, self.puerto = host, self.httpd.server_address[1]
+        self.hilo = None
+
+    def atender(self, cuerpo):
+        raise NotImplementedError
+
+    def iniciar(self):
+        self.hilo = threading.Thread(target=self.httpd.serve_forever, daemon=True); self.hilo.start()
+        return self
+
+    def detener(self):
+        self.httpd.shutdown(); self.httpd.server_close()
+
+    def servir(self):
+        """Atiende en el hilo actual hasta Ctrl+C (para `python -m`)."""
+        try: self.httpd.serve_forever()
+        except KeyboardInterrupt: pass
+        finally: self.httpd.server_close()
+
+    def __enter__(self): return self.iniciar()
+    def __exit__(self, *exc): self.detener()
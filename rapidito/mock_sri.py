@@ -0,0 +1,74 @@
+"""Servidor SOAP local que imita AutorizacionComprobantesOffline, para pruebas sin red.
+
+Uso: python -m rapidito.mock_sri --dir carpeta_con_xmls --puerto 8089
+(cada comprobante se busca como <claveAcceso>.xml dentro de la carpeta)
+"""
+import argparse
+import os
+import random
+import re
+import threading
+import time
+
+from rapidito.mock_http import ServidorSimulado
+
+RESPUESTA = ('<?xml version="1.0" encoding="UTF-8"?><soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+             '<ns2:autorizacionComprobanteResponse xmlns:ns2="http://ec.gob.sri.ws.autorizacion"><RespuestaAutorizacionComprobante>'
+             '<claveAccesoConsultada>{clave}</claveAccesoConsultada><numeroComprobantes>{n}</numeroComprobantes>{autorizaciones}'
+             '</RespuestaAutorizacionComprobante></ns2:autorizacionComprobanteResponse></soap:Body></soap:Envelope>')
+AUTORIZACION = ('<autorizaciones><autorizacion><estado>{estado}</estado><numeroAutorizacion>{clave}</numeroAutorizacion>'
+                '<fechaAutorizacion>2024-01-01T00:00:00-05:00</fechaAutorizacion><ambiente>PRODUCCIÓN</ambiente>'
+                '<comprobante><![CDATA[{xml}]]></comprobante><mensajes/></autorizacion></autorizaciones>')
+
+
+def respuesta_autorizacion(clave, xml_comprobante=None, estado="AUTORIZADO"):
+    if xml_comprobante is None: return RESPUESTA.format(clave=clave, n=0, autorizaciones="<autorizaciones/>")
+    return RESPUESTA.format(clave=clave, n=1, autorizaciones=AUTORIZACION.format(clave=clave, xml=xml_comprobante, estado=estado))
+
+
+class ServidorSRISimulado(ServidorSimulado):
+    """`comprobantes` es un dict clave -> XML o una función clave -> XML/None; `estados`
+    (clave -> estado) devuelve esas claves con otro estado que AUTORIZADO (p. ej. "NO AUTORIZADO").
+    `latencia` (s) y `tasa_error` (fracción de respuestas 503) simulan un SRI lento o inestable."""
+    tipo_contenido = "text/xml;charset=UTF-8"
+
+    def __init__(self, comprobantes=None, latencia=0.0, tasa_error=0.0, host="127.0.0.1", puerto=0, estados=None):
+        super().__init__(host, puerto)
+        self.comprobantes, self.estados = comprobantes or {}, estados or {}
+        self.latencia, self.tasa_error = latencia, tasa_error
+        self.peticiones = 0; self.lock = threading.Lock()
+        self.url = f"http://{host}:{self.puerto}/comprobantes-electronicos-ws/AutorizacionComprobantesOffline"
+
+    def atender(self, cuerpo):
+        codigo, texto = self.responder(cuerpo.decode("utf-8", "replace"))
+        return codigo, texto.encode("utf-8")
+
+    def responder(self, cuerpo):
+        with self.lock: self.peticiones += 1
+        if self.latencia: time.sleep(self.latencia)
+        if self.tasa_error and random.random() < self.tasa_error: return 503, "Service Unavailable"
+        m = re.search(r'<claveAccesoComprobante>(\d+)</claveAccesoComprobante>', cuerpo)
+        if not m: return 500, "Solicitud inválida"
+        clave = m.group(1)
+        xml = self.comprobantes(clave) if callable(self.comprobantes) else self.comprobantes.get(clave)
+        return 200, respuesta_autorizacion(clave, xml, self.estados.get(clave, "AUTORIZADO"))
+
+
+def _desde_directorio(carpeta):
+    def buscar(clave):
+        ruta = os.path.join(carpeta, f"{clave}.xml")
+        if not os.path.exists(ruta): return None
+        with open(ruta, "r", encoding="utf-8") as f: return re.sub(r'<\?xml.*?\?>', '', f.read()).strip()
+    return buscar
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="SRI simulado para pruebas locales")
+    ap.add_argument("--dir", default=".", help="carpeta con <claveAcceso>.xml")
+    ap.add_argument("--puerto", type=int, default=8089)
+    ap.add_argument("--latencia", type=float, default=0.0)
+    ap.add_argument("--tasa-error", type=float, default=0.0)
+    a = ap.parse_args()
+    srv = ServidorSRISimulado(_desde_directorio(a.dir), a.latencia, a.tasa_error, puerto=a.puerto)
+    print(f"SRI simulado en {srv.url}")
+    srv.servir()
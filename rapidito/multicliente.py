@@ -0,0 +1,144 @@
+"""Informes de varios contribuyentes a partir de una sola carga mezclada.
+
+Las filas extraídas se reparten por contribuyente: una factura o nota de crédito es compra
+de quien la recibe y una factura es venta de quien la emite si ese emisor es uno de los
+contribuyentes del lote; las retenciones recibidas van a las ventas del sujeto retenido.
+Si no se indica la lista de contribuyentes se deduce de la carga, solo de las retenciones:
+el sujeto retenido es siempre un contribuyente. Una factura por sí sola no dice de qué lado
+está (la de un cliente que solo sube sus ventas tiene al comprador como receptor), así que
+las facturas y notas de crédito en que no interviene ningún contribuyente no se asignan a
+nadie: van a la hoja SIN ASIGNAR del índice para que se indiquen los RUC.
+Cada libro (COMPRAS, REPORTE ANUAL, VENTAS, PROYECCION) se genera en paralelo en varios
+procesos (forkserver, como en rapidito.paralelo) y todos van a un único ZIP con un
+INDICE.xlsx de resumen por contribuyente.
+"""
+import io
+import re
+import time
+import zipfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import xlsxwriter
+
+from rapidito.excel import generar_excel_multiexcel, escribir_filas, _formatos, TEXTO_PIE
+from rapidito.metricas import obtener_metricas
+from rapidito.paralelo import PROCESOS, CONTEXTO
+from rapidito.ventas import cruzar_ventas_retenciones
+
+COLS_SIN_ASIGNAR = ["TIPO", "FECHA", "N. FACTURA", "RUC", "NOMBRE", "RUC CLIENTE", "CLIENTE", "N AUTORIZACION"]
+COLS_INDICE = ["RUC", "CONTRIBUYENTE", "ARCHIVO", "N° COMPRAS", "TOTAL COMPRAS", "N° VENTAS", "TOTAL VENTAS",
+               "TOTAL RETENIDO", "VENTAS SIN RETENCIÓN", "RETENCIONES SIN FACTURA"]
+
+
+def identidad(ruc):
+    """RUC de persona natural (cédula + 001) -> cédula, para que ambas formas sean el mismo contribuyente."""
+    r = str(ruc or "").strip()
+    return r[:10] if len(r) == 13 and r.isdigit() and r.endswith("001") else r
+
+
+def deducir_contribuyentes(filas):
+    """Identidades de los contribuyentes presentes en una carga mezclada: los sujetos retenidos
+    (ver el docstring del módulo)."""
+    out = {identidad(d.get("RUC CLIENTE")) for d in filas if d["TIPO"] == "RET"}
+    out.discard("")
+    return out
+
+
+def particionar(filas, contribuyentes=None, sin_asignar=None):
+    """{identidad: {"ruc", "nombre", "compras", "ventas"}} con `ventas` sin cruzar (facturas
+    emitidas y retenciones recibidas). `contribuyentes` es una lista de RUC/cédulas; por
+    defecto se deduce de la carga. `sin_asignar` (lista) recibe los comprobantes que no son
+    de ningún contribuyente."""
+    filas = [d for d in filas if d]
+    sin_asignar = sin_asignar if sin_asignar is not None else []
+    ids = {identidad(c) for c in contribuyentes} if contribuyentes else deducir_contribuyentes(filas)
+    grupos, nombres = {}, {}
+    def grupo(ident, ruc, nombre):
+        if ident not in grupos: grupos[ident] = {"ruc": ruc, "nombre": "", "compras": [], "ventas": []}; nombres[ident] = Counter()
+        if len(ruc) > len(grupos[ident]["ruc"]): grupos[ident]["ruc"] = ruc
+        if nombre: nombres[ident][nombre] += 1
+        return grupos[ident]
+    for d in filas:
+        emisor, receptor = identidad(d.get("RUC")), identidad(d.get("RUC CLIENTE"))
+        if d["TIPO"] == "RET":
+            if receptor in ids: grupo(receptor, d.get("RUC CLIENTE", ""), d.get("CLIENTE"))["ventas"].append(d)
+            else: sin_asignar.append(d)
+        elif d["TIPO"] in ("FC", "NC"):
+            if receptor in ids: grupo(receptor, d.get("RUC CLIENTE", ""), d.get("CLIENTE"))["compras"].append(d)
+            if d["TIPO"] == "FC" and emisor in ids: grupo(emisor, d.get("RUC", ""), d.get("NOMBRE"))["ventas"].append(d)
+            if receptor not in ids and (d["TIPO"] != "FC" or emisor not in ids): sin_asignar.append(d)
+    for ident, g in grupos.items():
+        g["nombre"] = nombres[ident].most_common(1)[0][0] if nombres[ident] else ""
+    return dict(sorted(grupos.items()))
+
+
+def nombre_archivo(g):
+    nombre = re.sub(r"[^A-Z0-9]+", "_", g["nombre"].upper()).strip("_")[:40]
+    return f"{g['ruc']}_{nombre}.xlsx" if nombre else f"{g['ruc']}.xlsx"
+
+
+def _libro(args):
+    """(bytes del libro, fila del índice) de un contribuyente."""
+    g, formulas = args
+    ventas, ret_sin_fc, fc_sin_ret = cruzar_ventas_retenciones(g["ventas"])
+    libro = generar_excel_multiexcel(g["compras"], ventas, formulas=formulas)
+    fila = {"RUC": g["ruc"], "CONTRIBUYENTE": g["nombre"], "ARCHIVO": nombre_archivo(g),
+            "N° COMPRAS": len(g["compras"]), "TOTAL COMPRAS": round(sum(d.get("TOTAL", 0) or 0 for d in g["compras"]), 2),
+            "N° VENTAS": len(ventas), "TOTAL VENTAS": round(sum(v["TOTAL"] or 0 for v in ventas), 2),
+            "TOTAL RETENIDO": round(sum(v["TOTAL RET"] or 0 for v in ventas), 2),
+            "VENTAS SIN RETENCIÓN": len(fc_sin_ret), "RETENCIONES SIN FACTURA": len(ret_sin_fc)}
+    return libro, fila
+
+def _libro_proceso(args):
+    """En un proceso del pool: el libro, su fila del índice y lo medido."""
+    return *_libro(args), obtener_metricas().vaciar()
+
+
+def _indice(filas, sin_asignar=()):
+    salida = io.BytesIO()
+    wb = xlsxwriter.Workbook(salida)
+    fm = _formatos(wb)
+    ws = wb.add_worksheet("INDICE")
+    ws.set_footer(TEXTO_PIE)
+    ws.write_row(0, 0, COLS_INDICE, fm["azul"])
+    escribir_filas(ws, filas, COLS_INDICE, fm["num"], fm["txt"])
+    ft = len(filas) + 1; ws.write(ft, 0, "TOTAL", fm["tot"])
+    for c, k in enumerate(COLS_INDICE):
+        if c >= 3: ws.write_number(ft, c, round(sum(f[k] for f in filas), 2), fm["tot"])
+    ws.set_column(0, 0, 15); ws.set_column(1, 2, 40); ws.set_column(3, len(COLS_INDICE) - 1, 16)
+    ws.freeze_panes(1, 0)
+    if sin_asignar:
+        ws = wb.add_worksheet("SIN ASIGNAR")
+        ws.write_row(0, 0, COLS_SIN_ASIGNAR, fm["azul"])
+        escribir_filas(ws, sin_asignar, COLS_SIN_ASIGNAR, fm["num"], fm["txt"])
+        ws.set_column(0, 2, 16); ws.set_column(3, 6, 30); ws.set_column(7, 7, 52)
+        ws.freeze_panes(1, 0)
+    wb.close()
+    return salida.getvalue()
+
+
+def generar_zip_clientes(filas, destino=None, contribuyentes=None, procesos=PROCESOS, formulas=False, indice=None, sin_asignar=None):
+    """ZIP con un libro por contribuyente e INDICE.xlsx: bytes, o se escribe en `destino`
+    (ruta o archivo) y se devuelve. `indice` (lista) recibe las filas del resumen y
+    `sin_asignar` (lista) los comprobantes que no se asignaron a ningún contribuyente.
+
+    Los libros se generan en `procesos` procesos y se escriben en el ZIP en cuanto llegan,
+    en orden de RUC; con un solo contribuyente o un solo proceso se trabaja aquí mismo."""
+    t, m = time.perf_counter(), obtener_metricas()
+    sin_asignar = sin_asignar if sin_asignar is not None else []
+    trabajos = [(g, formulas) for g in particionar(filas, contribuyentes, sin_asignar).values()]
+    indice = indice if indice is not None else []
+    salida = destino if destino is not None else io.BytesIO()
+    with zipfile.ZipFile(salida, "w", zipfile.ZIP_DEFLATED) as z:
+        def guardar(libro, fila):
+            z.writestr(fila["ARCHIVO"], libro); indice.append(fila)
+        if procesos <= 1 or len(trabajos) < 2:
+            for tr in trabajos: guardar(*_libro(tr))
+        else:
+            with ProcessPoolExecutor(max_workers=min(procesos, len(trabajos)), mp_context=CONTEXTO) as ex:
+                for libro, fila, medido in ex.map(_libro_proceso, trabajos):
+                    m.fusionar(medido); guardar(libro, fila)
+        z.writestr("INDICE.xlsx", _indice(indice, sin_asignar))
+    m.observar("clientes_lote_segundos", time.perf_counter() - t); m.contar("clientes_libros_total", len(indice))
+    return destino if destino is not None else salida.getvalue()
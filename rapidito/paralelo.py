@@ -0,0 +1,96 @@
+"""Extracción de lotes grandes de XML repartida entre varios núcleos.
+
+Los documentos viajan a los procesos en bloques para que el coste de IPC sea bajo, y el
+índice de clasificación de `empresas` se construye una vez aquí (queda guardado para los
+lotes siguientes) y se envía ya construido a cada proceso al arrancar, sin depender de
+st.session_state. Las filas vuelven en el orden original.
+
+Los procesos no se crean con fork: el servidor tiene hilos (trabajos, telemetría) y un hijo
+podría heredar un lock tomado por otro hilo y quedarse bloqueado. Se usa forkserver (spawn
+donde no existe), que arranca los hijos desde un proceso limpio.
+"""
+import io
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+
+from rapidito.clasificacion import indice_empresas
+from rapidito.extraccion import extraer_fila
+from rapidito.metricas import obtener_metricas
+
+PROCESOS = int(os.environ.get("RAPIDITO_PROCESOS", 0)) or os.cpu_count() or 1
+TAM_BLOQUE = 200
+CONTEXTO = multiprocessing.get_context("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+# El servidor importa una vez los módulos de los pools (este y rapidito.multicliente) y cada
+# hijo arranca con ellos cargados, en vez de importar pandas y compañía en cada pool
+if CONTEXTO.get_start_method() == "forkserver": CONTEXTO.set_forkserver_preload(["rapidito.paralelo", "rapidito.multicliente"])
+
+_empresas = {}
+
+def _iniciar(indice):
+    global _empresas
+    _empresas = indice  # IndiceEmpresas ya construido: deserializarlo cuesta mucho menos que rehacerlo
+
+def _extraer_bloque(bloque, empresas=None):
+    empresas = _empresas if empresas is None else empresas
+    m, reloj, out = obtener_metricas(), time.perf_counter, []
+    for contenido in bloque:
+        t = reloj()
+        try: out.append((extraer_fila(io.BytesIO(contenido), empresas), None))
+        except Exception as e:
+            out.append((None, f"{type(e).__name__}: {e}")); m.contar("extraccion_fallos_total", motivo=type(e).__name__)
+        m.observar("extraccion_segundos", reloj() - t)
+    return out
+
+def _extraer_bloque_proceso(bloque):
+    """En un proceso del pool: el bloque y lo medido, para sumarlo al registro del proceso principal."""
+    return _extraer_bloque(bloque), obtener_metricas().vaciar()
+
+
+def _como_bytes(i, doc):
+    """Acepta bytes, (nombre, bytes) o un archivo en memoria con .getvalue() (y opcionalmente .name)."""
+    if isinstance(doc, tuple): return doc
+    if isinstance(doc, (bytes, bytearray)): return f"#{i+1}", bytes(doc)
+    return getattr(doc, "name", f"#{i+1}"), doc.getvalue()
+
+
+def _bloques(documentos, tam_bloque, nombres):
+    bloque = []
+    for i, doc in enumerate(documentos):
+        n, c = _como_bytes(i, doc); nombres.append(n); bloque.append(c)
+        if len(bloque) == tam_bloque: yield bloque; bloque = []
+    if bloque: yield bloque
+
+
+def extraer_lote(documentos, empresas, procesos=PROCESOS, tam_bloque=TAM_BLOQUE):
+    """Devuelve (filas, fallos): `filas` alineada con `documentos` (None donde falló) y
+    `fallos` una lista de {"ARCHIVO", "ERROR"}.
+
+    `documentos` se consume de forma perezosa y solo hay unos pocos bloques en vuelo a la vez,
+    así que un generador (ver rapidito.entrada) mantiene la memoria acotada. Con pocos
+    documentos o un solo proceso se trabaja en el proceso actual, donde arrancar el pool
+    costaría más que lo que ahorra."""
+    nombres, resultados, t = [], [], time.perf_counter()
+    m = obtener_metricas()
+    def recoger(futuro):
+        filas, medido = futuro.result(); m.fusionar(medido); resultados.extend(filas)
+    bloques = _bloques(documentos, tam_bloque, nombres)
+    primeros = list(islice(bloques, 2))
+    if procesos <= 1 or len(primeros) < 2:
+        for b in chain(primeros, bloques): resultados.extend(_extraer_bloque(b, empresas))
+    else:
+        with ProcessPoolExecutor(max_workers=procesos, mp_context=CONTEXTO, initializer=_iniciar, initargs=(indice_empresas(empresas),)) as ex:
+            en_vuelo = deque()
+            for b in chain(primeros, bloques):
+                en_vuelo.append(ex.submit(_extraer_bloque_proceso, b))
+                if len(en_vuelo) >= 2 * procesos: recoger(en_vuelo.popleft())
+            while en_vuelo: recoger(en_vuelo.popleft())
+    segundos = time.perf_counter() - t
+    m.observar("extraccion_lote_segundos", segundos); m.contar("extraccion_lote_documentos_total", len(resultados))
+    if resultados: m.fijar("extraccion_docs_por_segundo", round(len(resultados) / max(segundos, 1e-9), 1))
+    filas = [f for f, _ in resultados]
+    fallos = [{"ARCHIVO": nombres[i], "ERROR": err} for i, (_, err) in enumerate(resultados) if err]
+    return filas, fallos
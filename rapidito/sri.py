@@ -0,0 +1,213 @@
+"""Descarga concurrente de autorizaciones desde el web service offline del SRI."""
+import os
+import queue
+import random
+import re
+import threading
+import time
+from datetime import date
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from rapidito.metricas import obtener_metricas
+
+# Endpoints y Configuración
+# RAPIDITO_SRI_URL permite apuntar a un SRI simulado (ver rapidito.mock_sri)
+URL_WS = os.environ.get("RAPIDITO_SRI_URL", "https://cel.sri.gob.ec/comprobantes-electronicos-ws/AutorizacionComprobantesOffline?wsdl")
+# Peticiones en vuelo y tope por segundo hacia el SRI (el tope es por host, compartido por el proceso);
+# valores por defecto de DescargadorSRI, y con ellos de los trabajos de la aplicación y de la CLI
+CONCURRENCIA = int(os.environ.get("RAPIDITO_SRI_CONCURRENCIA", 8))
+POR_SEGUNDO = float(os.environ.get("RAPIDITO_SRI_POR_SEGUNDO", 10))
+HEADERS_WS = {"Content-Type": "text/xml;charset=UTF-8","User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"}
+SOAP_AUTORIZACION = '<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:ec="http://ec.gob.sri.ws.autorizacion"><soapenv:Body><ec:autorizacionComprobante><claveAccesoComprobante>{}</claveAccesoComprobante></ec:autorizacionComprobante></soapenv:Body></soapenv:Envelope>'
+
+# Estado final de cada claveAcceso
+AUTORIZADO, NO_AUTORIZADO, NO_ENCONTRADO, FALLIDO = "AUTORIZADO", "NO AUTORIZADO", "NO ENCONTRADO", "FALLIDO"
+_RE_CDATA = re.compile(r"<!\[CDATA\[.*?\]\]>", re.S)
+_RE_ESTADO = re.compile(r"<estado>\s*([^<]*?)\s*</estado>")
+
+
+def estados_autorizacion(texto):
+    """Estados de las <autorizacion> de una respuesta del SRI (sin mirar dentro del comprobante)."""
+    return _RE_ESTADO.findall(_RE_CDATA.sub("", texto))
+
+
+def extraer_claves(texto):
+    """Claves de acceso (49 dígitos) únicas, en el orden en que aparecen en el TXT."""
+    return list(dict.fromkeys(re.findall(r'\d{49}', texto)))
+
+
+# Código de tipo de comprobante (posiciones 8-10 de la clave) -> TIPO de la fila, y
+# bandeja a la que va cada tipo en la importación unificada (las LC van con las facturas)
+TIPOS_CLAVE = {"01": "FC", "03": "LC", "04": "NC", "05": "ND", "06": "GR", "07": "RET"}
+BANDEJAS = {"FC": "FC", "LC": "FC", "NC": "NC", "RET": "RET"}
+
+
+def digito_verificador(digitos):
+    """Módulo 11 con pesos 2..7 desde la derecha, como lo calcula el SRI."""
+    total = sum(int(d) * (2 + i % 6) for i, d in enumerate(reversed(digitos)))
+    v = 11 - total % 11
+    return 0 if v == 11 else 1 if v == 10 else v
+
+
+def decodificar_clave(clave):
+    """Campos de la claveAcceso sin consultar al SRI: fecha (ddmmaaaa), tipo (01/03/04/07...),
+    RUC emisor, ambiente, serie (estab-ptoEmi), secuencial y si el dígito verificador cuadra."""
+    try: fecha = date(int(clave[4:8]), int(clave[2:4]), int(clave[0:2]))
+    except ValueError: fecha = None
+    return {"clave": clave, "fecha": fecha, "cod_tipo": clave[8:10], "tipo": TIPOS_CLAVE.get(clave[8:10], ""),
+            "ruc": clave[10:23], "ambiente": clave[23], "serie": f"{clave[24:27]}-{clave[27:30]}", "secuencial": clave[30:39],
+            "numero": f"{clave[24:27]}-{clave[27:30]}-{clave[30:39]}",
+            "valida": fecha is not None and digito_verificador(clave[:48]) == int(clave[48])}
+
+
+def filtrar_claves(claves, desde=None, hasta=None, emisores=None, tipos=None):
+    """Claves decodificadas que pasan los filtros (fechas inclusivas, RUC emisores, TIPOs).
+    Las claves con dígito verificador o fecha inválidos se descartan siempre."""
+    emisores = set(emisores) if emisores else None
+    tipos = set(tipos) if tipos else None
+    out = []
+    for cl in claves:
+        d = decodificar_clave(cl)
+        if not d["valida"]: continue
+        if desde and d["fecha"] < desde: continue
+        if hasta and d["fecha"] > hasta: continue
+        if emisores is not None and d["ruc"] not in emisores: continue
+        if tipos is not None and d["tipo"] not in tipos: continue
+        out.append(d)
+    return out
+
+
+class LimitadorTasa:
+    """Cubeta de fichas: como máximo `por_segundo` peticiones por segundo, con ráfagas de hasta `rafaga`."""
+    def __init__(self, por_segundo, rafaga=None):
+        self.por_segundo = float(por_segundo)
+        self.capacidad = float(rafaga or max(1.0, self.por_segundo))
+        self.fichas, self.ultimo = self.capacidad, time.monotonic()
+        self.lock = threading.Lock()
+
+    def esperar(self):
+        if self.por_segundo <= 0: return
+        while True:
+            with self.lock:
+                ahora = time.monotonic()
+                self.fichas = min(self.capacidad, self.fichas + (ahora - self.ultimo) * self.por_segundo)
+                self.ultimo = ahora
+                if self.fichas >= 1: self.fichas -= 1; return
+                falta = (1 - self.fichas) / self.por_segundo
+            time.sleep(falta)
+
+
+# Un limitador por host compartido por todas las sesiones del proceso
+_LIMITADORES, _LOCK_LIMITADORES = {}, threading.Lock()
+
+def limitador_para(url, por_segundo):
+    host = urlsplit(url).netloc
+    with _LOCK_LIMITADORES:
+        lim = _LIMITADORES.get(host)
+        if lim is None or lim.por_segundo != float(por_segundo):
+            lim = _LIMITADORES[host] = LimitadorTasa(por_segundo)
+        return lim
+
+
+class DescargadorSRI:
+    """Cliente con sesión HTTP compartida (keep-alive), `concurrencia` peticiones en vuelo,
+    límite de tasa por host y reintentos con backoff exponencial ante timeouts, errores de
+    conexión y respuestas 5xx. Con `cache` (ver rapidito.cache) solo van a la red las claves
+    que no están guardadas, y cada autorización nueva se guarda.
+
+    Cada clave produce un dict {"indice", "clave", "estado", "xml", "contenido", "intentos", "error",
+    "cache", "fila"} donde `estado` es AUTORIZADO, NO_AUTORIZADO (el SRI la conoce con otro estado,
+    que queda en `error`), NO_ENCONTRADO o FALLIDO, `cache` indica si vino del almacén local y
+    `fila` es la fila extraída guardada junto al XML (o None). Solo se guardan las autorizadas.
+    """
+    def __init__(self, url=URL_WS, concurrencia=CONCURRENCIA, por_segundo=POR_SEGUNDO, reintentos=3, timeout=10, backoff=0.5, verify=False, cache=None):
+        self.url, self.concurrencia, self.reintentos, self.cache = url, max(1, int(concurrencia)), int(reintentos), cache
+        self.timeout, self.backoff, self.verify = timeout, backoff, verify
+        self.limitador = limitador_para(url, por_segundo)
+        self.sesion = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrencia)
+        self.sesion.mount("https://", adaptador); self.sesion.mount("http://", adaptador)
+        self.sesion.headers.update(HEADERS_WS)
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.cerrar()
+    def cerrar(self): self.sesion.close()
+
+    def consultar(self, clave, indice=0):
+        res = {"indice": indice, "clave": clave, "estado": FALLIDO, "xml": "", "contenido": b"", "intentos": 0, "error": "", "cache": False, "fila": None}
+        m = obtener_metricas()
+        for intento in range(self.reintentos + 1):
+            if intento:
+                m.contar("sri_reintentos_total")
+                time.sleep(self.backoff * 2 ** (intento - 1) + random.uniform(0, self.backoff))
+            self.limitador.esperar(); res["intentos"] = intento + 1
+            t = time.perf_counter()
+            try:
+                r = self.sesion.post(self.url, data=SOAP_AUTORIZACION.format(clave), verify=self.verify, timeout=self.timeout)
+            except (requests.Timeout, requests.ConnectionError) as e:
+                res["error"] = type(e).__name__; m.contar("sri_errores_total", motivo=res["error"]); continue
+            except requests.RequestException as e:
+                res["error"] = str(e); m.contar("sri_errores_total", motivo=type(e).__name__); break
+            finally: m.observar("sri_latencia_segundos", time.perf_counter() - t)
+            if r.status_code >= 500:
+                res["error"] = f"HTTP {r.status_code}"; m.contar("sri_errores_total", motivo=res["error"]); continue
+            estados = estados_autorizacion(r.text) if r.ok else []
+            if AUTORIZADO in estados:
+                res.update(estado=AUTORIZADO, xml=r.text, contenido=r.content, error="")
+                if self.cache is not None: self.cache.guardar(clave, r.content)
+            elif estados:
+                res.update(estado=NO_AUTORIZADO, error=", ".join(dict.fromkeys(estados)))
+            elif r.ok:
+                res.update(estado=NO_ENCONTRADO, error="")
+            else:
+                res["error"] = f"HTTP {r.status_code}"; m.contar("sri_errores_total", motivo=res["error"])
+            break
+        m.contar("sri_respuestas_total", estado=res["estado"])
+        return res
+
+    def iterar(self, claves):
+        """Genera los resultados según van terminando (no en el orden de entrada).
+        Los aciertos del almacén local salen primero, sin tocar la red."""
+        pendientes = []
+        for i, cl in enumerate(claves):
+            hit = self.cache.obtener(cl) if self.cache is not None else None
+            xml = hit["xml"].decode("utf-8", "replace") if hit else ""
+            # Versiones anteriores guardaban también respuestas NO AUTORIZADO: se descartan y se vuelven a consultar
+            if hit and AUTORIZADO not in estados_autorizacion(xml): self.cache.invalidar([cl]); hit = None
+            if self.cache is not None: obtener_metricas().contar("sri_cache_total", resultado="fallo" if hit is None else "acierto")
+            if hit is None: pendientes.append((i, cl)); continue
+            yield {"indice": i, "clave": cl, "estado": AUTORIZADO, "xml": xml, "contenido": hit["xml"],
+                   "intentos": 0, "error": "", "cache": True, "fila": hit["fila"]}
+        if not pendientes: return
+        # Hilos daemon en vez de un ThreadPoolExecutor: al salir el intérprete no se esperan las
+        # consultas que faltan, y cerrar el generador detiene los hilos en la clave siguiente
+        cola, resultados, parar = queue.SimpleQueue(), queue.SimpleQueue(), threading.Event()
+        for i, cl in pendientes: cola.put((i, cl))
+        def consultar_cola():
+            while not parar.is_set():
+                try: i, cl = cola.get_nowait()
+                except queue.Empty: return
+                try: resultados.put(self.consultar(cl, i))
+                except BaseException as e: resultados.put(e)
+        hilos = [threading.Thread(target=consultar_cola, name="consulta-sri", daemon=True) for _ in range(min(self.concurrencia, len(pendientes)))]
+        for h in hilos: h.start()
+        try:
+            for _ in pendientes:
+                res = resultados.get()
+                if isinstance(res, BaseException): raise res
+                yield res
+        finally:
+            parar.set()
+            for h in hilos: h.join()
+
+    def descargar(self, claves, al_avanzar=None):
+        """Descarga todas las claves y devuelve los resultados en el orden original.
+        `al_avanzar(hechos, total, resultado)` se llama desde el hilo que invoca."""
+        claves = list(claves); out = [None] * len(claves)
+        for n, res in enumerate(self.iterar(claves), 1):
+            out[res["indice"]] = res
+            if al_avanzar: al_avanzar(n, len(claves), res)
+        return out
@@ -0,0 +1,146 @@
+"""Registro de actividad y llamadas al backend de usuarios (Apps Script), fuera del camino de proceso.
+
+registrar_actividad() solo encola el evento y vuelve enseguida: un hilo en segundo plano
+vacía la cola por lotes sobre una sesión HTTP con conexiones reutilizadas. Si el endpoint
+no responde, los eventos se guardan en un archivo local (una línea JSON por evento) y se
+reenvían cuando vuelve a estar disponible; al cerrar el proceso se vacía lo pendiente.
+conectar_api() sigue siendo síncrona (el login necesita la respuesta), pero reutiliza la
+conexión y falla rápido si el servidor no acepta la conexión.
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+URL_API = os.environ.get("RAPIDITO_URL_API", "https://script.google.com/macros/s/AKfycby34vXKtymcy2zt3I8DXHVTDLXL-ZPNdfSEn9E1qRNKbz3dRzB9c7xN5uX_T0Fd5Q8/exec")
+URL_ACTIVIDAD = os.environ.get("RAPIDITO_URL_ACTIVIDAD", "https://script.google.com/macros/s/AKfycbwur1tNR80874Djv78LG1ed9ZwUOdJbaWC9Ctc39l3510zVSPs_ycntW4-lwo2UOLbm/exec")
+RUTA_PENDIENTES = os.environ.get("RAPIDITO_TELEMETRIA_PENDIENTES", "telemetria_pendiente.jsonl")
+# (conexión, lectura) en segundos
+TIMEOUT_API = (3.05, 10)
+TIMEOUT_ACTIVIDAD = (3.05, 5)
+
+
+def _sesion(conexiones):
+    s = requests.Session()
+    s.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=conexiones))
+    s.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=conexiones))
+    return s
+
+
+class Telemetria:
+    """Cola de eventos con envío en segundo plano. `lote` es el máximo de eventos por
+    vuelta del hilo, `espera` los segundos entre vueltas y `reintento` la pausa tras un fallo."""
+
+    def __init__(self, url=URL_ACTIVIDAD, ruta_pendientes=RUTA_PENDIENTES, lote=50, espera=1.0, reintento=30.0, maximo=10000):
+        self.url, self.ruta_pendientes = url, ruta_pendientes
+        self.lote, self.espera, self.reintento = lote, espera, reintento
+        self.cola = queue.Queue(maxsize=maximo)
+        self.sesion = _sesion(1)
+        self.lock = threading.Lock()
+        self.enviados = self.fallidos = 0
+        self.caido_hasta = 0.0
+        self._parar = threading.Event()
+        self.hilo = threading.Thread(target=self._bucle, name="telemetria", daemon=True)
+        self.hilo.start()
+
+    def registrar(self, evento):
+        """Encola un evento (dict JSON) sin esperar a la red; nunca lanza."""
+        try: self.cola.put_nowait(evento)
+        except queue.Full: self._guardar([evento])
+        return True
+
+    def _tomar(self, bloquear):
+        eventos = []
+        try:
+            eventos.append(self.cola.get(timeout=self.espera) if bloquear else self.cola.get_nowait())
+            while len(eventos) < self.lote: eventos.append(self.cola.get_nowait())
+        except queue.Empty: pass
+        return eventos
+
+    def _enviar(self, eventos):
+        """Envía en orden; devuelve los que no se pudieron enviar."""
+        for i, ev in enumerate(eventos):
+            try:
+                r = self.sesion.post(self.url, json=ev, timeout=TIMEOUT_ACTIVIDAD)
+                if r.status_code >= 500: raise requests.HTTPError(r.status_code)
+            except (requests.RequestException, OSError):
+                self.fallidos += 1; self.caido_hasta = time.monotonic() + self.reintento
+                return eventos[i:]
+            self.enviados += 1
+        return []
+
+    def _guardar(self, eventos):
+        if not eventos or not self.ruta_pendientes: return
+        with self.lock, open(self.ruta_pendientes, "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(ev, ensure_ascii=False) + "\n" for ev in eventos)
+
+    def _pendientes(self):
+        """Saca del archivo local los eventos guardados cuando el endpoint no respondía."""
+        with self.lock:
+            if not self.ruta_pendientes or not os.path.exists(self.ruta_pendientes): return []
+            with open(self.ruta_pendientes, "r", encoding="utf-8") as f: lineas = f.readlines()
+            os.remove(self.ruta_pendientes)
+        eventos = []
+        for ln in lineas:
+            try: eventos.append(json.loads(ln))
+            except ValueError: pass
+        return eventos
+
+    def _vuelta(self, eventos):
+        if time.monotonic() < self.caido_hasta: self._guardar(eventos); return
+        restantes = self._enviar(eventos)
+        if restantes: self._guardar(restantes)
+        else: self._guardar(self._enviar(self._pendientes()))
+
+    def _bucle(self):
+        while not self._parar.is_set():
+            eventos = self._tomar(bloquear=True)
+            if eventos: self._vuelta(eventos)
+            elif time.monotonic() >= self.caido_hasta and self.ruta_pendientes and os.path.exists(self.ruta_pendientes):
+                self._guardar(self._enviar(self._pendientes()))
+
+    def vaciar(self, timeout=5.0):
+        """Envía lo que quede en la cola (lo que no llegue a enviarse en `timeout` va al archivo local)."""
+        limite = time.monotonic() + timeout
+        while True:
+            eventos = self._tomar(bloquear=False)
+            if not eventos: return
+            if time.monotonic() > limite: self._guardar(eventos); continue
+            self._vuelta(eventos)
+
+    def cerrar(self, timeout=5.0):
+        self._parar.set(); self.hilo.join(timeout=timeout)
+        self.vaciar(timeout); self.sesion.close()
+
+
+_TELEMETRIA, _LOCK_TELEMETRIA = None, threading.Lock()
+_SESION_API = _sesion(4)
+
+
+def obtener_telemetria():
+    """Instancia única por proceso; se vacía al terminar el intérprete."""
+    global _TELEMETRIA
+    with _LOCK_TELEMETRIA:
+        if _TELEMETRIA is None:
+            _TELEMETRIA = Telemetria()
+            atexit.register(_TELEMETRIA.cerrar)
+        return _TELEMETRIA
+
+
+def registrar_actividad(usuario, accion, cantidad=None, sugerencia=None):
+    detalle = f"{accion} ({cantidad} XMLs)" if cantidad is not None else accion
+    payload = {"usuario": str(usuario), "accion": str(detalle)}
+    if sugerencia: payload["sugerencia"] = str(sugerencia)
+    return obtener_telemetria().registrar(payload)
+
+
+def conectar_api(payload, url=None):
+    try:
+        r = _SESION_API.post(url or URL_API, json=payload, timeout=TIMEOUT_API)
+        return r.json()
+    except Exception: return {"exito": False, "mensaje": "Error de conexión"}
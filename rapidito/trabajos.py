@@ -0,0 +1,254 @@
+"""Descargas del SRI como trabajos en segundo plano, fuera del ciclo de reejecución de Streamlit.
+
+Cada trabajo y cada una de sus claves viven en una tabla SQLite: el resultado de cada
+clave (estado, fila extraída y XML comprimido) se guarda en cuanto llega, así que la
+interfaz puede consultar el avance y los resultados parciales desde cualquier sesión, y
+un trabajo interrumpido (reinicio del servidor, cancelación) continúa por las claves que
+faltan. Los trabajos corren en hilos del proceso y no bloquean a las demás sesiones; al
+salir el intérprete se detienen en la clave siguiente y quedan PENDIENTE para el próximo
+arranque.
+
+Varios procesos pueden compartir la base (otro worker de Streamlit, la CLI): cada trabajo
+lleva un dueño y un latido que el dueño renueva mientras descarga, y un proceso solo toma
+los trabajos sin dueño o cuyo latido venció. Un dueño que pierde el trabajo se detiene.
+"""
+import atexit
+import io
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+import zipfile
+import zlib
+
+from rapidito.sri import DescargadorSRI, BANDEJAS, AUTORIZADO, NO_AUTORIZADO, NO_ENCONTRADO, FALLIDO
+
+RUTA_TRABAJOS = os.environ.get("RAPIDITO_TRABAJOS", "trabajos_sri.sqlite3")
+TRABAJOS_SIMULTANEOS = int(os.environ.get("RAPIDITO_TRABAJOS_SIMULTANEOS", 2))
+# Los trabajos terminados (con sus XML) se borran pasado este tiempo
+DIAS_RETENCION = float(os.environ.get("RAPIDITO_TRABAJOS_DIAS", 7))
+# Un trabajo cuyo dueño no renovó el latido en este tiempo se da por abandonado (proceso caído)
+VENCIMIENTO = float(os.environ.get("RAPIDITO_TRABAJOS_VENCIMIENTO", 300))
+LATIDO = 5.0
+
+# Estado de un trabajo
+PENDIENTE, EN_CURSO, TERMINADO, CANCELADO, ERROR = "PENDIENTE", "EN CURSO", "TERMINADO", "CANCELADO", "ERROR"
+
+
+class GestorTrabajos:
+    def __init__(self, ruta=RUTA_TRABAJOS, hilos=TRABAJOS_SIMULTANEOS, cache=None, empresas=None, opciones_descarga=None, dias=DIAS_RETENCION):
+        """`cache` y `empresas` (una función que devuelve la tabla de clasificación) son por
+        defecto la caché del SRI y la memoria contable del proceso. Los trabajos terminados
+        hace más de `dias` días se purgan al arrancar y al terminar cada trabajo."""
+        self.ruta, self.cache, self._empresas, self.dias = ruta, cache, empresas, dias
+        self.opciones_descarga = opciones_descarga or {}
+        self.lock = threading.Lock()
+        self.con = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.execute("PRAGMA busy_timeout=10000")
+        self.con.execute("""CREATE TABLE IF NOT EXISTS trabajos (
+            id TEXT PRIMARY KEY, usuario TEXT, estado TEXT NOT NULL, total INTEGER NOT NULL,
+            error TEXT, creado REAL NOT NULL, actualizado REAL NOT NULL)""")
+        self.con.execute("""CREATE TABLE IF NOT EXISTS claves (
+            trabajo TEXT NOT NULL, indice INTEGER NOT NULL, clave TEXT NOT NULL, tipo TEXT,
+            estado TEXT, cache INTEGER DEFAULT 0, bandeja TEXT, fila TEXT, xml BLOB,
+            PRIMARY KEY (trabajo, indice))""")
+        # Bases creadas antes de que los trabajos tuvieran dueño
+        columnas = {c[1] for c in self.con.execute("PRAGMA table_info(trabajos)")}
+        for columna in ("duenio TEXT", "latido REAL"):
+            if columna.split()[0] not in columnas: self.con.execute(f"ALTER TABLE trabajos ADD COLUMN {columna}")
+        self.con.execute("CREATE INDEX IF NOT EXISTS ix_trabajos_usuario ON trabajos(usuario, creado)")
+        self.duenio = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        # Hilos daemon que toman los trabajos de una cola y miran `_parar`: el intérprete no los
+        # espera al salir, así que cerrar() se registra con atexit y los detiene en la clave siguiente
+        self._cola, self._parar = queue.Queue(), threading.Event()
+        self.activos, self.cancelados = set(), set()
+        self._hilos = [threading.Thread(target=self._trabajar, name=f"trabajo-sri-{i}", daemon=True) for i in range(max(1, hilos))]
+        for h in self._hilos: h.start()
+        self.purgar()
+        # Lo que quedó a medias (cerrado con su proceso o con el dueño caído) sigue donde estaba
+        for (tid,) in self.con.execute("SELECT id FROM trabajos WHERE estado IN (?, ?)", (PENDIENTE, EN_CURSO)).fetchall():
+            if self._tomar(tid): self._lanzar(tid)
+
+    def crear(self, claves, usuario=""):
+        """Registra y lanza un trabajo. `claves` son claves de acceso o dicts de
+        rapidito.sri.decodificar_clave (así se conoce el tipo antes de descargar)."""
+        tid, ahora = uuid.uuid4().hex[:12], time.time()
+        filas = [(tid, i, c["clave"], c.get("tipo")) if isinstance(c, dict) else (tid, i, c, None) for i, c in enumerate(claves)]
+        with self.lock:
+            self.con.execute("BEGIN IMMEDIATE")
+            try:
+                self.con.execute("INSERT INTO trabajos (id, usuario, estado, total, creado, actualizado, duenio, latido) VALUES (?,?,?,?,?,?,?,?)",
+                                 (tid, usuario, PENDIENTE, len(filas), ahora, ahora, self.duenio, ahora))
+                self.con.executemany("INSERT INTO claves (trabajo, indice, clave, tipo) VALUES (?,?,?,?)", filas)
+                self.con.execute("COMMIT")
+            except BaseException:
+                self.con.execute("ROLLBACK"); raise
+        self._lanzar(tid)
+        return tid
+
+    def _lanzar(self, tid):
+        with self.lock:
+            if tid in self.activos: return
+            self.activos.add(tid); self.cancelados.discard(tid)
+        self._cola.put(tid)
+
+    def _trabajar(self):
+        """Cuerpo de cada hilo: corre los trabajos de la cola hasta que se cierra el gestor."""
+        while True:
+            tid = self._cola.get()
+            if tid is None: return
+            if self._parar.is_set():  # seguía en cola al cerrar: queda para el próximo arranque
+                with self.lock: self.activos.discard(tid)
+                continue
+            self._ejecutar(tid)
+
+    def _tomar(self, tid):
+        """Se adueña del trabajo si no tiene dueño o su latido venció; False si otro proceso lo corre."""
+        ahora = time.time()
+        with self.lock:
+            return self.con.execute("UPDATE trabajos SET duenio=?, latido=? WHERE id=? AND (duenio IS NULL OR duenio=? OR latido < ?)",
+                                    (self.duenio, ahora, tid, self.duenio, ahora - VENCIMIENTO)).rowcount == 1
+
+    def _latir(self, tid):
+        """Renueva el latido; False si el trabajo ya no es de este gestor (lo tomó o canceló otro proceso)."""
+        with self.lock:
+            return self.con.execute("UPDATE trabajos SET latido=? WHERE id=? AND duenio=?", (time.time(), tid, self.duenio)).rowcount == 1
+
+    def _marcar(self, tid, estado, error=None, soltar=False):
+        """Cambia el estado de un trabajo propio; con `soltar` lo deja sin dueño."""
+        with self.lock:
+            self.con.execute(f"UPDATE trabajos SET estado=?, error=?, actualizado=?{', duenio=NULL' if soltar else ''} WHERE id=? AND duenio=?",
+                             (estado, error, time.time(), tid, self.duenio))
+
+    def _ejecutar(self, tid):
+        from rapidito.cache import obtener_cache
+        from rapidito.extraccion import extraer_datos_robusto, reclasificar
+        from rapidito.memoria import obtener_memoria
+        try:
+            self._marcar(tid, EN_CURSO)
+            with self.lock:
+                # Las claves sin resultado y las que fallaron la vez anterior
+                pendientes = self.con.execute("""SELECT indice, clave, tipo FROM claves WHERE trabajo=?
+                    AND (estado IS NULL OR estado=?) ORDER BY indice""", (tid, FALLIDO)).fetchall()
+            cache = self.cache if self.cache is not None else obtener_cache()
+            empresas = self._empresas() if self._empresas else obtener_memoria().empresas()
+            latido, perdido = time.monotonic(), False
+            with DescargadorSRI(cache=cache, **self.opciones_descarga) as dsc:
+                for res in dsc.iterar([c for _, c, _ in pendientes]):
+                    if tid in self.cancelados: break
+                    if time.monotonic() - latido >= LATIDO:
+                        latido = time.monotonic()
+                        if not self._latir(tid): perdido = True; break
+                    indice, clave, tipo = pendientes[res["indice"]]
+                    d, bandeja, xml = None, None, None
+                    if res["estado"] == AUTORIZADO:
+                        d = res["fila"]
+                        if d: reclasificar(d, empresas)
+                        else:
+                            d = extraer_datos_robusto(io.BytesIO(res["contenido"]), empresas)
+                            if d: cache.guardar_fila(clave, d)
+                        bandeja = BANDEJAS.get(d["TIPO"] if d else tipo)
+                        xml = zlib.compress(res["xml"].encode("utf-8"), 6)
+                    with self.lock:
+                        self.con.execute("UPDATE claves SET estado=?, cache=?, bandeja=?, fila=?, xml=? WHERE trabajo=? AND indice=?",
+                                         (res["estado"], int(res["cache"]), bandeja, json.dumps(d, ensure_ascii=False) if d else None, xml, tid, indice))
+            # Al cerrar el proceso el trabajo queda pendiente para continuar en el próximo arranque;
+            # si lo tomó otro proceso, su estado ya no es cosa de este
+            if not perdido: self._marcar(tid, PENDIENTE if self._parar.is_set() else CANCELADO if tid in self.cancelados else TERMINADO, soltar=True)
+        except Exception as e:
+            self._marcar(tid, ERROR, f"{type(e).__name__}: {e}", soltar=True)
+        finally:
+            with self.lock: self.activos.discard(tid)
+        if not self._parar.is_set(): self.purgar()
+
+    def estado(self, tid):
+        """Dict con el trabajo y el conteo por estado de sus claves, o None si no existe."""
+        with self.lock:
+            t = self.con.execute("SELECT id, usuario, estado, total, error, creado, actualizado, duenio, latido FROM trabajos WHERE id=?", (tid,)).fetchone()
+            if t is None: return None
+            t, (duenio, latido) = t[:7], t[7:]
+            conteo = {AUTORIZADO: 0, NO_AUTORIZADO: 0, NO_ENCONTRADO: 0, FALLIDO: 0, "cache": 0}
+            for estado, n, c in self.con.execute("SELECT estado, COUNT(*), SUM(cache) FROM claves WHERE trabajo=? AND estado IS NOT NULL GROUP BY estado", (tid,)):
+                conteo[estado] = n; conteo["cache"] += c or 0
+            bandejas = dict(self.con.execute("SELECT bandeja, COUNT(*) FROM claves WHERE trabajo=? AND fila IS NOT NULL GROUP BY bandeja", (tid,)).fetchall())
+        hechos = conteo[AUTORIZADO] + conteo[NO_AUTORIZADO] + conteo[NO_ENCONTRADO] + conteo[FALLIDO]
+        return dict(zip(("id", "usuario", "estado", "total", "error", "creado", "actualizado"), t), hechos=hechos, conteo=conteo,
+                    bandejas=bandejas, activo=tid in self.activos or (duenio is not None and latido > time.time() - VENCIMIENTO))
+
+    def trabajos(self, usuario, limite=10):
+        with self.lock:
+            ids = [r[0] for r in self.con.execute("SELECT id FROM trabajos WHERE usuario=? ORDER BY creado DESC LIMIT ?", (usuario, limite))]
+        return [self.estado(t) for t in ids]
+
+    def filas(self, tid, bandeja):
+        """Filas extraídas hasta ahora de una bandeja (FC, NC o RET), en el orden del TXT."""
+        with self.lock:
+            return [json.loads(f) for (f,) in self.con.execute(
+                "SELECT fila FROM claves WHERE trabajo=? AND bandeja=? AND fila IS NOT NULL ORDER BY indice", (tid, bandeja))]
+
+    def zip(self, tid, bandeja, destino=None):
+        """ZIP con los XML autorizados de la bandeja; bytes, o `destino` si se indica."""
+        with self.lock:
+            xmls = self.con.execute("SELECT clave, xml FROM claves WHERE trabajo=? AND bandeja=? AND xml IS NOT NULL ORDER BY indice", (tid, bandeja)).fetchall()
+        salida = destino if destino is not None else io.BytesIO()
+        with zipfile.ZipFile(salida, "w", zipfile.ZIP_DEFLATED) as zf:
+            for clave, xml in xmls: zf.writestr(f"{clave}.xml", zlib.decompress(xml))
+        return destino if destino is not None else salida.getvalue()
+
+    def cancelar(self, tid):
+        """Si el trabajo corre en otro proceso, este lo suelta y su dueño se detiene en el próximo latido."""
+        with self.lock:
+            if tid in self.activos: self.cancelados.add(tid); return
+            self.con.execute("UPDATE trabajos SET estado=?, actualizado=?, duenio=NULL WHERE id=?", (CANCELADO, time.time(), tid))
+
+    def reanudar(self, tid):
+        """Vuelve a lanzar un trabajo cancelado, con error o con claves fallidas; False si
+        otro proceso lo está corriendo."""
+        if not self._tomar(tid): return False
+        self._marcar(tid, PENDIENTE); self._lanzar(tid)
+        return True
+
+    def purgar(self, dias=None):
+        """Borra los trabajos terminados hace más de `dias` días (por defecto, los del gestor)."""
+        limite = time.time() - (self.dias if dias is None else dias) * 86400
+        with self.lock:
+            viejos = [(t,) for (t,) in self.con.execute("SELECT id FROM trabajos WHERE actualizado < ? AND estado NOT IN (?, ?)", (limite, PENDIENTE, EN_CURSO))]
+            self.con.execute("BEGIN IMMEDIATE")
+            try:
+                self.con.executemany("DELETE FROM claves WHERE trabajo=?", viejos)
+                self.con.executemany("DELETE FROM trabajos WHERE id=?", viejos)
+                self.con.execute("COMMIT")
+            except BaseException:
+                self.con.execute("ROLLBACK"); raise
+        return len(viejos)
+
+    def cerrar(self, esperar=True):
+        """Detiene los trabajos en curso en su próxima clave (quedan PENDIENTE) y cierra la base."""
+        with self.lock:
+            if self._parar.is_set(): return
+            self._parar.set(); self.cancelados.update(self.activos)
+        for _ in self._hilos: self._cola.put(None)
+        if esperar:
+            for h in self._hilos: h.join()
+        with self.lock:
+            # Los que estaban en cola también quedan libres para el próximo arranque
+            self.con.execute("UPDATE trabajos SET duenio=NULL WHERE duenio=? AND estado IN (?, ?)", (self.duenio, PENDIENTE, EN_CURSO))
+            self.con.close()
+
+
+_GESTOR, _LOCK_GESTOR = None, threading.Lock()
+
+def obtener_gestor():
+    """Gestor del proceso: al crearse retoma los trabajos pendientes y al salir el intérprete los detiene."""
+    global _GESTOR
+    with _LOCK_GESTOR:
+        if _GESTOR is None:
+            _GESTOR = GestorTrabajos()
+            # Los hilos son daemon, así que el atexit corre sin esperarlos y los detiene él mismo
+            atexit.register(_GESTOR.cerrar)
+        return _GESTOR
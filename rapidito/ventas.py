@@ -0,0 +1,89 @@
+"""Cruce de facturas de venta con las retenciones recibidas.
+
+Una retención corresponde a la factura emitida por el sujeto retenido al agente de
+retención, con el número de sustento. El cruce es un merge de pandas sobre (emisor,
+cliente, número normalizado): una factura con varias retenciones las suma todas y las
+que no cruzan se devuelven aparte, sin comparar cadenas con ceros de relleno distintos.
+"""
+import pandas as pd
+
+_RE_NUMERO = r"^\D*(\d+)\D+(\d+)\D+(\d+)\D*$"
+_CLAVE = ["emisor", "cliente", "numero"]
+_CEROS = {"FECHA RET": "", "N° RET": "", "N° AUTORIZACIÓN": "", "RET RENTA": 0, "RET IVA": 0, "TOTAL RET": 0}
+
+
+def normalizar_numero(serie):
+    """'1-1-123', '001-001-000000123' y '001001000000123' -> '001-001-000000123'; lo que
+    no tenga forma de número de comprobante se deja tal cual."""
+    s = serie.fillna("").astype(str).str.strip()
+    canonico = s.str.fullmatch(r"\d{3}-\d{3}-\d{9}")
+    if canonico.all(): return s
+    s = s[~canonico]
+    p = s.str.extract(_RE_NUMERO)
+    d = s.str.replace(r"\D", "", regex=True)
+    seguido = d.str.len() == 15
+    p[0] = p[0].fillna(d.str[:3].where(seguido)); p[1] = p[1].fillna(d.str[3:6].where(seguido)); p[2] = p[2].fillna(d.str[6:].where(seguido))
+    ok = p.notna().all(axis=1)
+    p = p.fillna("0").apply(lambda c: c.str.lstrip("0"))
+    out = serie.fillna("").astype(str).str.strip()
+    out[~canonico] = (p[0].str.zfill(3) + "-" + p[1].str.zfill(3) + "-" + p[2].str.zfill(9)).where(ok, s)
+    return out
+
+
+def normalizar_id(serie):
+    """RUC de persona natural (cédula + 001) -> cédula, para que ambos lados coincidan."""
+    s = serie.fillna("").astype(str).str.strip()
+    return s.where(~s.str.fullmatch(r"\d{10}001"), s.str[:10])
+
+
+def _unir(valores):
+    return ", ".join(dict.fromkeys(v for v in valores if v))
+
+
+def cruzar_ventas_retenciones(lista):
+    """(ventas, retenciones_sin_factura, facturas_sin_retencion). `ventas` tiene una fila por
+    factura con la suma de todas sus retenciones; las otras dos listas son las filas
+    originales que no cruzaron."""
+    vts = [d for d in lista if d["TIPO"] == "FC"]
+    rets = [d for d in lista if d["TIPO"] == "RET"]
+    fv = pd.DataFrame({"emisor": normalizar_id(pd.Series([v.get("RUC") for v in vts], dtype=object)),
+                       "cliente": normalizar_id(pd.Series([v.get("RUC CLIENTE") for v in vts], dtype=object)),
+                       "numero": normalizar_numero(pd.Series([v.get("N. FACTURA") for v in vts], dtype=object))})
+    fr = pd.DataFrame({"emisor": normalizar_id(pd.Series([r.get("RUC CLIENTE") for r in rets], dtype=object)),
+                       "cliente": normalizar_id(pd.Series([r.get("RUC") for r in rets], dtype=object)),
+                       "numero": normalizar_numero(pd.Series([r.get("SUSTENTO") or "" for r in rets], dtype=object)),
+                       "con_sustento": pd.Series([bool(r.get("SUSTENTO")) for r in rets], dtype=bool),
+                       "FECHA RET": pd.Series([r.get("fechaemi", "") for r in rets], dtype=object),
+                       "N° RET": pd.Series([r.get("numreten", "") for r in rets], dtype=object),
+                       "N° AUTORIZACIÓN": pd.Series([r.get("N AUTORIZACION", "") for r in rets], dtype=object),
+                       "RET RENTA": pd.Series([r.get("rt_renta", 0) for r in rets], dtype=float),
+                       "RET IVA": pd.Series([r.get("rt_iva", 0) for r in rets], dtype=float),
+                       "TOTAL RET": pd.Series([r.get("TOTAL RET", 0) for r in rets], dtype=float)})
+    cruza = fr[_CLAVE].merge(fv.drop_duplicates(), on=_CLAVE, how="left", indicator=True)["_merge"].to_numpy() == "both"
+    sin_factura = [r for r, c, s in zip(rets, cruza, fr["con_sustento"]) if not (c and s)]
+    # La misma retención subida dos veces no debe sumarse dos veces
+    fr = fr[fr["con_sustento"] & ~fr.duplicated(["cliente", "N° RET", "N° AUTORIZACIÓN"])]
+    # Los textos solo hace falta unirlos en las facturas con más de una retención
+    varias = fr.duplicated(_CLAVE, keep=False)
+    g = pd.concat([fr[~varias], fr[varias].groupby(_CLAVE, sort=False).agg({
+        "FECHA RET": _unir, "N° RET": _unir, "N° AUTORIZACIÓN": _unir, "RET RENTA": "sum", "RET IVA": "sum", "TOTAL RET": "sum"}).reset_index()])
+    m = fv.merge(g, on=_CLAVE, how="left", indicator=True)
+
+    res, sin_ret = [], []
+    cols = list(_CEROS)
+    for v, cruzo, *ret in zip(vts, (m["_merge"] == "both").tolist(), *(m[c].tolist() for c in cols)):
+        r = dict(zip(cols, ret)) if cruzo else _CEROS
+        if not cruzo: sin_ret.append(v)
+        res.append({
+            "MES": v.get("MES"), "FECHA": v["FECHA"], "N. FACTURA": v["N. FACTURA"],
+            "RUC": v["RUC CLIENTE"], "CLIENTE": v["CLIENTE"], "DETALLE": "SERVICIOS", "MEMO": "PROFESIONAL", "MONTO REEMBOLS": 0.0,
+            "BASE. 0": v.get("BASE. 0", 0), "BASE. 12 / 15": v.get("BASE. 12 / 15", 0), "IVA": v.get("IVA.", 0), "TOTAL": v.get("TOTAL", 0),
+            "FECHA RET": r["FECHA RET"], "N° RET": r["N° RET"], "N° AUTORIZACIÓN": r["N° AUTORIZACIÓN"],
+            "RET RENTA": r["RET RENTA"], "RET IVA": r["RET IVA"], "ISD": 0.0, "TOTAL RET": r["TOTAL RET"]
+        })
+    return res, sin_factura, sin_ret
+
+
+def procesar_ventas_con_retenciones(lista):
+    """Filas de la hoja VENTAS (ver cruzar_ventas_retenciones)."""
+    return cruzar_ventas_retenciones(lista)[0]
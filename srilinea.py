@@ -1,41 +1,36 @@
 import streamlit as st
-import xml.etree.ElementTree as ET
 import pandas as pd
 import re
-import json
-import io
 import os
-import requests
 import zipfile
 import urllib3
 from datetime import datetime
-import xlsxwriter
 import time
 import urllib.parse
+from rapidito.sri import extraer_claves, filtrar_claves, BANDEJAS, AUTORIZADO, NO_AUTORIZADO, NO_ENCONTRADO, FALLIDO
+from rapidito.cache import obtener_cache
+from rapidito.clasificacion import APROXIMADO
+from rapidito.memoria import obtener_memoria
+from rapidito.trabajos import obtener_gestor, TERMINADO
+from rapidito.paralelo import extraer_lote
+from rapidito.entrada import procesar_archivos_entrada, LimiteEntradaExcedido
+from rapidito.excel import generar_excel_multiexcel
+from rapidito.artefactos import obtener_artefactos, huella
+from rapidito.ventas import cruzar_ventas_retenciones
+from rapidito.multicliente import generar_zip_clientes
+from rapidito.telemetria import conectar_api, registrar_actividad
+from rapidito.metricas import obtener_metricas, perfilar, activar_perfil, ultimo_perfil, servir as servir_metricas
 
 # --- 1. CONFIGURACIÓN INICIAL ---
 st.set_page_config(page_title="RAPIDITO AI - Portal Contable", layout="wide", page_icon="📊")
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+# Exportación de métricas para Prometheus (/metrics) si se pide un puerto; una vez por proceso
+if os.environ.get("RAPIDITO_METRICAS_PUERTO"):
+    try: servir_metricas(os.environ["RAPIDITO_METRICAS_PUERTO"])
+    except OSError: pass
 
-# Endpoints y Configuración
-URL_WS = "https://cel.sri.gob.ec/comprobantes-electronicos-ws/AutorizacionComprobantesOffline?wsdl"
-HEADERS_WS = {"Content-Type": "text/xml;charset=UTF-8","User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36"}
-URL_API_VIRAL = "https://script.google.com/macros/s/AKfycby34vXKtymcy2zt3I8DXHVTDLXL-ZPNdfSEn9E1qRNKbz3dRzB9c7xN5uX_T0Fd5Q8/exec" 
-
-# --- FUNCIONES DE SOPORTE ---
-def conectar_api(payload):
-    try:
-        r = requests.post(URL_API_VIRAL, json=payload, timeout=10)
-        return r.json()
-    except: return {"exito": False, "mensaje": "Error de conexión"}
-
-def registrar_actividad(usuario, accion, cantidad=None, sugerencia=None):
-    URL_LOGGING = "https://script.google.com/macros/s/AKfycbwur1tNR80874Djv78LG1ed9ZwUOdJbaWC9Ctc39l3510zVSPs_ycntW4-lwo2UOLbm/exec"
-    detalle = f"{accion} ({cantidad} XMLs)" if cantidad is not None else accion
-    payload = {"usuario": str(usuario), "accion": str(detalle)}
-    if sugerencia: payload["sugerencia"] = str(sugerencia)
-    try: requests.post(URL_LOGGING, json=payload, timeout=5); return True
-    except: return False
+# Endpoints: el web service del SRI vive en rapidito.sri y el backend de usuarios en rapidito.telemetria
+# (registrar_actividad solo encola el evento; se envía en segundo plano)
 
 # --- 2. GESTIÓN DE ESTADO Y LOGIN ---
 if "autenticado" not in st.session_state: st.session_state.autenticado = False
@@ -103,252 +98,44 @@ if not st.session_state.es_premium and st.session_state.invitaciones_disponibles
             """)
     st.stop()
 
-# --- 3. MEMORIA JSON ---
-if 'memoria' not in st.session_state:
-    if os.path.exists("conocimiento_contable.json"):
-        with open("conocimiento_contable.json", "r", encoding="utf-8") as f: st.session_state.memoria = json.load(f)
-    else: st.session_state.memoria = {"empresas": {}}
-
-def guardar_memoria():
-    with open("conocimiento_contable.json", "w", encoding="utf-8") as f: json.dump(st.session_state.memoria, f, indent=4, ensure_ascii=False)
-
-def procesar_archivos_entrada(lista):
-    xmls = []
-    for f in lista:
-        if f.name.lower().endswith('.xml'): xmls.append(io.BytesIO(f.getvalue()))
-        elif f.name.lower().endswith('.zip'):
-            with zipfile.ZipFile(f) as z:
-                for n in z.namelist():
-                    if n.lower().endswith('.xml') and not n.startswith('__MACOSX'): xmls.append(io.BytesIO(z.read(n)))
-    return xmls
+# --- 3. MEMORIA CONTABLE ---
+# Tabla de empresas en SQLite (rapidito.memoria), compartida por todas las sesiones; el JSON antiguo se importa la primera vez
+def empresas(): return obtener_memoria().empresas()
+
+def extraer_archivos(lista):
+    """Extrae en paralelo todos los XML subidos (leídos de uno en uno) y avisa de los que no se pudieron leer."""
+    resumen = {}
+    try: filas, fallos = extraer_lote(procesar_archivos_entrada(lista, resumen), empresas())
+    except LimiteEntradaExcedido as e: st.error(f"🚫 {e}"); return []
+    fallos = resumen["omitidos"] + fallos
+    if resumen.get("duplicados"): st.info(f"♻️ {resumen['duplicados']} comprobante(s) repetido(s) omitido(s).")
+    if fallos:
+        st.warning(f"⚠️ {len(fallos)} archivo(s) no se pudieron leer.")
+        with st.expander("Ver archivos con error"): st.dataframe(pd.DataFrame(fallos), use_container_width=True)
+    return filas
 
 # --- 4. MOTOR DE EXTRACCIÓN (DIFERENCIACIÓN 10/13) ---
-def extraer_datos_robusto(xml_file):
-    try:
-        xml_file.seek(0); tree = ET.parse(xml_file); root = tree.getroot(); xml_data = None
-        for elem in root.iter():
-            if 'comprobante' in elem.tag.lower() and elem.text and "<" in elem.text:
-                xml_data = ET.fromstring(re.sub(r'<\?xml.*?\?>', '', elem.text).strip()); break
-        if xml_data is None: xml_data = root
-
-        def buscar(tags):
-            for t in tags:
-                f = xml_data.find(f".//{t}")
-                if f is not None and f.text: return f.text.strip()
-            return ""
-
-        tipo = "NC" if "notacredito" in xml_data.tag.lower() else "RET" if "retencion" in xml_data.tag.lower() else "LC" if "liquidacion" in xml_data.tag.lower() else "FC"
-        razon_social = buscar(["razonSocial"]).upper()
-        ruc_emisor = buscar(["ruc"])
-        num_fact = f"{buscar(['estab']) or '000'}-{buscar(['ptoEmi']) or '000'}-{buscar(['secuencial']) or '000'}"
-        fecha = buscar(["fechaEmision"])
-        ruc_cli = buscar(["identificacionComprador", "identificacionSujetoRetenido"])
-        nom_cli = buscar(["razonSocialComprador", "razonSocialSujetoRetenido"]).upper()
-
-        len_id = len(ruc_cli)
-        info_json = st.session_state.memoria["empresas"].get(razon_social)
-        
-        # Lógica de clasificación solicitada
-        if len_id == 10:
-            memo_final = "PERSONAL"
-            detalle_final = info_json["DETALLE"] if info_json else "NO DEDUCIBLE"
-        else:
-            detalle_final = info_json["DETALLE"] if info_json else "OTROS"
-            memo_final = info_json["MEMO"] if info_json else "PROFESIONAL"
-
-        # 1. Calculamos la autorización ANTES de definir el diccionario
-        aut_ws = root.findtext(".//numeroAutorizacion")
-        aut_cdata = buscar(["claveAcceso"])
-        autorizacion_final = aut_ws if aut_ws else aut_cdata
-
-        # 2. Definimos el diccionario de forma limpia
-        data = {
-            "TIPO": tipo, 
-            "TIPO DE DOCUMENTO": tipo, 
-            "FECHA": fecha, 
-            "N. FACTURA": num_fact,
-            "RUC": ruc_emisor, 
-            "CONTRIBUYENTE": ruc_cli, 
-            "NOMBRE": razon_social,
-            "RUC CLIENTE": ruc_cli, 
-            "CLIENTE": nom_cli, 
-            "DETALLE": detalle_final, 
-            "MEMO": memo_final,
-            "N AUTORIZACION": autorizacion_final
-        }
-        
-        if "/" in fecha:
-            ms = {"01":"ENERO","02":"FEBRERO","03":"MARZO","04":"ABRIL","05":"MAYO","06":"JUNIO","07":"JULIO","08":"AGOSTO","09":"SEPTIEMBRE","10":"OCTUBRE","11":"NOVIEMBRE","12":"DICIEMBRE"}
-            data["MES"] = ms.get(fecha.split('/')[1], "DESCONOCIDO")
-
-        if tipo == "RET":
-            r_renta, r_iva, b_renta, b_iva = 0.0, 0.0, 0.0, 0.0
-            node = xml_data.find(".//numDocSustento")
-            sus = node.text.replace('-','') if (node is not None and node.text) else ""
-            if len(sus) >= 15: sus = f"{sus[0:3]}-{sus[3:6]}-{sus[6:]}"
-            for item in (xml_data.findall(".//impuesto") + xml_data.findall(".//retencion")):
-                try:
-                    c, v, b = item.find("codigo").text, float(item.find("valorRetenido").text or 0), float(item.find("baseImponible").text or 0)
-                    if c == "1": r_renta += v; b_renta += b
-                    elif c == "2": r_iva += v; b_iva += b
-                except: continue
-            data.update({"numfact": sus, "numreten": num_fact, "baserenta": b_renta, "rt_renta": r_renta, "baseiva": b_iva, "rt_iva": r_iva, "TOTAL RET": r_renta+r_iva, "SUSTENTO": sus, "fechaemi": fecha})
-        else:
-            m = -1 if tipo == "NC" else 1
-            b0, b12, i12, ice, prop, no_obj, exento, otra_b, otro_i = 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0
-            for imp in xml_data.findall(".//totalImpuesto"):
-                try:
-                    c, cp = imp.find("codigo").text, imp.find("codigoPorcentaje").text
-                    b, v = float(imp.find("baseImponible").text or 0)*m, float(imp.find("valor").text or 0)*m
-                    if c == "2":
-                        if cp == "0": b0 += b
-                        elif cp in ["2","3","4","8","10"]: b12 += b; i12 += v
-                        elif cp == "6": no_obj += b
-                        elif cp == "7": exento += b
-                        else: otra_b += b; otro_i += v
-                    elif c == "3": ice += v
-                except: continue
-            
-            total_val = 0.0
-            for t_tag in ["importeTotal", "total", "valorModificado"]:
-                f = xml_data.find(f".//{t_tag}")
-                if f is not None: total_val = float(f.text) * m; break
-            
-            p_node = xml_data.find(".//propina")
-            prop = float(p_node.text or 0) * m if p_node is not None else 0.0
-
-            items = [d.find("descripcion").text for d in xml_data.findall(".//detalle") if d.find("descripcion") is not None]
-            data.update({"OTRA BASE IVA": otra_b, "OTRO IVA": otro_i, "MONTO ICE": ice, "PROPINAS": prop, "EXENTO DE IVA": exento, "NO OBJ IVA": no_obj, "BASE. 0": b0, "BASE. 12 / 15": b12, "IVA.": i12, "TOTAL": total_val, "SUBDETALLE": " | ".join(items[:5])})
-        return data
-    except: return None
-
-# --- 5. LÓGICA DE INTEGRACIÓN VENTAS ---
-def procesar_ventas_con_retenciones(lista):
-    vts, rets = [], {}
-    for d in lista:
-        if d["TIPO"] == "FC": vts.append(d)
-        elif d["TIPO"] == "RET" and d.get("SUSTENTO"): rets[d["SUSTENTO"]] = d
-    res = []
-    for v in vts:
-        r = rets.get(v["N. FACTURA"], {})
-        res.append({
-            "MES": v.get("MES"), "FECHA": v["FECHA"], "N. FACTURA": v["N. FACTURA"],
-            "RUC": v["RUC CLIENTE"], "CLIENTE": v["CLIENTE"], "DETALLE": "SERVICIOS", "MEMO": "PROFESIONAL", "MONTO REEMBOLS": 0.0,
-            "BASE. 0": v.get("BASE. 0", 0), "BASE. 12 / 15": v.get("BASE. 12 / 15", 0), "IVA": v.get("IVA.", 0), "TOTAL": v.get("TOTAL", 0),
-            "FECHA RET": r.get("fechaemi", ""), "N° RET": r.get("numreten", ""), "N° AUTORIZACIÓN": r.get("N AUTORIZACION", ""),
-            "RET RENTA": r.get("rt_renta", 0), "RET IVA": r.get("rt_iva", 0), "ISD": 0.0, "TOTAL RET": r.get("TOTAL RET", 0)
-        })
-    return res
-
-# --- 6. GENERADOR EXCEL INTEGRAL (CÁLCULOS EXACTOS) ---
-def generar_excel_multiexcel(data_compras=None, data_ventas_ret=None, data_sri_lista=None, sri_mode=None):
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        wb = writer.book
-        f_azul = wb.add_format({'bold':True,'align':'center','border':1,'bg_color':'#002060','font_color':'white'})
-        f_amar = wb.add_format({'bold':True,'align':'center','border':1,'bg_color':'#FFD966'})
-        f_verd = wb.add_format({'bold':True,'align':'center','border':1,'bg_color':'#92D050'})
-        f_gris = wb.add_format({'bold':True,'align':'center','border':1,'bg_color':'#F2F2F2'})
-        f_num = wb.add_format({'num_format':'_-$ * #,##0.00_-','border':1})
-        f_tot = wb.add_format({'bold':True,'num_format':'_-$ * #,##0.00_-','border':1,'bg_color':'#EFEFEF'})
-        
-        texto_pie = "&LGenerado por RAPIDITO AI&Rrapidito.ec"
-        meses = ["ENERO", "FEBRERO", "MARZO", "ABRIL", "MAYO", "JUNIO", "JULIO", "AGOSTO", "SEPTIEMBRE", "OCTUBRE", "NOVIEMBRE", "DICIEMBRE"]
-
-        # === MODO SRI ===
-        if sri_mode:
-            df = pd.DataFrame(data_sri_lista)
-            if sri_mode == "NC":
-                cols = ["NOMBRE","RUC","N AUTORIZACION","FECHA","TIPO DE DOCUMENTO","N. FACTURA","MES","RUC CLIENTE","CLIENTE","PROPINAS","BASE. 0","NO OBJ IVA","BASE. 12 / 15","IVA.","TOTAL"]
-                fmt_h = f_amar; sh_nm = "NOTAS DE CREDITO"
-            elif sri_mode == "RET":
-                cols = ["RUC CLIENTE", "CLIENTE", "fechaemi", "NOMBRE", "RUC", "numfact", "numreten", "baserenta", "rt_renta", "baseiva", "rt_iva", "N AUTORIZACION"]
-                fmt_h = f_verd; sh_nm = "RETENCIONES"
-            else:
-                cols = ["MES","FECHA","N. FACTURA","TIPO DE DOCUMENTO","RUC","CONTRIBUYENTE","NOMBRE","DETALLE","MEMO","OTRA BASE IVA","OTRO IVA","MONTO ICE","PROPINAS","EXENTO DE IVA","NO OBJ IVA","BASE. 0","BASE. 12 / 15","IVA.","TOTAL","SUBDETALLE"]
-                fmt_h = f_azul; sh_nm = "FACTURAS"
-            
-            for c in cols: 
-                if c not in df.columns: df[c] = ""
-            ws = wb.add_worksheet(sh_nm)
-            ws.set_footer(texto_pie)
-            for i, c in enumerate(cols): ws.write(0, i, c, fmt_h)
-            for r, row in enumerate(df[cols].values, 1):
-                for c, v in enumerate(row): ws.write(r, c, v, f_num if isinstance(v, (float,int)) else wb.add_format({'border':1}))
-            ws.set_column(0, len(cols)-1, 15)
-
-        # === MODO MANUAL (CON CÁLCULOS) ===
-        else:
-            if data_compras:
-                df_c = pd.DataFrame(data_compras)
-                orden_c = ["MES","FECHA","N. FACTURA","TIPO DE DOCUMENTO","RUC","CONTRIBUYENTE","NOMBRE","DETALLE","MEMO","OTRA BASE IVA","OTRO IVA","MONTO ICE","PROPINAS","EXENTO DE IVA","NO OBJ IVA","BASE. 0","BASE. 12 / 15","IVA.","TOTAL","SUBDETALLE"]
-                for c in orden_c: 
-                    if c not in df_c.columns: df_c[c] = ""
-                ws_c = wb.add_worksheet('COMPRAS')
-                ws_c.set_footer(texto_pie)
-                for i, c in enumerate(orden_c): ws_c.write(0, i, c, f_amar if i in range(9, 15) else f_azul)
-                for r, row in enumerate(df_c[orden_c].values, 1):
-                    for c, v in enumerate(row): ws_c.write(r, c, v, f_num if isinstance(v, (float,int)) else wb.add_format({'border':1}))
-                
-                # TOTALES COMPRAS
-                ft = len(df_c) + 1; ws_c.write(ft, 0, "TOTAL", f_tot)
-                for ci in range(9, 19):
-                    l = xlsxwriter.utility.xl_col_to_name(ci)
-                    ws_c.write_formula(ft, ci, f"=SUM({l}2:{l}{ft})", f_tot)
-
-                # REPORTE ANUAL
-                ws_ra = wb.add_worksheet('REPORTE ANUAL')
-                ws_ra.set_footer(texto_pie)
-                ws_ra.set_column('A:K', 14)
-                ws_ra.merge_range('B1:B2', "Negocios y\nServicios", f_azul)
-                cats=["VIVIENDA","SALUD","EDUCACION","ALIMENTACION","VESTIMENTA","TURISMO","NO DEDUCIBLE","SERVICIOS BASICOS"]
-                icos=["🏠","❤️","🎓","🛒","🧢","✈️","🚫","💡"]
-                for i,(ct,ic) in enumerate(zip(cats,icos)):
-                    ws_ra.write(0,i+2,ic,f_azul); ws_ra.write(1,i+2,ct.title(),f_azul)
-                ws_ra.merge_range('K1:K2',"Total Mes",f_azul); ws_ra.write('B3',"PROFESIONALES",f_gris); ws_ra.merge_range('C3:J3',"GASTOS PERSONALES",f_gris)
-                
-                # Columnas de sumatoria: P(BASE 0), Q(BASE 12), O(NO OBJ), N(EXENTO), J(OTRA BASE), M(PROPINA)
-                cl_sum = ["P","Q","O","N","J","M"]
-                for r, mes in enumerate(meses):
-                    f_idx = r+4
-                    ws_ra.write(r+3, 0, mes.title(), f_num)
-                    # Suma Profesionales
-                    f_pr = "+".join([f"SUMIFS('COMPRAS'!${l}:${l},'COMPRAS'!$A:$A,\"{mes}\",'COMPRAS'!$I:$I,\"PROFESIONAL\")" for l in cl_sum])
-                    ws_ra.write_formula(r+3, 1, "="+f_pr, f_num)
-                    # Suma por categorías
-                    for cidx, ct in enumerate(cats):
-                        f_ct = "+".join([f"SUMIFS('COMPRAS'!${l}:${l},'COMPRAS'!$A:$A,\"{mes}\",'COMPRAS'!$H:$H,\"{ct}\")" for l in cl_sum])
-                        ws_ra.write_formula(r+3, cidx+2, "="+f_ct, f_num)
-                    ws_ra.write_formula(r+3, 10, f"=SUM(B{f_idx}:J{f_idx})", f_num)
-                ws_ra.write(15, 0, "TOTAL", f_tot)
-                for c in range(1,11):
-                    l = xlsxwriter.utility.xl_col_to_name(c)
-                    ws_ra.write_formula(15, c, f"=SUM({l}4:{l}15)", f_tot)
-
-            if data_ventas_ret:
-                df_v = pd.DataFrame(data_ventas_ret)
-                ord_v = ["MES","FECHA","N. FACTURA","RUC","CLIENTE","DETALLE","MEMO","MONTO REEMBOLS","BASE. 0","BASE. 12 / 15","IVA","TOTAL","FECHA RET","N° RET","N° AUTORIZACIÓN","RET RENTA","RET IVA","ISD","TOTAL RET"]
-                for c in ord_v: 
-                    if c not in df_v.columns: df_v[c] = ""
-                ws_v = wb.add_worksheet('VENTAS')
-                for i, c in enumerate(ord_v): ws_v.write(0, i, c, f_verd if i >= 12 else f_azul)
-                for r, row in enumerate(df_v[ord_v].values, 1):
-                    for c, v in enumerate(row): ws_v.write(r, c, v, f_num if isinstance(v, (float,int)) else wb.add_format({'border':1}))
-                
-                # PROYECCION
-                ws_p = wb.add_worksheet('PROYECCION')
-                ws_p.set_column('A:M', 15)
-                for i, h in enumerate(["VENTAS", "COMPRAS", "TOTAL"]): ws_p.write(i+2, 0, h, f_azul)
-                for c, mes in enumerate(meses):
-                    col = c + 1; l = xlsxwriter.utility.xl_col_to_name(col)
-                    ws_p.write(1, col, mes, f_azul)
-                    ws_p.write_formula(2, col, f"=SUMIFS(VENTAS!$I:$I,VENTAS!$A:$A,\"{mes}\") + SUMIFS(VENTAS!$J:$J,VENTAS!$A:$A,\"{mes}\")", f_num)
-                    if data_compras:
-                        f_cp = "+".join([f"SUMIFS('COMPRAS'!${x}:${x},'COMPRAS'!$A:$A,{l}$2,'COMPRAS'!$I:$I,\"PROFESIONAL\")" for x in cl_sum])
-                        ws_p.write_formula(3, col, "="+f_cp, f_num)
-                    ws_p.write_formula(4, col, f"={l}3-{l}4", f_tot)
-
-    return output.getvalue()
+# La extracción vive en rapidito.extraccion (un solo recorrido por documento) y se le pasa la memoria compartida
+# Proveedor por RUC, nombre, nombre normalizado o parecido (rapidito.clasificacion); cada fila indica cuál se usó
+
+# --- 5/6. VENTAS CON RETENCIONES Y EXCEL INTEGRAL ---
+# cruzar_ventas_retenciones (rapidito.ventas) y generar_excel_multiexcel (rapidito.excel) viven en el motor.
+# Los Excel y ZIP se escriben a disco (rapidito.artefactos) una sola vez por contenido y no quedan en la sesión;
+# si esta versión de Streamlit acepta una función como `data`, el archivo se genera recién al hacer clic
+def _admite_descarga_diferida():
+    try: from streamlit.elements.widgets.button import DownloadButtonDataType
+    except ImportError: return False
+    return "Callable" in str(DownloadButtonDataType)  # el tipo de `data` incluye la función desde que se admite
+
+_DESCARGA_DIFERIDA = _admite_descarga_diferida()
+
+def boton_descarga(etiqueta, clave, extension, generar, nombre, key=None):
+    """Botón de descarga de un artefacto en disco; `generar(archivo)` lo escribe si aún no existe."""
+    def abrir(): return obtener_artefactos().abrir(clave, extension, generar)
+    def leer():
+        with abrir() as f: return f.read()
+    if _DESCARGA_DIFERIDA: return st.download_button(etiqueta, leer, nombre, key=key)
+    with abrir() as f: return st.download_button(etiqueta, f, nombre, key=key)
 
 # --- 7. INTERFAZ ORGANIZADA ---
 st.title(f"🚀 RAPIDITO AI - {st.session_state.get('usuario_actual', 'Portal Contable')}")
@@ -359,16 +146,39 @@ with st.sidebar:
         st.session_state.id_proceso += 1
         st.session_state.data_compras_cache, st.session_state.data_ventas_cache, st.session_state.sri_results = [], [], {}
         st.rerun()
+    formulas_excel = st.checkbox("🧮 Fórmulas de auditoría en el Excel", help="Además de los totales calculados, deja las fórmulas SUMIFS en REPORTE ANUAL y PROYECCIÓN.")
     st.markdown("---")
     if st.session_state.usuario_actual == "GABRIEL":
         st.subheader("🔑 Master Config")
         up_xls = st.file_uploader("Actualizar JSON", type=["xlsx"], key=f"mst_{st.session_state.id_proceso}")
-        if up_xls:
-            df = pd.read_excel(up_xls); df.columns = [c.upper().strip() for c in df.columns]
-            for _, r in df.iterrows():
-                nm = str(r.get("NOMBRE","")).upper().strip()
-                if nm: st.session_state.memoria["empresas"][nm] = {"DETALLE":str(r.get("DETALLE","OTROS")).upper(),"MEMO":str(r.get("MEMO","PROFESIONAL")).upper()}
-            guardar_memoria(); st.success("Guardado.")
+        # Cada rerun vuelve a entregar el mismo archivo: se importa una sola vez por subida
+        if up_xls and st.session_state.get("mst_importado") != up_xls.file_id:
+            st.session_state.mst_guardado = obtener_memoria().cargar_excel(pd.read_excel(up_xls))
+            st.session_state.mst_importado = up_xls.file_id
+        if up_xls: st.success(f"Guardado ({st.session_state.mst_guardado} empresas).")
+        st.subheader("💾 Caché SRI")
+        cst = obtener_cache().estadisticas()
+        st.caption(f"{cst['entradas']} comprobantes · {cst['bytes']/1048576:.1f} / {cst['max_bytes']/1048576:.0f} MB · {cst['aciertos']} aciertos / {cst['fallos']} fallos")
+        inv_txt = st.text_area("Claves a invalidar (vacío = todo)", key="inv_cache")
+        if st.button("🗑️ Invalidar caché", use_container_width=True):
+            obtener_cache().invalidar(extraer_claves(inv_txt) if inv_txt.strip() else None); st.success("Caché actualizada.")
+        st.subheader("📈 Métricas")
+        with st.expander("Rendimiento por etapa"):
+            met = obtener_metricas().instantanea()
+            if met["histogramas"]:
+                st.dataframe(pd.DataFrame([{"ETAPA": h["nombre"], "ETIQUETAS": ", ".join(f"{k}={v}" for k, v in h["etiquetas"].items()), "N": h["n"],
+                                            "MEDIA": round(h["media"], 4), "P50": h["p50"], "P95": h["p95"], "MÁX": round(h["max"], 4), "TOTAL": round(h["suma"], 2)}
+                                           for h in met["histogramas"]]), use_container_width=True, hide_index=True)
+            cont = met["contadores"] + met["valores"]
+            if cont: st.dataframe(pd.DataFrame([{"MÉTRICA": c["nombre"], "ETIQUETAS": ", ".join(f"{k}={v}" for k, v in c["etiquetas"].items()), "VALOR": c["valor"]} for c in cont]), use_container_width=True, hide_index=True)
+            if not met["histogramas"] and not cont: st.caption("Sin datos todavía.")
+            c1, c2 = st.columns(2)
+            with c1: st.download_button("JSON", obtener_metricas().json(), "metricas.json", use_container_width=True)
+            with c2: st.download_button("Prometheus", obtener_metricas().prometheus(), "metricas.prom", use_container_width=True)
+            if st.button("🔬 Perfilar el próximo proceso", use_container_width=True): activar_perfil(); st.info("Se perfilará el próximo Procesar Compras / Ventas.")
+            if st.button("♻️ Reiniciar métricas", use_container_width=True): obtener_metricas().reiniciar()
+            perfil = ultimo_perfil()
+            if perfil: st.caption(f"Último perfil: {perfil[0]}"); st.code(perfil[1], language=None)
     st.subheader("📬 Sugerencias")
     sug = st.text_area("Ideas:")
     if st.button("Enviar Sugerencia", use_container_width=True):
@@ -392,63 +202,136 @@ if inv > 0:
 tab_xml, tab_sri, tab_tutorial = st.tabs(["📂 Subir XMLs (Manual/ZIP)", "📡 Descarga SRI (TXT)", "📺 Aprende a usarme"])
 
 with tab_xml:
-    m1, m2, m3 = st.tabs(["🛒 Compras y NC", "💰 Ventas y Retenciones", "📑 Informe Integral"])
+    m1, m2, m3, m4 = st.tabs(["🛒 Compras y NC", "💰 Ventas y Retenciones", "📑 Informe Integral", "👥 Varios Clientes"])
     with m1:
         up = st.file_uploader("Compras (XML/ZIP)", type=["xml","zip"], accept_multiple_files=True, key=f"c_{st.session_state.id_proceso}")
         st.info("💡 **Módulo de Compras:** Sube tus facturas recibidas y notas de crédito en formato xml o zip con xmls.  Este reporte contiene la pestaña de compras y gasto anual. El sistema clasificará automáticamente tus gastos deducibles.")
         if up and st.button("Procesar Compras"):
-            data = [extraer_datos_robusto(x) for x in procesar_archivos_entrada(up)]
-            data = [d for d in data if d and d["TIPO"] in ["FC","NC"]]
+            with perfilar("compras"): data = [d for d in extraer_archivos(up) if d and d["TIPO"] in ["FC","NC"]]
             st.session_state.data_compras_cache = data
+            aprox = [d for d in data if d.get("CLASIFICACION") == APROXIMADO]
+            if aprox:
+                with st.expander(f"🔎 {len(aprox)} compra(s) clasificadas por nombre parecido: revísalas"): st.dataframe(pd.DataFrame(aprox)[["NOMBRE","RUC","DETALLE","MEMO","SIMILITUD"]], use_container_width=True)
             registrar_actividad(st.session_state.usuario_actual, "PROCESÓ COMPRAS MANUAL", len(data))
-            st.download_button("📥 Excel Compras", generar_excel_multiexcel(data_compras=data), "Compras.xlsx")
+            boton_descarga("📥 Excel Compras", huella("compras", data, formulas_excel), "xlsx", lambda f: generar_excel_multiexcel(data_compras=data, formulas=formulas_excel, destino=f), "Compras.xlsx")
     with m2:
         up = st.file_uploader("Ventas (XML/ZIP)", type=["xml","zip"], accept_multiple_files=True, key=f"v_{st.session_state.id_proceso}")
         st.info("💡 **Módulo de Ventas:** Carga tus facturas emitidas y retenciones recibidas en formato xml o zip con xmls. El sistema cruzará la información usando los números de sustento.")
         if up and st.button("Procesar Ventas"):
-            raw = [extraer_datos_robusto(x) for x in procesar_archivos_entrada(up)]
-            data = procesar_ventas_con_retenciones([d for d in raw if d])
+            with perfilar("ventas"):
+                raw = extraer_archivos(up)
+                data, ret_sin_fc, fc_sin_ret = cruzar_ventas_retenciones([d for d in raw if d])
             st.session_state.data_ventas_cache = data
+            if fc_sin_ret: st.caption(f"🧾 {len(fc_sin_ret)} factura(s) sin retención.")
+            if ret_sin_fc:
+                with st.expander(f"⚠️ {len(ret_sin_fc)} retención(es) sin factura de venta"): st.dataframe(pd.DataFrame(ret_sin_fc).reindex(columns=["NOMBRE","RUC","numreten","SUSTENTO","fechaemi","TOTAL RET"]), use_container_width=True)
             registrar_actividad(st.session_state.usuario_actual, "PROCESÓ VENTAS MANUAL", len(data))
-            st.download_button("📥 Excel Ventas", generar_excel_multiexcel(data_ventas_ret=data), "Ventas.xlsx")
+            boton_descarga("📥 Excel Ventas", huella("ventas", data, formulas_excel), "xlsx", lambda f: generar_excel_multiexcel(data_ventas_ret=data, formulas=formulas_excel, destino=f), "Ventas.xlsx")
     with m3:
         st.info("💡 **Informe Integral:** Consumo de datos cruzados. Este reporte contiene la pestaña de compras, reporte anual, ventas y proyección. Asegúrate de haber presionado primero el botón de procesar compras y ventas de las dos anteriores pestañas en orden para generar el reporte anual completo.")
         if st.button("🚀 Generar Informe Integral"):
             if st.session_state.data_compras_cache and st.session_state.data_ventas_cache:
-                st.download_button("📥 DESCARGAR INTEGRAL", generar_excel_multiexcel(st.session_state.data_compras_cache, st.session_state.data_ventas_cache), "Integral.xlsx")
+                dc, dv = st.session_state.data_compras_cache, st.session_state.data_ventas_cache
+                boton_descarga("📥 DESCARGAR INTEGRAL", huella("integral", dc, dv, formulas_excel), "xlsx", lambda f: generar_excel_multiexcel(dc, dv, formulas=formulas_excel, destino=f), "Integral.xlsx")
             else: st.error("Falta procesar Compras y Ventas.")
             registrar_actividad(st.session_state.usuario_actual, "GENERÓ INFORME INTEGRAL")
+    with m4:
+        up = st.file_uploader("Comprobantes de varios clientes (XML/ZIP)", type=["xml","zip"], accept_multiple_files=True, key=f"mc_{st.session_state.id_proceso}")
+        rucs = st.text_area("RUC o cédula de tus clientes (opcional, uno por línea)", key=f"mc_rucs_{st.session_state.id_proceso}", help="Si lo dejas vacío se deducen de las retenciones de la carga (el sujeto retenido); las facturas y notas de crédito que no sean de ninguno quedan sin asignar.")
+        st.info("💡 **Varios Clientes:** Sube en una sola carga las compras, ventas y retenciones de todos tus clientes. El sistema las separa por RUC y arma el informe integral de cada uno (compras, reporte anual, ventas y proyección) en un solo ZIP con un índice de resumen.")
+        if up and st.button("Procesar Lote de Clientes"):
+            contribuyentes = re.findall(r"\d{10,13}", rucs) or None
+            with perfilar("clientes"):
+                data = [d for d in extraer_archivos(up) if d]
+                # El ZIP se escribe directo como artefacto; el resumen se lee de su INDICE.xlsx (sirve también si ya existía)
+                generar = lambda f: generar_zip_clientes(data, f, contribuyentes, formulas=formulas_excel)
+                clave = huella("clientes", data, contribuyentes, formulas_excel)
+                with obtener_artefactos().abrir(clave, "zip", generar) as f, zipfile.ZipFile(f) as z: hojas = pd.read_excel(z.open("INDICE.xlsx"), sheet_name=None, dtype={"RUC": str, "RUC CLIENTE": str, "N AUTORIZACION": str})
+            indice, sin_asignar = hojas["INDICE"], hojas.get("SIN ASIGNAR")
+            if len(indice) > 1:  # además de la fila TOTAL
+                st.dataframe(indice, use_container_width=True, hide_index=True)
+                boton_descarga("📦 DESCARGAR ZIP DE CLIENTES", clave, "zip", generar, "Clientes.zip")
+            else: st.error("No se encontraron comprobantes de los clientes indicados." if contribuyentes else "No hay retenciones de las que deducir los clientes: indica sus RUC.")
+            if sin_asignar is not None:
+                with st.expander(f"⚠️ {len(sin_asignar)} comprobante(s) sin asignar: no se sabe de qué cliente son. Indica los RUC de tus clientes."): st.dataframe(sin_asignar, use_container_width=True, hide_index=True)
+            registrar_actividad(st.session_state.usuario_actual, "PROCESÓ LOTE CLIENTES", len(data))
 
 with tab_sri:
-    def bloque_sri_persistente(titulo, tipo_filtro, key):
-        st.subheader(titulo); up = st.file_uploader(f"TXT {titulo}", type=["txt"], key=f"up_{key}")
-        st.info(f"👉 Sube el archivo TXT descargado del portal del SRI para extraer masivamente los XMLs de {titulo}.")
-        if up and st.button(f"🚀 Descargar {titulo}", key=f"btn_{key}"):
-            claves = list(dict.fromkeys(re.findall(r'\d{49}', up.read().decode("latin-1"))))
-            if claves:
-                bar, status = st.progress(0), st.empty(); lst, zip_buf = [], io.BytesIO()
-                with zipfile.ZipFile(zip_buf, "a", zipfile.ZIP_DEFLATED) as zf:
-                    for i, cl in enumerate(claves):
-                        try:
-                            r = requests.post(URL_WS, data=f'<soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" xmlns:ec="http://ec.gob.sri.ws.autorizacion"><soapenv:Body><ec:autorizacionComprobante><claveAccesoComprobante>{cl}</claveAccesoComprobante></ec:autorizacionComprobante></soapenv:Body></soapenv:Envelope>', headers=HEADERS_WS, verify=False, timeout=5)
-                            if "<autorizaciones>" in r.text:
-                                zf.writestr(f"{cl}.xml", r.text); d = extraer_datos_robusto(io.BytesIO(r.content))
-                                if d and (d["TIPO"] == tipo_filtro or (tipo_filtro=="FC" and d["TIPO"]=="LC")): lst.append(d)
-                        except: pass
-                        bar.progress((i+1)/len(claves)); status.text(f"Procesando {i+1}/{len(claves)}")
-                st.session_state.sri_results[key] = {"data": lst, "zip": zip_buf.getvalue()}
-                registrar_actividad(st.session_state.usuario_actual, f"DESCARGA SRI: {titulo}", len(lst))
-        if key in st.session_state.sri_results:
-            res = st.session_state.sri_results[key]
-            if res["data"]:
+    # Una sola importación: las claves se decodifican en local (fecha, tipo, emisor), se filtran antes de ir
+    # a la red y cada una se descarga una vez; las filas se reparten en las bandejas FC/LC, NC y RET
+    SRI_BANDEJAS = [("Facturas Recibidas", "FC", "sri_fc"), ("Notas de Crédito", "NC", "sri_nc"), ("Retenciones", "RET", "sri_ret")]
+
+    # La descarga corre como trabajo en segundo plano (rapidito.trabajos): cada clave se guarda al llegar, así que
+    # recargar la página o tocar otro control no pierde nada y el trabajo sigue aunque se cierre la pestaña
+    def importar_sri(seleccion):
+        st.session_state.sri_results = {"trabajo": obtener_gestor().crear(seleccion, st.session_state.usuario_actual)}
+        registrar_actividad(st.session_state.usuario_actual, "DESCARGA SRI", len(seleccion))
+
+    up = st.file_uploader("TXT del SRI", type=["txt"], accept_multiple_files=True, key=f"up_sri_{st.session_state.id_proceso}")
+    st.info("👉 Sube uno o varios TXT descargados del portal del SRI: facturas, liquidaciones, notas de crédito y retenciones se descargan de una sola vez y se separan solas.")
+    if up:
+        todas = extraer_claves("\n".join(f.getvalue().decode("latin-1") for f in up))
+        validas = [d for d in filtrar_claves(todas) if d["tipo"] in BANDEJAS]
+        if validas:
+            fechas = [d["fecha"] for d in validas]
+            # Claves de widget propias de este conjunto de TXT: con otros archivos los filtros vuelven a empezar
+            # en su rango completo en vez de conservar fechas y emisores de la carga anterior
+            sufijo = huella([d["clave"] for d in validas])[:12]
+            c1, c2 = st.columns(2)
+            with c1: rango = st.date_input("📅 Fecha de emisión", (min(fechas), max(fechas)), key=f"sri_rango_{sufijo}")
+            with c2: emisores = st.multiselect("🏢 Emisores (RUC)", sorted({d["ruc"] for d in validas}), key=f"sri_emisores_{sufijo}", placeholder="Todos")
+            desde, hasta = rango if isinstance(rango, (tuple, list)) and len(rango) == 2 else (None, None)
+            seleccion = filtrar_claves([d["clave"] for d in validas], desde, hasta, emisores, BANDEJAS)
+            por_tipo = {"FC": 0, "NC": 0, "RET": 0}
+            for d in seleccion: por_tipo[BANDEJAS[d["tipo"]]] += 1
+            st.caption(f"🔑 {len(seleccion)} de {len(todas)} claves a descargar · 🧾 {por_tipo['FC']} facturas/LC · 📄 {por_tipo['NC']} notas de crédito · 🧮 {por_tipo['RET']} retenciones"
+                       + (f" · 🚫 {len(todas)-len(validas)} omitidas (inválidas u otro tipo)" if len(todas) > len(validas) else ""))
+            if seleccion and st.button("🚀 Descargar del SRI", key="btn_sri"): importar_sri(seleccion)
+        else: st.warning("El TXT no tiene claves de acceso válidas de facturas, notas de crédito o retenciones.")
+
+    if not st.session_state.sri_results.get("trabajo"):
+        recientes = [t for t in obtener_gestor().trabajos(st.session_state.usuario_actual) if t]
+        if recientes:
+            etiquetas = {t["id"]: f"{time.strftime('%d/%m %H:%M', time.localtime(t['creado']))} · {t['estado'].lower()} · {t['hechos']}/{t['total']} claves" for t in recientes}
+            c1, c2 = st.columns([3, 1])
+            with c1: elegido = st.selectbox("🕘 Descargas anteriores", list(etiquetas), format_func=etiquetas.get, key="sri_recientes")
+            with c2:
+                st.write("")
+                if st.button("Abrir", key="sri_abrir", use_container_width=True): st.session_state.sri_results = {"trabajo": elegido}; st.rerun()
+
+    def panel_sri():
+        tid = st.session_state.sri_results.get("trabajo")
+        e = obtener_gestor().estado(tid) if tid else None
+        if e is None: return
+        c = e["conteo"]
+        st.progress(e["hechos"] / max(e["total"], 1), text=f"{'⏳' if e['activo'] else '📦'} {e['estado'].capitalize()} · {e['hechos']}/{e['total']} claves")
+        st.caption(f"✅ {c[AUTORIZADO]} autorizados · ⛔ {c[NO_AUTORIZADO]} no autorizados · 🔍 {c[NO_ENCONTRADO]} no encontrados · ❌ {c[FALLIDO]} fallidos · 💾 {c['cache']} desde caché · 🌐 {e['hechos']-c['cache']} consultas al SRI")
+        if e["error"]: st.error(e["error"])
+        if e["activo"]:
+            if st.button("⏹️ Detener", key="sri_detener"): obtener_gestor().cancelar(tid)
+        elif e["estado"] != TERMINADO or c[FALLIDO]:
+            if st.button("▶️ Continuar / reintentar fallidos", key="sri_reanudar"): obtener_gestor().reanudar(tid)
+        s1, s2, s3 = st.tabs(["Facturas", "Notas Crédito", "Retenciones"])
+        for tab, (titulo, tipo, key) in zip((s1, s2, s3), SRI_BANDEJAS):
+            with tab:
+                n = e["bandejas"].get(tipo, 0)
+                if not n: st.caption("Sin comprobantes todavía."); continue
+                st.caption(f"{n} comprobante(s)" + (" hasta ahora" if e["activo"] else ""))
+                # Sin descarga diferida el botón escribe el archivo al dibujarse: con el trabajo en curso eso
+                # sería un Excel y un ZIP nuevos en cada refresco del panel, así que se muestran al terminar
+                if e["activo"] and not _DESCARGA_DIFERIDA: st.caption("Las descargas aparecen al terminar."); continue
+                # Trabajo + número de comprobantes identifica el contenido: solo se regenera cuando llegan nuevos
+                clave = huella(tid, tipo, n)
                 c1, c2 = st.columns(2)
-                with c1: st.download_button(f"📊 Excel {titulo}", generar_excel_multiexcel(data_sri_lista=res["data"], sri_mode=tipo_filtro), f"{titulo}.xlsx", key=f"dl_ex_{key}")
-                with c2: st.download_button(f"📦 ZIP XMLs {titulo}", res["zip"], f"{titulo}.zip", key=f"dl_zip_{key}")
-
-    s1, s2, s3 = st.tabs(["Facturas", "Notas Crédito", "Retenciones"])
-    with s1: bloque_sri_persistente("Facturas Recibidas", "FC", "sri_fc")
-    with s2: bloque_sri_persistente("Notas de Crédito", "NC", "sri_nc")
-    with s3: bloque_sri_persistente("Retenciones", "RET", "sri_ret")
+                with c1: boton_descarga(f"📊 Excel {titulo}", clave, "xlsx", lambda f, tipo=tipo: generar_excel_multiexcel(data_sri_lista=obtener_gestor().filas(tid, tipo), sri_mode=tipo, destino=f), f"{titulo}.xlsx", key=f"dl_ex_{key}")
+                with c2: boton_descarga(f"📦 ZIP XMLs {titulo}", clave, "zip", lambda f, tipo=tipo: obtener_gestor().zip(tid, tipo, destino=f), f"{titulo}.zip", key=f"dl_zip_{key}")
+
+    # El panel se refresca solo mientras la página está abierta (sin volver a ejecutar todo el script)
+    fragmento = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+    if fragmento: fragmento(run_every=2)(panel_sri)()
+    else:
+        panel_sri()
+        if st.session_state.sri_results.get("trabajo"): st.button("🔄 Actualizar", key="sri_actualizar")
 
 # AQUI SE CONFIGURA LA NUEVA PESTAÑA CON EL VIDEO DE YOUTUBE
 with tab_tutorial:
@@ -0,0 +1,6 @@
+import os
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# El paquete se usa desde la raíz del repositorio y el generador de comprobantes vive en benchmarks/
+sys.path[:0] = [RAIZ, os.path.join(RAIZ, "benchmarks")]
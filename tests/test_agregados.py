@@ -0,0 +1,32 @@
+import pytest
+
+from bench_excel import HOJAS, celdas, comprobar_resumenes, datos, generar_legado
+from rapidito.agregados import totales_compras, totales_ventas, MESES, CATEGORIAS
+from rapidito.excel import generar_excel_multiexcel
+
+
+@pytest.fixture
+def muestra():
+    m = datos(60)
+    # Casos que las fórmulas tratan de forma particular: criterios en minúsculas, texto en una
+    # columna sumada (SUMIFS lo ignora) y filas sin mes
+    m["compras"][0]["MEMO"] = "profesional"; m["compras"][1]["DETALLE"] = "Salud"
+    m["compras"][2]["BASE. 0"] = "12.50"; m["compras"][3]["MES"] = ""; m["ventas"][0]["MES"] = "marzo"
+    return m
+
+
+def test_totales_iguales_a_las_formulas_sumifs_anteriores(muestra):
+    comprobar_resumenes(muestra)
+
+
+@pytest.mark.parametrize("hoja", list(HOJAS))
+def test_celdas_de_datos_iguales_al_generador_anterior(muestra, hoja):
+    kw = HOJAS[hoja](muestra)
+    for constante in (False, True):
+        assert celdas(generar_legado(**kw))[hoja] == celdas(generar_excel_multiexcel(**kw, memoria_constante=constante))[hoja]
+
+
+def test_sin_filas_los_totales_son_cero():
+    compras, ventas = totales_compras([]), totales_ventas([])
+    assert list(compras.index) == MESES and list(compras.columns) == ["PROFESIONAL"] + CATEGORIAS
+    assert (compras == 0).all().all() and list(ventas.index) == MESES and (ventas == 0).all()
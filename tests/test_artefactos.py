@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+
+import pytest
+
+from rapidito.artefactos import Artefactos, huella
+
+
+@pytest.fixture
+def art(tmp_path):
+    return Artefactos(str(tmp_path), ttl=3600, max_bytes=10_000)
+
+
+def escribir(contenido):
+    return lambda f: f.write(contenido)
+
+
+def envejecer(ruta, segundos):
+    t = time.time() - segundos
+    os.utime(ruta, (t, t))
+
+
+def test_se_genera_una_vez_y_se_reutiliza(art):
+    clave = huella("compras", [{"TOTAL": 1.0}])
+    ruta = art.obtener(clave, "xlsx", escribir(b"uno"))
+    assert art.obtener(clave, "xlsx", escribir(b"otro")) == ruta
+    assert open(ruta, "rb").read() == b"uno" and (art.generados, art.reutilizados) == (1, 1)
+    assert art._usos == {}
+
+
+def test_ttl_borra_lo_que_no_se_usa(art):
+    viejo, nuevo = art.obtener("viejo", "zip", escribir(b"x")), art.obtener("nuevo", "zip", escribir(b"x"))
+    envejecer(viejo, 7200)
+    assert art.limpiar() == 1
+    assert not os.path.exists(viejo) and os.path.exists(nuevo)
+
+
+def test_cuota_borra_primero_lo_menos_usado(art):
+    rutas = [art.obtener(f"a{i}", "xlsx", escribir(b"x" * 3000)) for i in range(3)]
+    for i, r in enumerate(rutas): envejecer(r, 100 - i)
+    art.obtener("a0", "xlsx", escribir(b""))  # reutilizar a0 lo vuelve el más reciente
+    art.obtener("a3", "xlsx", escribir(b"x" * 3000))
+    assert [os.path.exists(r) for r in rutas] == [True, False, True]
+    assert art.estadisticas()["bytes"] <= art.max_bytes
+
+
+def test_no_borra_lo_que_se_esta_leyendo(art):
+    with art.abrir("en_uso", "zip", escribir(b"contenido")) as f:
+        envejecer(art._ruta("en_uso", "zip"), 7200)
+        assert art.limpiar() == 0
+        assert f.read() == b"contenido"
+    assert art.limpiar() == 1 and art._usos == {}
+
+
+def test_generacion_concurrente_de_la_misma_clave(art):
+    llamadas, barrera = [], threading.Barrier(8)
+
+    def generar(f):
+        llamadas.append(1); time.sleep(0.05); f.write(b"x" * 100)
+
+    def pedir():
+        barrera.wait(); rutas.append(art.obtener("misma", "xlsx", generar))
+
+    rutas = []
+    hilos = [threading.Thread(target=pedir) for _ in range(8)]
+    for h in hilos: h.start()
+    for h in hilos: h.join()
+    assert len(llamadas) == 1 and len(set(rutas)) == 1 and (art.generados, art.reutilizados) == (1, 7)
+    assert art._usos == {}
+
+
+def test_generacion_fallida_no_deja_rastro(art):
+    def falla(f):
+        f.write(b"a medias"); raise RuntimeError("sin datos")
+
+    with pytest.raises(RuntimeError):
+        art.obtener("falla", "xlsx", falla)
+    assert os.listdir(art.ruta) == [] and art._usos == {}
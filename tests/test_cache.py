@@ -0,0 +1,79 @@
+import itertools
+
+import pytest
+
+import rapidito.cache
+from generador import comprobantes_por_clave
+from rapidito.cache import CacheComprobantes
+from rapidito.mock_sri import ServidorSRISimulado, respuesta_autorizacion
+from rapidito.sri import DescargadorSRI, AUTORIZADO, NO_AUTORIZADO
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = CacheComprobantes(str(tmp_path / "cache.sqlite3"))
+    yield c
+    c.cerrar()
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """time.time() de la caché avanza un segundo por llamada, para que el orden de uso sea exacto."""
+    tics = itertools.count(1000)
+    monkeypatch.setattr(rapidito.cache.time, "time", lambda: next(tics))
+
+
+def test_acierto_y_fallo(cache):
+    assert cache.obtener("1" * 49) is None
+    cache.guardar("1" * 49, "<xml>ñ</xml>", {"TIPO": "FC"})
+    assert cache.obtener("1" * 49) == {"xml": "<xml>ñ</xml>".encode(), "fila": {"TIPO": "FC"}}
+    cache.guardar_fila("1" * 49, {"TIPO": "NC"})
+    assert cache.obtener("1" * 49)["fila"] == {"TIPO": "NC"}
+    e = cache.estadisticas()
+    assert (e["entradas"], e["aciertos"], e["fallos"]) == (1, 2, 1)
+
+
+def test_desalojar_quita_las_menos_usadas(cache, reloj):
+    for i in range(10): cache.guardar(f"{i:049d}", bytes(range(256)) * (i + 1))
+    por_entrada = cache.total / 10
+    cache.obtener(f"{0:049d}"); cache.obtener(f"{1:049d}")  # las dos más antiguas pasan a ser las más usadas
+    cache.max_bytes = int(por_entrada * 6)
+    cache.desalojar()
+    quedan = {c for c in (f"{i:049d}" for i in range(10)) if cache.obtener(c) is not None}
+    assert f"{0:049d}" in quedan and f"{1:049d}" in quedan and f"{2:049d}" not in quedan
+    assert cache.total <= cache.max_bytes * 0.9 and len(quedan) < 10
+    assert cache.total == sum(b for (b,) in cache.con.execute("SELECT bytes FROM comprobantes"))
+
+
+def test_invalidar(cache):
+    for i in range(3): cache.guardar(f"{i:049d}", "<xml/>")
+    cache.invalidar([f"{0:049d}"])
+    assert cache.obtener(f"{0:049d}") is None and cache.estadisticas()["entradas"] == 2
+    cache.invalidar()
+    e = cache.estadisticas()
+    assert (e["entradas"], e["bytes"]) == (0, 0)
+
+
+def test_descarga_repetida_no_va_a_la_red(cache):
+    comprobantes = comprobantes_por_clave(8)
+    with ServidorSRISimulado(comprobantes) as srv:
+        with DescargadorSRI(url=srv.url, por_segundo=1000, cache=cache) as dsc: primera = dsc.descargar(list(comprobantes))
+        assert srv.peticiones == 8
+        with DescargadorSRI(url=srv.url, por_segundo=1000, cache=cache) as dsc: segunda = dsc.descargar(list(comprobantes))
+        assert srv.peticiones == 8
+    assert all(r["cache"] and r["estado"] == AUTORIZADO for r in segunda)
+    assert [r["contenido"] for r in segunda] == [r["contenido"] for r in primera]
+
+
+def test_no_autorizado_no_se_guarda(cache):
+    comprobantes = comprobantes_por_clave(3)
+    rechazada, *autorizadas = list(comprobantes)
+    # Una respuesta NO AUTORIZADO guardada por una versión anterior se descarta y se vuelve a consultar
+    cache.guardar(autorizadas[0], respuesta_autorizacion(autorizadas[0], comprobantes[autorizadas[0]], "NO AUTORIZADO"))
+    with ServidorSRISimulado(comprobantes, estados={rechazada: "NO AUTORIZADO"}) as srv:
+        for _ in range(2):
+            with DescargadorSRI(url=srv.url, por_segundo=1000, cache=cache) as dsc: res = dsc.descargar(list(comprobantes))
+            assert res[0]["estado"] == NO_AUTORIZADO and res[0]["error"] == "NO AUTORIZADO"
+            assert [r["estado"] for r in res[1:]] == [AUTORIZADO] * 2
+        assert srv.peticiones == 4
+    assert cache.obtener(rechazada) is None
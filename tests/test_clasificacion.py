@@ -0,0 +1,31 @@
+import pickle
+import random
+
+import pytest
+
+from bench_clasificacion import fuerza_bruta
+from generador import razones_sociales, con_errores
+from rapidito.clasificacion import IndiceEmpresas, APROXIMADO, normalizar, trigramas
+
+
+@pytest.fixture(scope="module")
+def nombres():
+    return razones_sociales(3300, semilla=5)
+
+
+@pytest.mark.parametrize("umbral", [0.6, 0.8, 0.9])
+def test_aproximado_igual_a_la_fuerza_bruta(nombres, umbral):
+    ind = IndiceEmpresas({nm: {"DETALLE": "SALUD", "MEMO": "PERSONAL"} for nm in nombres[:3000]}, umbral=umbral)
+    conjuntos = [trigramas(normalizar(nm)) for nm in ind.nombres]
+    rnd = random.Random(2)
+    consultas = [normalizar(con_errores(rnd.choice(nombres[:3000]), rnd)) for _ in range(150)] + [normalizar(nm) for nm in nombres[3000:]]
+    for q in consultas + ["X", "AB"]:
+        assert ind._buscar_trigramas(q)[1] == pytest.approx(fuerza_bruta(ind, conjuntos, q)[1])
+
+
+def test_indice_se_envia_ya_construido(nombres):
+    ind = IndiceEmpresas({nm: {"DETALLE": "SALUD", "MEMO": "PERSONAL"} for nm in nombres[:3000]})
+    copia = pickle.loads(pickle.dumps(ind))
+    consulta = con_errores(nombres[7], random.Random(3))
+    assert copia.buscar(consulta) == ind.buscar(consulta) and copia.buscar(consulta)[1] == APROXIMADO
+    assert copia._aproximado.cache_info().currsize == 1
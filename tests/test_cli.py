@@ -0,0 +1,42 @@
+import pandas as pd
+
+import rapidito.sri
+from generador import comprobantes_por_clave, documentos, txt_claves, zip_anidado
+from rapidito.cli import main
+from rapidito.mock_sri import ServidorSRISimulado
+from rapidito.paralelo import extraer_lote
+from rapidito.sri import filtrar_claves
+
+
+def test_zip_con_un_miembro_corrupto(tmp_path, capsys):
+    docs = documentos(40, semilla=11)
+    docs[7] = docs[7][:120]
+    (tmp_path / "carga.zip").write_bytes(zip_anidado(docs, por_zip=10, nombre="carga.zip").getvalue())
+    codigo = main(["--compras", str(tmp_path / "carga.zip"), "-o", str(tmp_path / "salida"),
+                   "--memoria", str(tmp_path / "memoria.json"), "--procesos", "1"])
+    assert codigo == 0
+    esperadas = [f for f in extraer_lote(docs, {}, procesos=1)[0] if f and f["TIPO"] in ("FC", "NC")]
+    compras = pd.read_excel(tmp_path / "salida" / "Compras.xlsx", sheet_name="COMPRAS")
+    assert esperadas and sorted(compras["N. FACTURA"].dropna()) == sorted(f["N. FACTURA"] for f in esperadas)
+    err = capsys.readouterr().err
+    assert "40 XML leídos, 0 repetidos, 1 con error" in err and "✗ carga.zip/lote_0000.zip/0000007.xml: ParseError" in err
+    assert "→ Compras.xlsx" in err
+
+
+def test_txt_con_concurrencia_y_tasa_de_la_linea_de_comandos(tmp_path, monkeypatch):
+    comprobantes = comprobantes_por_clave(12, semilla=2)
+    txt = tmp_path / "claves.txt"
+    txt.write_text(txt_claves(list(comprobantes)), encoding="latin-1")
+    creados = []
+    with ServidorSRISimulado(comprobantes) as srv:
+        class Descargador(rapidito.sri.DescargadorSRI):
+            def __init__(self, **opciones):
+                super().__init__(url=srv.url, **opciones); creados.append((self.concurrencia, self.limitador.por_segundo))
+        monkeypatch.setattr(rapidito.sri, "DescargadorSRI", Descargador)
+        codigo = main(["--compras", str(txt), "-o", str(tmp_path / "salida"), "--memoria", str(tmp_path / "memoria.json"),
+                       "--sin-cache", "--sri-concurrencia", "3", "--sri-por-segundo", "500"])
+    assert codigo == 0 and creados == [(3, 500.0)]
+    # Para compras solo van a la red las facturas y notas de crédito del TXT
+    esperadas = filtrar_claves(list(comprobantes), tipos={"FC", "NC"})
+    compras = pd.read_excel(tmp_path / "salida" / "Compras.xlsx", sheet_name="COMPRAS")
+    assert srv.peticiones == len(esperadas) and set(compras["N. FACTURA"].dropna()) == {d["numero"] for d in esperadas}
@@ -0,0 +1,40 @@
+import io
+import zipfile
+
+import pytest
+
+from rapidito.entrada import LimiteEntradaExcedido, procesar_archivos_entrada
+
+
+class Subido(io.BytesIO):
+    def __init__(self, nombre, contenido):
+        super().__init__(contenido); self.name = nombre
+
+
+def xml(i, relleno=0):
+    return f"<factura><claveAcceso>{i:049d}</claveAcceso>{'x' * relleno}</factura>".encode()
+
+
+def zip_de(miembros):
+    salida = io.BytesIO()
+    with zipfile.ZipFile(salida, "w", zipfile.ZIP_DEFLATED) as z:
+        for nombre, contenido in miembros: z.writestr(nombre, contenido)
+    return salida.getvalue()
+
+
+def test_xml_demasiado_grande_se_omite_y_se_informa():
+    anidado = zip_de([("grande.xml", xml(3, 5000)), ("b.xml", xml(2))])
+    carga = Subido("carga.zip", zip_de([("a.xml", xml(1)), ("otro.zip", anidado), ("a2.xml", xml(1))]))
+    resumen = {}
+    docs = list(procesar_archivos_entrada([carga, Subido("suelto.xml", xml(4, 5000))], resumen, max_bytes_miembro=1000))
+    assert [n for n, _ in docs] == ["carga.zip/a.xml", "carga.zip/otro.zip/b.xml"]
+    assert [o["ARCHIVO"] for o in resumen["omitidos"]] == ["carga.zip/otro.zip/grande.xml", "suelto.xml"]
+    assert resumen["xml"] == 2 and resumen["duplicados"] == 1 and resumen["miembros"] == 5
+
+
+def test_el_tope_de_la_carga_la_detiene():
+    carga = Subido("carga.zip", zip_de([(f"{i}.xml", xml(i, 400)) for i in range(5)]))
+    with pytest.raises(LimiteEntradaExcedido):
+        list(procesar_archivos_entrada([carga], max_bytes_total=1500))
+    with pytest.raises(LimiteEntradaExcedido):
+        list(procesar_archivos_entrada([carga], max_miembros=3))
@@ -0,0 +1,56 @@
+import json
+
+import pandas as pd
+import pytest
+
+from rapidito.memoria import MemoriaContable
+
+
+@pytest.fixture
+def memoria(tmp_path):
+    m = MemoriaContable(str(tmp_path / "memoria.sqlite3"), ruta_json=None)
+    yield m
+    m.cerrar()
+
+
+def test_migra_el_json_una_sola_vez(tmp_path):
+    ruta_json = tmp_path / "conocimiento_contable.json"
+    ruta_json.write_text(json.dumps({"empresas": {
+        "FARMACIA CRUZ AZUL": {"DETALLE": "SALUD", "MEMO": "PERSONAL", "RUC": "0990000000001"},
+        "CONSTRUCTORA ANDES": {"MEMO": "GASTO"}}}), encoding="utf-8")
+    m = MemoriaContable(str(tmp_path / "memoria.sqlite3"), str(ruta_json))
+    assert m.empresas() == {"FARMACIA CRUZ AZUL": {"DETALLE": "SALUD", "MEMO": "PERSONAL", "RUC": "0990000000001"},
+                            "CONSTRUCTORA ANDES": {"DETALLE": "OTROS", "MEMO": "GASTO"}}
+    m.actualizar([("CONSTRUCTORA ANDES", "VIVIENDA", "PERSONAL", None)])
+    m.cerrar()
+    # Al reabrir no se vuelve a importar el JSON: no pisa lo actualizado después
+    m = MemoriaContable(str(tmp_path / "memoria.sqlite3"), str(ruta_json))
+    assert m.migrar_json(str(ruta_json)) == 0
+    assert m.empresas()["CONSTRUCTORA ANDES"] == {"DETALLE": "VIVIENDA", "MEMO": "PERSONAL"}
+    m.cerrar()
+
+
+def test_upsert_conserva_el_ruc_si_la_fila_no_trae(memoria):
+    assert memoria.actualizar([("A", "SALUD", "PERSONAL", "0990000000001"), ("B", "OTROS", "PROFESIONAL", None)]) == 2
+    memoria.actualizar([("A", "EDUCACION", "PERSONAL", None), ("B", "OTROS", "PROFESIONAL", "1790000001001")])
+    assert memoria.empresas() == {"A": {"DETALLE": "EDUCACION", "MEMO": "PERSONAL", "RUC": "0990000000001"},
+                                  "B": {"DETALLE": "OTROS", "MEMO": "PROFESIONAL", "RUC": "1790000001001"}}
+
+
+def test_cargar_excel_normaliza_columnas_y_ruc(memoria):
+    df = pd.DataFrame({"Nombre ": [" farmacia cruz azul", None, "ferreteria"], "detalle": ["salud", "x", None],
+                       "MEMO": ["personal", "x", None], "ruc": [990000000001, None, "sin ruc"]})
+    assert memoria.cargar_excel(df) == 2
+    assert memoria.empresas() == {"FARMACIA CRUZ AZUL": {"DETALLE": "SALUD", "MEMO": "PERSONAL", "RUC": "0990000000001"},
+                                  "FERRETERIA": {"DETALLE": "OTROS", "MEMO": "PROFESIONAL"}}
+
+
+def test_upsert_sin_cambios_no_sube_la_version(memoria):
+    filas = [("A", "SALUD", "PERSONAL", "0990000000001"), ("B", "OTROS", "PROFESIONAL", None)]
+    memoria.actualizar(filas)
+    empresas, version = memoria.empresas(), memoria._leer_version()
+    memoria.actualizar(filas)
+    memoria.actualizar([("A", "SALUD", "PERSONAL", None)])  # sin RUC: se conserva el guardado
+    assert memoria._leer_version() == version and memoria.empresas() is empresas
+    memoria.actualizar([("B", "OTROS", "GASTO", None)])
+    assert memoria._leer_version() != version and memoria.empresas()["B"]["MEMO"] == "GASTO"
@@ -0,0 +1,78 @@
+import json
+import os
+import pstats
+import subprocess
+import sys
+
+import pytest
+
+import rapidito.metricas
+from rapidito.metricas import Metricas, activar_perfil, perfilar, ultimo_perfil
+
+from conftest import RAIZ
+
+
+@pytest.fixture
+def perfil(monkeypatch):
+    """Estado del perfil como en un proceso sin RAPIDITO_PERFIL."""
+    for k, v in {"pendiente": False, "siempre": False, "ultimo": None}.items(): monkeypatch.setitem(rapidito.metricas._PERFIL, k, v)
+
+
+def trabajo():
+    return sum(i * i for i in range(20000))
+
+
+def test_contador_e_histograma_en_prometheus_y_json():
+    m = Metricas()
+    m.contar("sri_respuestas_total", estado="AUTORIZADO"); m.contar("sri_respuestas_total", 2, estado="AUTORIZADO")
+    for v in (0.003, 0.004, 0.2): m.observar("sri_latencia_segundos", v, cubetas=(0.005, 0.1, 1))
+    texto = m.prometheus().splitlines()
+    assert texto == [
+        "# HELP rapidito_sri_respuestas_total Claves consultadas al SRI por estado final",
+        "# TYPE rapidito_sri_respuestas_total counter",
+        'rapidito_sri_respuestas_total{estado="AUTORIZADO"} 3',
+        "# HELP rapidito_sri_latencia_segundos Duración de cada petición HTTP al web service del SRI",
+        "# TYPE rapidito_sri_latencia_segundos histogram",
+        'rapidito_sri_latencia_segundos_bucket{le="0.005"} 2',
+        'rapidito_sri_latencia_segundos_bucket{le="0.1"} 2',
+        'rapidito_sri_latencia_segundos_bucket{le="1"} 3',
+        'rapidito_sri_latencia_segundos_bucket{le="+Inf"} 3',
+        f"rapidito_sri_latencia_segundos_sum {0.003 + 0.004 + 0.2}",
+        "rapidito_sri_latencia_segundos_count 3",
+    ]
+    datos = json.loads(m.json())
+    assert datos["contadores"] == [{"nombre": "sri_respuestas_total", "etiquetas": {"estado": "AUTORIZADO"}, "valor": 3}]
+    (h,) = datos["histogramas"]
+    assert (h["nombre"], h["n"], h["conteos"], h["max"]) == ("sri_latencia_segundos", 3, [2, 0, 1, 0], 0.2)
+    assert (h["p50"], h["p99"]) == (0.005, 0.2) and h["media"] == pytest.approx(0.069)
+
+
+def test_vaciar_y_fusionar_suman_lo_de_otro_proceso():
+    hijo, padre = Metricas(), Metricas()
+    hijo.contar("extraccion_fallos_total", motivo="ParseError"); hijo.observar("extraccion_segundos", 0.01)
+    padre.contar("extraccion_fallos_total", motivo="ParseError"); padre.observar("extraccion_segundos", 0.02)
+    padre.fusionar(hijo.vaciar())
+    assert hijo.instantanea()["contadores"] == [] and padre.instantanea()["contadores"][0]["valor"] == 2
+    assert padre.instantanea()["histogramas"][0]["n"] == 2
+
+
+def test_activar_perfil_perfila_solo_la_siguiente_ejecucion(perfil, tmp_path):
+    with perfilar("sin_pedir"): trabajo()
+    assert ultimo_perfil() is None
+    activar_perfil()
+    with perfilar("compras"): trabajo()
+    nombre, texto, stats = ultimo_perfil()
+    assert nombre == "compras" and "trabajo" in texto and isinstance(stats, pstats.Stats)
+    with perfilar("ventas"): trabajo()
+    assert ultimo_perfil()[0] == "compras"
+    # Con destino se perfila siempre y se guarda el .prof
+    with perfilar("cli", destino=str(tmp_path / "cli.prof")): trabajo()
+    assert ultimo_perfil()[0] == "cli" and pstats.Stats(str(tmp_path / "cli.prof")).total_calls > 0
+
+
+def test_rapidito_perfil_perfila_todas_las_ejecuciones():
+    guion = ("from rapidito.metricas import perfilar, ultimo_perfil\n"
+             "for nombre in ('a', 'b'):\n    with perfilar(nombre): sum(range(1000))\n    print(ultimo_perfil()[0])")
+    entorno = dict(os.environ, PYTHONPATH=RAIZ, RAPIDITO_PERFIL="1")
+    salida = subprocess.run([sys.executable, "-c", guion], env=entorno, capture_output=True, text=True, timeout=60, check=True)
+    assert salida.stdout.split() == ["a", "b"]
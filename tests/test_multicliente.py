@@ -0,0 +1,43 @@
+import io
+import zipfile
+
+import pandas as pd
+
+from rapidito.multicliente import deducir_contribuyentes, generar_zip_clientes, particionar
+
+ESTUDIO, OTRO, COMPRADOR, PROVEEDOR = "1790000001001", "0912345678", "1791111111001", "1792222222001"
+
+
+def fila(tipo, emisor, receptor, total=100.0):
+    return {"TIPO": tipo, "FECHA": "15/03/2024", "MES": "MARZO", "N. FACTURA": "001-001-000000001", "RUC": emisor,
+            "NOMBRE": f"EMISOR {emisor}", "RUC CLIENTE": receptor, "CLIENTE": f"RECEPTOR {receptor}", "TOTAL": total,
+            "DETALLE": "OTROS", "MEMO": "PROFESIONAL", "N AUTORIZACION": "1" * 49}
+
+
+def test_solo_ventas_no_convierte_al_comprador_en_contribuyente():
+    ventas = [fila("FC", ESTUDIO, COMPRADOR), fila("FC", ESTUDIO, PROVEEDOR)]
+    sin_asignar = []
+    assert deducir_contribuyentes(ventas) == set()
+    assert particionar(ventas, sin_asignar=sin_asignar) == {} and sin_asignar == ventas
+
+
+def test_deduce_de_las_retenciones_y_asigna_compras_y_ventas():
+    carga = [fila("FC", ESTUDIO, COMPRADOR), fila("RET", COMPRADOR, ESTUDIO, 0), fila("FC", PROVEEDOR, ESTUDIO),
+             fila("NC", PROVEEDOR, OTRO + "001"), fila("FC", PROVEEDOR, COMPRADOR)]
+    sin_asignar = []
+    grupos = particionar(carga, sin_asignar=sin_asignar)
+    (g,) = grupos.values()
+    assert g["ruc"] == ESTUDIO and g["compras"] == [carga[2]] and g["ventas"] == carga[:2]
+    assert sin_asignar == carga[3:]
+    # Con la lista explícita, la cédula y su RUC de persona natural son el mismo contribuyente
+    sin_asignar = []
+    grupos = particionar(carga, [ESTUDIO, OTRO], sin_asignar)
+    assert [g["ruc"] for g in grupos.values()] == [OTRO + "001", ESTUDIO] and sin_asignar == [carga[4]]
+
+
+def test_indice_lista_los_comprobantes_sin_asignar():
+    carga = [fila("FC", ESTUDIO, COMPRADOR), fila("FC", PROVEEDOR, COMPRADOR)]
+    with zipfile.ZipFile(io.BytesIO(generar_zip_clientes(carga, contribuyentes=[ESTUDIO], procesos=1))) as z:
+        hojas = pd.read_excel(z.open("INDICE.xlsx"), sheet_name=None, dtype={"RUC": str, "RUC CLIENTE": str, "N AUTORIZACION": str})
+    assert list(hojas["INDICE"]["RUC"][:1]) == [ESTUDIO]
+    assert list(hojas["SIN ASIGNAR"]["RUC"]) == [PROVEEDOR] and list(hojas["SIN ASIGNAR"]["N AUTORIZACION"]) == ["1" * 49]
@@ -0,0 +1,46 @@
+import io
+
+import pytest
+
+import rapidito.paralelo
+from generador import documentos, razones_sociales
+from rapidito.paralelo import extraer_lote
+
+
+@pytest.fixture(scope="module")
+def empresas():
+    return {nm: {"DETALLE": "SALUD", "MEMO": "PERSONAL"} for nm in razones_sociales(200, semilla=4)}
+
+
+def claves(filas):
+    return [f["N AUTORIZACION"] if f else None for f in filas]
+
+
+def test_filas_en_el_orden_de_entrada(empresas):
+    docs = documentos(45, semilla=8)
+    filas, fallos = extraer_lote(docs, empresas, procesos=1, tam_bloque=7)
+    esperado = [extraer_lote([d], empresas, procesos=1)[0][0] for d in docs]
+    assert fallos == [] and filas == esperado and len(set(claves(filas))) == 45
+
+
+def test_un_archivo_corrupto_no_detiene_el_lote(empresas):
+    docs = documentos(6, semilla=9)
+    lote = [("a.xml", docs[0]), ("roto.xml", docs[1][:150]), ("b.xml", docs[2]), io.BytesIO(b"no es xml"), docs[3]]
+    filas, fallos = extraer_lote(lote, empresas, procesos=1, tam_bloque=2)
+    assert [f is not None for f in filas] == [True, False, True, False, True]
+    assert [f["ARCHIVO"] for f in fallos] == ["roto.xml", "#4"] and all(f["ERROR"].startswith("ParseError") for f in fallos)
+
+
+def test_el_pool_de_procesos_da_lo_mismo_que_en_serie(empresas, monkeypatch):
+    pools = []
+    class Pool(rapidito.paralelo.ProcessPoolExecutor):
+        def __init__(self, *a, **k):
+            super().__init__(*a, **k); pools.append(k["mp_context"].get_start_method())
+    monkeypatch.setattr(rapidito.paralelo, "ProcessPoolExecutor", Pool)
+    docs = documentos(300, semilla=10)
+    docs[17], docs[250] = docs[17][:90], b"<factura>"
+    serie = extraer_lote(docs, empresas, procesos=1, tam_bloque=40)
+    assert pools == []
+    pool = extraer_lote(docs, empresas, procesos=2, tam_bloque=40)
+    assert pools == [rapidito.paralelo.CONTEXTO.get_start_method()] and pools != ["fork"]
+    assert pool == serie and [f["ARCHIVO"] for f in pool[1]] == ["#18", "#251"]
@@ -0,0 +1,121 @@
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date
+
+from generador import comprobantes_por_clave
+from rapidito.mock_sri import ServidorSRISimulado
+from rapidito.sri import DescargadorSRI, LimitadorTasa, AUTORIZADO, NO_ENCONTRADO, FALLIDO, BANDEJAS, \
+    decodificar_clave, digito_verificador, filtrar_claves
+
+from conftest import RAIZ
+
+# Clave del XML de ejemplo de la ficha técnica de comprobantes electrónicos del SRI (dígito verificador 3)
+CLAVE_FICHA = "2110201101179214673900110020010000000011234567813"
+
+
+class SRIInestable(ServidorSRISimulado):
+    """Las primeras `fallos` peticiones de cada clave responden 503 o, con `demora`, tardan más que el timeout."""
+    def __init__(self, comprobantes, fallos=1, demora=None):
+        super().__init__(comprobantes)
+        self.fallos, self.demora, self.vistas = fallos, demora, Counter()
+
+    def responder(self, cuerpo):
+        clave = re.search(r"<claveAccesoComprobante>(\d+)<", cuerpo).group(1)
+        with self.lock: self.vistas[clave] += 1; n = self.vistas[clave]
+        if n <= self.fallos:
+            if self.demora is None:
+                with self.lock: self.peticiones += 1
+                return 503, "Service Unavailable"
+            time.sleep(self.demora)
+        return super().responder(cuerpo)
+
+
+def descargar(srv, claves, **opciones):
+    opciones = {"concurrencia": 4, "por_segundo": 1000, "backoff": 0.01, **opciones}
+    with DescargadorSRI(url=srv.url, **opciones) as dsc: return dsc.descargar(claves)
+
+
+def test_digito_verificador_de_la_ficha_tecnica():
+    assert digito_verificador("41261533") == 6  # ejemplo del módulo 11 en la ficha técnica
+    assert digito_verificador(CLAVE_FICHA[:48]) == 3
+
+
+def test_decodificar_clave_real():
+    assert decodificar_clave(CLAVE_FICHA) == {
+        "clave": CLAVE_FICHA, "fecha": date(2011, 10, 21), "cod_tipo": "01", "tipo": "FC", "ruc": "1792146739001",
+        "ambiente": "1", "serie": "002-001", "secuencial": "000000001", "numero": "002-001-000000001", "valida": True}
+
+
+def test_filtrar_claves_descarta_digito_o_fecha_invalidos():
+    otro_digito = CLAVE_FICHA[:48] + "4"
+    sin_fecha = "3210" + CLAVE_FICHA[4:48]
+    sin_fecha += str(digito_verificador(sin_fecha))
+    claves = [CLAVE_FICHA, otro_digito, sin_fecha]
+    assert [d["clave"] for d in filtrar_claves(claves)] == [CLAVE_FICHA]
+    assert filtrar_claves(claves, desde=date(2011, 10, 21), hasta=date(2011, 10, 21), emisores=["1792146739001"], tipos=BANDEJAS)
+    assert not filtrar_claves(claves, desde=date(2011, 10, 22)) and not filtrar_claves(claves, emisores=["1790000001001"])
+
+
+def test_concurrencia_y_tasa_desde_el_entorno():
+    guion = "from rapidito.sri import DescargadorSRI\nd = DescargadorSRI(url='http://sri.local/')\nprint(d.concurrencia, d.limitador.por_segundo)"
+    entorno = dict(os.environ, PYTHONPATH=RAIZ, RAPIDITO_SRI_CONCURRENCIA="3", RAPIDITO_SRI_POR_SEGUNDO="2.5")
+    salida = subprocess.run([sys.executable, "-c", guion], env=entorno, capture_output=True, text=True, timeout=60, check=True)
+    assert salida.stdout.split() == ["3", "2.5"]
+
+
+def test_un_503_se_reintenta_hasta_autorizar():
+    comprobantes = comprobantes_por_clave(6)
+    with SRIInestable(comprobantes, fallos=2) as srv:
+        res = descargar(srv, list(comprobantes))
+    assert [r["estado"] for r in res] == [AUTORIZADO] * 6
+    assert all(r["intentos"] == 3 and r["error"] == "" for r in res)
+    assert srv.peticiones == 18
+
+
+def test_un_timeout_se_reintenta_hasta_autorizar():
+    comprobantes = comprobantes_por_clave(3)
+    with SRIInestable(comprobantes, fallos=1, demora=0.5) as srv:
+        res = descargar(srv, list(comprobantes), timeout=0.2)
+    assert [(r["estado"], r["intentos"]) for r in res] == [(AUTORIZADO, 2)] * 3
+    assert all(comprobantes[r["clave"]] in r["xml"] for r in res)
+
+
+def test_clave_sin_autorizacion_es_no_encontrado():
+    with ServidorSRISimulado({}) as srv:
+        res = descargar(srv, ["1" * 49])
+    assert res[0]["estado"] == NO_ENCONTRADO and res[0]["intentos"] == 1
+
+
+def test_agotar_los_reintentos_es_fallido():
+    comprobantes = comprobantes_por_clave(2)
+    with SRIInestable(comprobantes, fallos=10) as srv:
+        res = descargar(srv, list(comprobantes), reintentos=2)
+    assert [(r["estado"], r["intentos"], r["error"]) for r in res] == [(FALLIDO, 3, "HTTP 503")] * 2
+    assert srv.peticiones == 6
+
+
+def test_el_limitador_acota_las_peticiones_por_segundo():
+    comprobantes = comprobantes_por_clave(30)
+    with ServidorSRISimulado(comprobantes) as srv:
+        t = time.perf_counter()
+        res = descargar(srv, list(comprobantes), concurrencia=8, por_segundo=20)
+        dt = time.perf_counter() - t
+    assert all(r["estado"] == AUTORIZADO for r in res)
+    # ráfaga inicial de 20 fichas y luego 20 por segundo: las 10 restantes tardan al menos 0,5 s
+    assert dt >= 0.45
+
+
+def test_limitador_compartido_entre_hilos():
+    lim, hechas = LimitadorTasa(50, rafaga=1), []
+    def consumir():
+        for _ in range(10): lim.esperar(); hechas.append(time.perf_counter())
+    t = time.perf_counter()
+    hilos = [threading.Thread(target=consumir) for _ in range(4)]
+    for h in hilos: h.start()
+    for h in hilos: h.join()
+    assert len(hechas) == 40 and max(hechas) - t >= 39 / 50 * 0.95
@@ -0,0 +1,87 @@
+import json
+import os
+import time
+
+import pytest
+
+from rapidito.mock_api import ServidorAPISimulado
+from rapidito.telemetria import Telemetria, conectar_api
+
+
+class Espia(Telemetria):
+    """Anota el tamaño de cada lote que el hilo intenta enviar."""
+    def __init__(self, *a, **k):
+        self.lotes = []
+        super().__init__(*a, **k)
+
+    def _vuelta(self, eventos):
+        self.lotes.append(len(eventos)); super()._vuelta(eventos)
+
+
+def esperar(condicion, limite=10):
+    fin = time.monotonic() + limite
+    while not condicion():
+        assert time.monotonic() < fin, "tiempo de espera agotado"
+        time.sleep(0.01)
+
+
+def leer(ruta):
+    with open(ruta, encoding="utf-8") as f: return [json.loads(ln) for ln in f]
+
+
+@pytest.fixture
+def srv():
+    with ServidorAPISimulado() as s: yield s
+
+
+def test_registrar_no_espera_y_envia_en_lotes(srv, tmp_path):
+    srv.latencia = 0.05
+    tel = Espia(srv.url, str(tmp_path / "pendientes.jsonl"), lote=10, espera=0.05)
+    t = time.perf_counter()
+    for i in range(23): tel.registrar({"accion": f"E{i}"})
+    assert time.perf_counter() - t < 0.05
+    esperar(lambda: len(srv.recibidos) == 23)
+    tel.cerrar()
+    assert [e["accion"] for e in srv.recibidos] == [f"E{i}" for i in range(23)]
+    assert sum(tel.lotes) == 23 and max(tel.lotes) <= 10 and len(tel.lotes) < 23
+
+
+def test_con_el_endpoint_caido_se_guarda_y_se_reenvia(srv, tmp_path):
+    ruta = str(tmp_path / "pendientes.jsonl")
+    srv.caido = True
+    tel = Telemetria(srv.url, ruta, espera=0.05, reintento=0.2)
+    for i in range(3): tel.registrar({"accion": f"E{i}"})
+    esperar(lambda: os.path.exists(ruta) and len(leer(ruta)) == 3)
+    assert srv.recibidos == [] and tel.fallidos >= 1
+    srv.caido = False  # pasado `reintento` el hilo reenvía lo guardado aunque no lleguen eventos nuevos
+    esperar(lambda: len(srv.recibidos) == 3)
+    tel.cerrar()
+    assert [e["accion"] for e in srv.recibidos] == ["E0", "E1", "E2"] and not os.path.exists(ruta)
+
+
+def test_cerrar_vacia_la_cola(srv, tmp_path):
+    srv.latencia = 0.02
+    tel = Telemetria(srv.url, str(tmp_path / "pendientes.jsonl"), espera=5)
+    for i in range(10): tel.registrar({"accion": f"E{i}"})
+    tel.cerrar()
+    assert [e["accion"] for e in srv.recibidos] == [f"E{i}" for i in range(10)]
+
+
+def test_al_cerrar_caido_queda_en_disco_y_el_siguiente_proceso_lo_envia(srv, tmp_path):
+    ruta = str(tmp_path / "pendientes.jsonl")
+    srv.caido = True
+    tel = Telemetria(srv.url, ruta, espera=5)
+    for i in range(4): tel.registrar({"accion": f"E{i}"})
+    tel.cerrar()
+    assert len(leer(ruta)) == 4 and srv.recibidos == []
+    srv.caido = False
+    tel = Telemetria(srv.url, ruta, espera=0.05)
+    esperar(lambda: len(srv.recibidos) == 4)
+    tel.cerrar()
+    assert not os.path.exists(ruta)
+
+
+def test_conectar_api(srv):
+    assert conectar_api({"accion": "LOGIN", "usuario": "X", "clave": "Rapidito2026"}, srv.url)["exito"]
+    assert not conectar_api({"accion": "LOGIN", "usuario": "X", "clave": "otra"}, srv.url)["exito"]
+    assert conectar_api({"accion": "LOGIN"}, "http://127.0.0.1:9/") == {"exito": False, "mensaje": "Error de conexión"}
@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+from generador import comprobantes_por_clave
+from rapidito.cache import CacheComprobantes
+from rapidito.mock_sri import ServidorSRISimulado
+from rapidito.sri import AUTORIZADO
+from rapidito.trabajos import GestorTrabajos, PENDIENTE, TERMINADO
+
+from conftest import RAIZ
+
+
+def esperar(condicion, limite=30):
+    fin = time.monotonic() + limite
+    while not condicion():
+        assert time.monotonic() < fin, "tiempo de espera agotado"
+        time.sleep(0.02)
+
+
+def leer(ruta, tid):
+    with sqlite3.connect(ruta) as con:
+        estado = con.execute("SELECT estado FROM trabajos WHERE id=?", (tid,)).fetchone()[0]
+        hechos = con.execute("SELECT COUNT(*) FROM claves WHERE trabajo=? AND estado IS NOT NULL", (tid,)).fetchone()[0]
+    return estado, hechos
+
+
+def gestor(tmp_path, ruta, srv, n):
+    return GestorTrabajos(ruta, cache=CacheComprobantes(str(tmp_path / f"cache{n}.sqlite3")), empresas=dict,
+                          opciones_descarga={"url": srv.url, "concurrencia": 1, "por_segundo": 1000})
+
+
+def test_cerrar_deja_el_trabajo_pendiente_y_continua_desde_lo_guardado(tmp_path):
+    comprobantes = comprobantes_por_clave(40, semilla=7)
+    ruta = str(tmp_path / "trabajos.sqlite3")
+    with ServidorSRISimulado(comprobantes, latencia=0.03) as srv:
+        g = gestor(tmp_path, ruta, srv, 1)
+        tid = g.crear(list(comprobantes), "U")
+        esperar(lambda: g.estado(tid)["hechos"] >= 5)
+        g.cerrar()
+        estado, hechos = leer(ruta, tid)
+        assert estado == PENDIENTE and 5 <= hechos < 40
+        peticiones = srv.peticiones
+
+        g = gestor(tmp_path, ruta, srv, 2)  # cada gestor con su caché: todo lo que falta va a la red
+        esperar(lambda: not g.estado(tid)["activo"])
+        e = g.estado(tid)
+        g.cerrar()
+    assert e["estado"] == TERMINADO and e["conteo"][AUTORIZADO] == 40
+    assert srv.peticiones - peticiones == 40 - hechos
+
+
+def test_el_interprete_sale_sin_esperar_la_descarga(tmp_path):
+    comprobantes = comprobantes_por_clave(60, semilla=3)
+    ruta = str(tmp_path / "trabajos.sqlite3")
+    guion = ("import time\nfrom rapidito.trabajos import obtener_gestor\n"
+             f"g = obtener_gestor(); tid = g.crear({list(comprobantes)!r})\n"
+             "while g.estado(tid)['hechos'] < 3: time.sleep(0.01)\nprint(tid)")
+    with ServidorSRISimulado(comprobantes, latencia=0.2) as srv:
+        entorno = dict(os.environ, PYTHONPATH=RAIZ, RAPIDITO_SRI_URL=srv.url, RAPIDITO_TRABAJOS=ruta,
+                       RAPIDITO_CACHE=str(tmp_path / "cache.sqlite3"), RAPIDITO_MEMORIA=str(tmp_path / "memoria.sqlite3"))
+        salida = subprocess.run([sys.executable, "-c", guion], env=entorno, capture_output=True, text=True, timeout=60, check=True)
+    estado, hechos = leer(ruta, salida.stdout.strip())
+    assert estado == PENDIENTE and hechos < 60
+
+
+def test_los_trabajos_viejos_se_purgan_al_arrancar_y_al_terminar(tmp_path):
+    comprobantes = comprobantes_por_clave(4, semilla=1)
+    ruta = str(tmp_path / "trabajos.sqlite3")
+    with ServidorSRISimulado(comprobantes) as srv:
+        g = gestor(tmp_path, ruta, srv, 1)
+        viejo = g.crear(list(comprobantes), "U")
+        esperar(lambda: not g.estado(viejo)["activo"])
+        g.con.execute("UPDATE trabajos SET actualizado=? WHERE id=?", (time.time() - 8 * 86400, viejo))
+        nuevo = g.crear(list(comprobantes), "U")
+        esperar(lambda: g.estado(viejo) is None)  # la purga corre al terminar `nuevo`
+        assert g.estado(nuevo)["estado"] == TERMINADO
+        g.con.execute("UPDATE trabajos SET actualizado=? WHERE id=?", (time.time() - 8 * 86400, nuevo))
+        g.cerrar()
+        g = gestor(tmp_path, ruta, srv, 2)
+        assert g.estado(nuevo) is None and g.con.execute("SELECT COUNT(*) FROM claves").fetchone()[0] == 0
+        g.cerrar()
+
+
+def test_un_trabajo_con_dueno_vivo_no_se_descarga_dos_veces(tmp_path):
+    comprobantes = comprobantes_por_clave(30, semilla=5)
+    ruta = str(tmp_path / "trabajos.sqlite3")
+    with ServidorSRISimulado(comprobantes, latencia=0.02) as srv:
+        g1 = gestor(tmp_path, ruta, srv, 1)
+        tid = g1.crear(list(comprobantes), "U")
+        esperar(lambda: g1.estado(tid)["hechos"] >= 2)
+        g2 = gestor(tmp_path, ruta, srv, 2)  # otro proceso que arranca con el trabajo EN CURSO
+        assert tid not in g2.activos and not g2.reanudar(tid) and g2.estado(tid)["activo"]
+        esperar(lambda: not g1.estado(tid)["activo"])
+        assert g1.estado(tid)["estado"] == TERMINADO and srv.peticiones == 30
+        g1.cerrar(); g2.cerrar()
+
+
+def test_un_latido_vencido_se_retoma(tmp_path, monkeypatch):
+    comprobantes = comprobantes_por_clave(10, semilla=6)
+    ruta = str(tmp_path / "trabajos.sqlite3")
+    with ServidorSRISimulado(comprobantes) as srv:
+        g1 = gestor(tmp_path, ruta, srv, 1)
+        monkeypatch.setattr(g1, "_lanzar", lambda tid: None)  # el dueño "se cae" antes de descargar
+        tid = g1.crear(list(comprobantes), "U")
+        g1.con.execute("UPDATE trabajos SET latido=latido-1000 WHERE id=?", (tid,))
+        g2 = gestor(tmp_path, ruta, srv, 2)
+        esperar(lambda: g2.estado(tid)["estado"] == TERMINADO)
+        g2.cerrar()
@@ -0,0 +1,57 @@
+import pandas as pd
+import pytest
+
+from rapidito.ventas import cruzar_ventas_retenciones, normalizar_numero
+
+EMISOR, CLIENTE, OTRO = "1790000001001", "1791111111001", "1792222222001"
+
+
+def factura(numero, cliente=CLIENTE, total=112.0):
+    return {"TIPO": "FC", "MES": "MARZO", "FECHA": "15/03/2024", "N. FACTURA": numero, "RUC": EMISOR,
+            "RUC CLIENTE": cliente, "CLIENTE": f"CLIENTE {cliente}", "BASE. 12 / 15": 100.0, "IVA.": 12.0, "TOTAL": total}
+
+
+def retencion(sustento, numreten="001-001-000000050", agente=CLIENTE, sujeto=EMISOR, renta=1.0, iva=3.6, aut="A1"):
+    return {"TIPO": "RET", "RUC": agente, "RUC CLIENTE": sujeto, "SUSTENTO": sustento, "numreten": numreten,
+            "fechaemi": "20/03/2024", "N AUTORIZACION": aut, "rt_renta": renta, "rt_iva": iva, "TOTAL RET": renta + iva}
+
+
+def test_numeros_con_y_sin_ceros_de_relleno():
+    assert normalizar_numero(pd.Series(["1-1-1", "001-001-000000001", "001001000000001", " 001 - 1 - 01 ", "S/N"])).tolist() == \
+        ["001-001-000000001"] * 4 + ["S/N"]
+
+
+@pytest.mark.parametrize("sustento", ["1-1-123", "001001000000123", "001-001-000000123"])
+def test_cruza_aunque_el_sustento_tenga_otro_relleno(sustento):
+    ventas, sin_factura, sin_ret = cruzar_ventas_retenciones([factura("001-001-000000123"), retencion(sustento)])
+    assert sin_factura == [] and sin_ret == []
+    assert ventas[0]["TOTAL RET"] == pytest.approx(4.6) and ventas[0]["N° RET"] == "001-001-000000050"
+
+
+def test_varias_retenciones_se_suman_y_sus_numeros_se_unen():
+    fc = factura("001-001-000000123")
+    r1, r2 = retencion("001-001-000000123", "001-001-000000050", aut="A1"), retencion("1-1-123", "001-001-000000051", renta=2.0, iva=0, aut="A2")
+    (v,), sin_factura, sin_ret = cruzar_ventas_retenciones([fc, r1, r2])
+    assert sin_factura == [] and sin_ret == []
+    assert (v["RET RENTA"], v["RET IVA"], v["TOTAL RET"]) == pytest.approx((3.0, 3.6, 6.6))
+    assert v["N° RET"] == "001-001-000000050, 001-001-000000051" and v["N° AUTORIZACIÓN"] == "A1, A2"
+
+
+def test_retencion_subida_dos_veces_cuenta_una_vez():
+    r = retencion("001-001-000000123")
+    (v,), sin_factura, _ = cruzar_ventas_retenciones([factura("001-001-000000123"), r, dict(r)])
+    assert v["TOTAL RET"] == pytest.approx(4.6) and v["N° RET"] == "001-001-000000050" and sin_factura == []
+
+
+def test_retencion_de_otro_agente_o_sin_sustento_queda_sin_factura():
+    de_otro, sin_sustento = retencion("001-001-000000123", agente=OTRO), retencion("")
+    (v,), sin_factura, sin_ret = cruzar_ventas_retenciones([factura("001-001-000000123"), de_otro, sin_sustento])
+    assert sin_factura == [de_otro, sin_sustento]
+    assert v["TOTAL RET"] == 0 and v["N° RET"] == "" and len(sin_ret) == 1
+
+
+def test_factura_sin_retencion():
+    fc, otra = factura("001-001-000000123"), factura("001-001-000000124", total=50.0)
+    ventas, sin_factura, sin_ret = cruzar_ventas_retenciones([fc, otra, retencion("001-001-000000124")])
+    assert sin_ret == [fc] and sin_factura == []
+    assert [v["TOTAL RET"] for v in ventas] == pytest.approx([0, 4.6]) and [v["TOTAL"] for v in ventas] == [112.0, 50.0]